@@ -0,0 +1,170 @@
+"""
+Built-in HTTP crawler throughput: pages/sec against a local static site.
+
+Generates a static site (a link tree with cross links, a few KB of HTML per
+page) in a temporary directory, serves it over keep-alive HTTP/1.1 from a
+local threaded server and crawls it with HttpCrawler at several concurrency
+levels. HTML-to-markdown conversion alone is timed separately, so the two
+costs (network + event loop vs parsing) can be told apart.
+
+The local server runs in the same process and shares the GIL with the
+crawler, so absolute numbers understate a real deployment; compare runs
+against each other.
+
+Usage (from backend/):
+    python benchmarks/crawler.py
+    python benchmarks/crawler.py --pages 1000 --concurrency 1,8,32
+    python benchmarks/crawler.py --url https://docs.example.com --max-depth 2
+"""
+
+import argparse
+import asyncio
+import functools
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.crawler import HttpCrawler, html_to_markdown
+
+_WORDS = (
+    "crawler index vector query chunk embedding latency server request page "
+    "document section answer search widget token batch cache model site"
+).split()
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 90))).capitalize() + "."
+
+
+def _build_site(directory: str, pages: int, fanout: int, seed: int = 0) -> int:
+    """Write pages 0..pages-1; page i links to its children in a fanout-ary tree plus a few random pages."""
+    rng = random.Random(seed)
+    depth = 0
+    for i in range(pages):
+        children = [c for c in range(i * fanout + 1, i * fanout + fanout + 1) if c < pages]
+        cross = [rng.randrange(pages) for _ in range(3)]
+        links = "".join(f'<li><a href="/page{c}.html">Page {c}</a></li>' for c in children + cross)
+        body = "".join(
+            f"<h2>Section {s}</h2><p>{_paragraph(rng)}</p><ul><li>{_paragraph(rng)[:80]}</li>"
+            f"<li><strong>Note:</strong> <code>value_{s}</code></li></ul>"
+            for s in range(4)
+        )
+        html = (
+            f"<!DOCTYPE html><html><head><title>Page {i}</title>"
+            f'<meta name="description" content="Benchmark page {i}">'
+            f"<style>body{{font-family:sans-serif}}</style></head><body>"
+            f'<nav><a href="/">Home</a><a href="/page0.html?utm_source=nav">Start</a></nav>'
+            f"<main><h1>Page {i}</h1>{body}<ul>{links}</ul></main>"
+            f"<footer>Footer</footer></body></html>"
+        )
+        name = "index.html" if i == 0 else f"page{i}.html"
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(html)
+    # Depth of the deepest page in the tree (index.html is page 0)
+    n = pages - 1
+    while n > 0:
+        n = (n - 1) // fanout
+        depth += 1
+    return depth
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so the crawler's pooled connections are reused
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this, delayed ACKs
+        # add ~40 ms to every response on a reused connection
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(directory: str):
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory)
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def conversion(directory: str, samples: int = 200):
+    names = sorted(os.listdir(directory))[:samples]
+    documents = []
+    for name in names:
+        with open(os.path.join(directory, name)) as f:
+            documents.append(f.read())
+    start = time.perf_counter()
+    for html in documents:
+        html_to_markdown(html, "http://127.0.0.1/")
+    elapsed = time.perf_counter() - start
+    size_kb = sum(len(html) for html in documents) / len(documents) / 1024
+    print(
+        f"HTML to markdown: {len(documents) / elapsed:.0f} pages/s "
+        f"({elapsed / len(documents) * 1000:.2f} ms per {size_kb:.1f} KB page)"
+    )
+
+
+async def crawl(url: str, max_depth: int, max_pages: int, concurrency: int):
+    crawler = HttpCrawler(concurrency=concurrency, per_host=concurrency, max_pages=max_pages)
+    try:
+        start = time.perf_counter()
+        first = None
+        pages = 0
+        async for _ in crawler.crawl(url, max_depth=max_depth):
+            pages += 1
+            if first is None:
+                first = time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+    finally:
+        await crawler.aclose()
+    return pages, elapsed, first or 0.0, crawler.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=500, help="Pages in the generated site")
+    parser.add_argument("--fanout", type=int, default=8, help="Child links per generated page")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Comma-separated fetch concurrency levels")
+    parser.add_argument("--url", help="Crawl this site instead of a generated one")
+    parser.add_argument("--max-depth", type=int, default=None)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        if args.url:
+            url, max_depth, max_pages = args.url, args.max_depth or 2, args.pages
+        else:
+            depth = _build_site(directory, args.pages, args.fanout)
+            server = _serve(directory)
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+            max_depth, max_pages = args.max_depth or depth, args.pages
+            print(f"Static site: {args.pages} pages, fanout {args.fanout}, depth {depth}")
+            conversion(directory)
+
+        print(f"\nCrawl of {url} (max_depth {max_depth}, max_pages {max_pages})")
+        print(f"{'workers':>8}{'pages':>8}{'seconds':>10}{'pages/s':>10}{'first ms':>10}{'fetches':>9}")
+        try:
+            for level in levels:
+                pages, elapsed, first, stats = asyncio.run(crawl(url, max_depth, max_pages, level))
+                print(
+                    f"{level:>8}{pages:>8}{elapsed:>10.2f}{pages / elapsed:>10.1f}"
+                    f"{first * 1000:>10.1f}{stats['fetches']:>9}"
+                )
+        finally:
+            if server is not None:
+                server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+In-process brute-force index vs Qdrant: search latency and recall.
+
+Offline (default): builds tenants of several sizes from random unit vectors,
+writes them as LocalVectorIndex snapshots and measures search latency
+(memory-mapped matrix, one matmul + argpartition). Results are exact, so
+recall is 1.0 by construction.
+
+Live (--live): also loads every tenant into a temporary collection of the
+Qdrant at QDRANT_URL and measures filtered search latency over the pooled
+REST client, plus Qdrant's recall@k against the exact brute-force results.
+
+Usage (from backend/):
+    python benchmarks/local_index.py
+    python benchmarks/local_index.py --sizes 500,2000,20000 --limit 10
+    python benchmarks/local_index.py --live
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_DIMENSION
+from services.local_index import LocalVectorIndex
+
+
+def _tenant(size: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered vectors, closer to real chunk embeddings than uniform noise
+    centers = rng.standard_normal((max(1, size // 50), EMBEDDING_DIMENSION)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), size)] + 0.5 * rng.standard_normal(
+        (size, EMBEDDING_DIMENSION)
+    ).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    return statistics.median(latencies), p95
+
+
+def offline(sizes, limit: int, queries: int, directory: str):
+    rng = np.random.default_rng(0)
+    index = LocalVectorIndex(root=directory)
+    tenants = {}
+
+    print(f"Local brute-force search, top {limit}, {queries} queries per tenant")
+    print(f"{'chunks':>8}{'build ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for size in sizes:
+        vectors = _tenant(size, rng)
+        payloads = [{"page_id": f"chunk_{i}", "markdown": ""} for i in range(size)]
+        start = time.perf_counter()
+        snapshot = index.write("bench", f"tenant_{size}", list(range(size)), vectors, payloads)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        query_vectors = _tenant(queries, rng)
+        snapshot.search(query_vectors[0], limit)  # page in the matrix and payloads
+        latencies = []
+        for query in query_vectors:
+            start = time.perf_counter()
+            snapshot.search(query, limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+        p50, p95 = _percentiles(latencies)
+        print(f"{size:>8}{build_ms:>10.1f}{p50:>10.3f}{p95:>10.3f}")
+        tenants[size] = (vectors, query_vectors, snapshot)
+    return tenants
+
+
+async def live(tenants, limit: int):
+    from qdrant_client.models import Batch
+    from services.vector_store import VectorStoreService
+
+    service = VectorStoreService()
+    service.local_index = None  # always go to Qdrant
+    collection_name = f"local_index_bench_{uuid.uuid4().hex[:8]}"
+    await asyncio.to_thread(service._create_collection, collection_name)
+    try:
+        for size, (vectors, _, _) in tenants.items():
+            for i in range(0, size, 256):
+                await asyncio.to_thread(
+                    service.client.upsert,
+                    collection_name=collection_name,
+                    points=Batch(
+                        ids=[size * 10 + j for j in range(i, min(i + 256, size))],
+                        vectors=vectors[i : i + 256].tolist(),
+                        payloads=[{"tenant": str(size)} for _ in range(i, min(i + 256, size))],
+                    ),
+                )
+        await asyncio.to_thread(
+            service.client.create_payload_index,
+            collection_name=collection_name,
+            field_name="tenant",
+            field_schema="keyword",
+        )
+
+        print(f"\nQdrant filtered search (REST, pooled client), top {limit}")
+        print(f"{'chunks':>8}{'p50 ms':>10}{'p95 ms':>10}{'recall@k':>10}")
+        for size, (_, query_vectors, snapshot) in tenants.items():
+            latencies, recalls = [], []
+            for query in query_vectors:
+                start = time.perf_counter()
+                points = await service._search_points(
+                    collection_name, query.tolist(), limit, "tenant", str(size)
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                exact = {size * 10 + hit.id for hit in snapshot.search(query, limit)}
+                recalls.append(len(exact & {hit.id for hit in points}) / len(exact))
+            p50, p95 = _percentiles(latencies)
+            print(f"{size:>8}{p50:>10.3f}{p95:>10.3f}{statistics.mean(recalls):>10.3f}")
+    finally:
+        await asyncio.to_thread(service.client.delete_collection, collection_name)
+        await service.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="200,2000,20000", help="Comma-separated tenant sizes")
+    parser.add_argument("--limit", type=int, default=10, help="Search result size (top-k)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--live", action="store_true", help="Also benchmark against a running Qdrant")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    with tempfile.TemporaryDirectory() as directory:
+        tenants = offline(sizes, args.limit, args.queries, directory)
+        if args.live:
+            asyncio.run(live(tenants, args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+REST vs gRPC encode/decode cost for Qdrant searches at our payload sizes.
+
+Offline (default): serializes a search request (384-float query vector plus a
+crawl_id filter) and decodes a search response (top-k points carrying ~800
+character markdown chunks, as produced by ChunkingService) with both
+transports' wire formats: JSON for REST, protobuf for gRPC.
+
+Live (--live): also measures end-to-end search latency against the Qdrant at
+QDRANT_URL / QDRANT_GRPC_PORT using a temporary collection.
+
+Usage (from backend/):
+    python benchmarks/qdrant_transport.py
+    python benchmarks/qdrant_transport.py --limit 20 --iterations 5000
+    python benchmarks/qdrant_transport.py --live
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import grpc
+from qdrant_client.conversions.conversion import GrpcToRest, payload_to_grpc
+
+DIMENSION = 384
+CHUNK_CHARS = 800
+
+
+def _sample_payload(i: int, rng: np.random.Generator) -> dict:
+    words = ["qdrant", "vector", "search", "crawl", "chunk", "markdown", "page", "index"]
+    text = " ".join(rng.choice(words, size=CHUNK_CHARS // 7))[:CHUNK_CHARS]
+    return {
+        "page_id": f"{uuid.uuid4()}_chunk_{i}",
+        "url": f"https://example.com/docs/page-{i}",
+        "base_url": "https://example.com",
+        "markdown": text,
+        "title": f"Example page {i}",
+        "description": "An example page used for the transport benchmark",
+        "crawl_id": "3f2b8c1e-0000-4000-8000-000000000000",
+        "chunk_index": i % 5,
+        "total_chunks": 5,
+        "original_page_id": str(uuid.uuid4()),
+    }
+
+
+def _time(func, iterations: int) -> float:
+    """Mean microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def offline(limit: int, iterations: int):
+    rng = np.random.default_rng(0)
+    vector = rng.random(DIMENSION, dtype=np.float32).tolist()
+    crawl_id = "3f2b8c1e-0000-4000-8000-000000000000"
+    payloads = [_sample_payload(i, rng) for i in range(limit)]
+    scores = sorted(rng.random(limit).tolist(), reverse=True)
+
+    # ---- REST (JSON) ----
+    rest_request = {
+        "vector": vector,
+        "limit": limit,
+        "with_payload": True,
+        "filter": {"must": [{"key": "crawl_id", "match": {"value": crawl_id}}]},
+    }
+    rest_response = json.dumps(
+        {
+            "result": [
+                {"id": i, "version": 1, "score": score, "payload": payload}
+                for i, (score, payload) in enumerate(zip(scores, payloads))
+            ],
+            "status": "ok",
+            "time": 0.001,
+        }
+    ).encode()
+
+    def rest_encode():
+        json.dumps(rest_request).encode()
+
+    def rest_decode():
+        json.loads(rest_response)["result"]
+
+    # ---- gRPC (protobuf) ----
+    def build_grpc_request():
+        return grpc.SearchPoints(
+            collection_name="scraped_pages",
+            vector=vector,
+            limit=limit,
+            with_payload=grpc.WithPayloadSelector(enable=True),
+            filter=grpc.Filter(
+                must=[
+                    grpc.Condition(
+                        field=grpc.FieldCondition(
+                            key="crawl_id", match=grpc.Match(keyword=crawl_id)
+                        )
+                    )
+                ]
+            ),
+        )
+
+    grpc_request = build_grpc_request().SerializeToString()
+    grpc_response = grpc.SearchResponse(
+        result=[
+            grpc.ScoredPoint(
+                id=grpc.PointId(num=i),
+                score=score,
+                version=1,
+                payload=payload_to_grpc(payload),
+            )
+            for i, (score, payload) in enumerate(zip(scores, payloads))
+        ]
+    ).SerializeToString()
+
+    def grpc_encode():
+        build_grpc_request().SerializeToString()
+
+    def grpc_decode():
+        # Includes conversion to Python dicts, as the client does
+        response = grpc.SearchResponse.FromString(grpc_response)
+        [GrpcToRest.convert_scored_point(point) for point in response.result]
+
+    rest_req_size = len(json.dumps(rest_request).encode())
+    print(f"Search with a {DIMENSION}-dim query vector, top {limit} with ~{CHUNK_CHARS}-char payloads")
+    print(f"{'':14}{'request bytes':>15}{'response bytes':>16}{'encode us':>12}{'decode us':>12}")
+    print(
+        f"{'REST (JSON)':14}{rest_req_size:>15}{len(rest_response):>16}"
+        f"{_time(rest_encode, iterations):>12.1f}{_time(rest_decode, iterations):>12.1f}"
+    )
+    print(
+        f"{'gRPC (proto)':14}{len(grpc_request):>15}{len(grpc_response):>16}"
+        f"{_time(grpc_encode, iterations):>12.1f}{_time(grpc_decode, iterations):>12.1f}"
+    )
+
+
+def live(limit: int, iterations: int, points: int):
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import (
+        Batch,
+        Distance,
+        FieldCondition,
+        Filter,
+        MatchValue,
+        VectorParams,
+    )
+    from config import QDRANT_URL, QDRANT_API_KEY, QDRANT_GRPC_PORT
+
+    rng = np.random.default_rng(1)
+    collection_name = f"transport_bench_{uuid.uuid4().hex[:8]}"
+    rest = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    grpc_client = QdrantClient(
+        url=QDRANT_URL, api_key=QDRANT_API_KEY, prefer_grpc=True, grpc_port=QDRANT_GRPC_PORT
+    )
+
+    rest.create_collection(
+        collection_name, vectors_config=VectorParams(size=DIMENSION, distance=Distance.COSINE)
+    )
+    try:
+        payloads = [_sample_payload(i, rng) for i in range(points)]
+        for i in range(0, points, 256):
+            rest.upsert(
+                collection_name,
+                points=Batch(
+                    ids=list(range(i, min(i + 256, points))),
+                    vectors=rng.random((min(256, points - i), DIMENSION), dtype=np.float32).tolist(),
+                    payloads=payloads[i : i + 256],
+                ),
+            )
+        query_filter = Filter(
+            must=[FieldCondition(key="crawl_id", match=MatchValue(value=payloads[0]["crawl_id"]))]
+        )
+
+        print(f"\nLive search latency ({points} points, top {limit}, {iterations} queries)")
+        for name, client in (("REST", rest), ("gRPC", grpc_client)):
+            latencies = []
+            for _ in range(iterations):
+                vector = rng.random(DIMENSION, dtype=np.float32).tolist()
+                start = time.perf_counter()
+                client.query_points(
+                    collection_name,
+                    query=vector,
+                    query_filter=query_filter,
+                    limit=limit,
+                    with_payload=True,
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"  {name}: p50 {statistics.median(latencies):.2f} ms, p95 {p95:.2f} ms")
+    finally:
+        rest.delete_collection(collection_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--limit", type=int, default=10, help="Search result size (top-k)")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--live", action="store_true", help="Also benchmark against a running Qdrant")
+    parser.add_argument("--points", type=int, default=2000, help="Points in the live benchmark collection")
+    args = parser.parse_args()
+
+    offline(args.limit, args.iterations)
+    if args.live:
+        live(args.limit, min(args.iterations, 500), args.points)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,41 @@ load_dotenv()
 # FireCrawl Configuration
 FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
 
+# Scraper engine: "firecrawl" (hosted FireCrawl API) or "http" (built-in async
+# crawler: plain HTTP fetches converted to markdown in-process, no JavaScript)
+SCRAPER_ENGINE = os.getenv("SCRAPER_ENGINE", "firecrawl").lower()
+# Built-in crawler: pages per crawl, fetches in flight per crawl and per host
+CRAWLER_MAX_PAGES = int(os.getenv("CRAWLER_MAX_PAGES", "100"))
+CRAWLER_CONCURRENCY = int(os.getenv("CRAWLER_CONCURRENCY", "16"))
+CRAWLER_PER_HOST_CONCURRENCY = int(os.getenv("CRAWLER_PER_HOST_CONCURRENCY", "8"))
+# Per-request timeout (seconds); larger responses than CRAWLER_MAX_PAGE_BYTES are skipped
+CRAWLER_TIMEOUT = float(os.getenv("CRAWLER_TIMEOUT", "15"))
+CRAWLER_MAX_PAGE_BYTES = int(os.getenv("CRAWLER_MAX_PAGE_BYTES", str(5 * 1024 * 1024)))
+CRAWLER_USER_AGENT = os.getenv(
+    "CRAWLER_USER_AGENT", "Mozilla/5.0 (compatible; WebScraperRAGBot/1.0)"
+)
+# HTTP 429/5xx pause the host (exponential backoff up to CRAWLER_MAX_BACKOFF
+# seconds, or as long as Retry-After says); the page is retried this many times
+CRAWLER_MAX_RETRIES = int(os.getenv("CRAWLER_MAX_RETRIES", "3"))
+CRAWLER_MAX_BACKOFF = float(os.getenv("CRAWLER_MAX_BACKOFF", "60"))
+# Seed crawls and deep scrapes from robots.txt and sitemaps (robots.txt
+# Disallow rules are then honored); sitemap files read per crawl, nested
+# ones included, and uncompressed bytes read per sitemap
+SITEMAP_DISCOVERY = os.getenv("SITEMAP_DISCOVERY", "true").lower() == "true"
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", "50"))
+SITEMAP_MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Deep scrape scheduler: requests in flight (total and per host), request
+# rates in requests/second (0 = unlimited), the longest pause after an HTTP
+# 429/5xx, retries of a throttled page and pages per deep scrape
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "8"))
+SCRAPE_HOST_CONCURRENCY = int(os.getenv("SCRAPE_HOST_CONCURRENCY", "4"))
+SCRAPE_GLOBAL_RATE = float(os.getenv("SCRAPE_GLOBAL_RATE", "10"))
+SCRAPE_HOST_RATE = float(os.getenv("SCRAPE_HOST_RATE", "2"))
+SCRAPE_MAX_BACKOFF = float(os.getenv("SCRAPE_MAX_BACKOFF", "60"))
+SCRAPE_MAX_RETRIES = int(os.getenv("SCRAPE_MAX_RETRIES", "3"))
+DEEP_SCRAPE_MAX_PAGES = int(os.getenv("DEEP_SCRAPE_MAX_PAGES", "200"))
+
 # Google Gemini Configuration (for chat/RAG, not embeddings)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GEMINI_MODEL = "gemini-flash-latest"  # or "gemini-1.5-pro" for better quality
@@ -18,6 +53,27 @@ GEMINI_MODEL = "gemini-flash-latest"  # or "gemini-1.5-pro" for better quality
 EMBEDDING_MODEL_NAME = os.getenv(
     "EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"
 )
+# Embedding backend: "api" (Hugging Face Inference API) or "local" (in-process ONNX Runtime on CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "api").lower()
+# CPU threads for the local backend (0 = use all cores)
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+# Optional directory with model.onnx + tokenizer.json (otherwise downloaded once from the Hub)
+EMBEDDING_LOCAL_MODEL_PATH = os.getenv("EMBEDDING_LOCAL_MODEL_PATH")
+# Max embedding API batches in flight at once (halved automatically on HTTP 429)
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# Token limits for embedding batches (0 = use the model's known input limit, e.g. 256 for MiniLM)
+EMBEDDING_MAX_TOKENS_PER_TEXT = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_TEXT", "0"))
+EMBEDDING_MAX_TOKENS_PER_BATCH = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_BATCH", "8192"))
+# Query embeddings arriving within this window are sent as one batch
+QUERY_EMBEDDING_MAX_WAIT_MS = float(os.getenv("QUERY_EMBEDDING_MAX_WAIT_MS", "5"))
+QUERY_EMBEDDING_MAX_BATCH = int(os.getenv("QUERY_EMBEDDING_MAX_BATCH", "32"))
+# In-memory LRU cache for query embeddings (entries, seconds)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+# Persistent embedding cache keyed by (model, chunk text) - skips re-embedding unchanged chunks
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 # Use models endpoint (router handles routing automatically)
 HUGGINGFACE_API_URL = (
@@ -41,6 +97,135 @@ EMBEDDING_DIMENSION = int(
     os.getenv("EMBEDDING_DIMENSION", "384")
 )  # 384 for all-MiniLM-L6-v2, 1024 for bge-m3
 
+# Qdrant storage profile (applied to new collections; use POST /api/vector-store/profile/apply
+# to update existing ones)
+# Quantization: "none", "scalar" (int8, ~4x less RAM) or "binary" (~32x less RAM, lower recall)
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none").lower()
+# Keep quantized vectors in RAM even when originals live on disk
+QDRANT_QUANTIZATION_ALWAYS_RAM = (
+    os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+)
+# Store original float32 vectors on disk (memmap) instead of RAM
+QDRANT_VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() == "true"
+# HNSW graph params (Qdrant defaults: m=16, ef_construct=100); QDRANT_HNSW_EF=0 uses Qdrant's default
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+QDRANT_HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "0"))
+# Rescore quantized search results with the original vectors
+QDRANT_RESCORE = os.getenv("QDRANT_RESCORE", "true").lower() == "true"
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+
+# Chunk text is kept out of Qdrant payloads in a compressed, content-addressed
+# SQLite store (payloads carry a chunk_hash); text is fetched for final results only.
+# Points written before this keep their inline "markdown" and still work.
+# Off by default: the store must live on persistent storage that every API
+# process shares and that outlives the container, or the text of indexed
+# chunks is lost while Qdrant (possibly remote) keeps their points.
+CHUNK_STORE_ENABLED = os.getenv("CHUNK_STORE_ENABLED", "false").lower() == "true"
+# Required when enabled, e.g. a mounted volume: /data/chunks.sqlite3
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "")
+# Seconds between mark-and-sweep passes that delete texts no point refers to (0 = never)
+CHUNK_STORE_GC_INTERVAL_SECONDS = float(os.getenv("CHUNK_STORE_GC_INTERVAL_SECONDS", "86400"))
+# Texts written less than this many seconds before a GC pass are kept: their
+# points may still be in flight (retried or wait=False upserts) while the pass
+# scans Qdrant. Must exceed the longest time from storing a text to its upsert.
+CHUNK_STORE_GC_GRACE_SECONDS = float(os.getenv("CHUNK_STORE_GC_GRACE_SECONDS", "3600"))
+# "zlib" or "zstd" (requires the zstandard package)
+CHUNK_STORE_COMPRESSION = os.getenv("CHUNK_STORE_COMPRESSION", "zlib").lower()
+
+# Pooled async HTTP client for Qdrant REST calls (search / count / delete).
+# Connections are kept alive between requests; HTTP/2 multiplexes concurrent
+# requests over one connection (requires the h2 package: httpx[http2]).
+QDRANT_HTTP2 = os.getenv("QDRANT_HTTP2", "true").lower() == "true"
+QDRANT_HTTP_MAX_CONNECTIONS = int(os.getenv("QDRANT_HTTP_MAX_CONNECTIONS", "100"))
+QDRANT_HTTP_MAX_KEEPALIVE = int(os.getenv("QDRANT_HTTP_MAX_KEEPALIVE", "20"))
+# Seconds an idle connection stays in the pool
+QDRANT_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("QDRANT_HTTP_KEEPALIVE_EXPIRY", "30"))
+# Per-operation timeouts (seconds)
+QDRANT_CONNECT_TIMEOUT = float(os.getenv("QDRANT_CONNECT_TIMEOUT", "5"))
+QDRANT_SEARCH_TIMEOUT = float(os.getenv("QDRANT_SEARCH_TIMEOUT", "10"))
+QDRANT_COUNT_TIMEOUT = float(os.getenv("QDRANT_COUNT_TIMEOUT", "10"))
+QDRANT_DELETE_TIMEOUT = float(os.getenv("QDRANT_DELETE_TIMEOUT", "30"))
+# Log serialize / network / decode timings and error bodies of every Qdrant search
+QDRANT_DEBUG = os.getenv("QDRANT_DEBUG", "false").lower() == "true"
+# Seconds before reconnecting after Qdrant was unreachable
+QDRANT_RECONNECT_INTERVAL = float(os.getenv("QDRANT_RECONNECT_INTERVAL", "30"))
+
+# In-process brute-force index (NumPy). Tenants (crawls / widget sites) up to
+# LOCAL_INDEX_SNAPSHOT_MAX_POINTS chunks get a snapshot on disk that keeps them
+# searchable when Qdrant is down; tenants up to LOCAL_INDEX_MAX_POINTS are
+# always searched locally, skipping the network hop.
+LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX_ENABLED", "true").lower() == "true"
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".cache/local_index")
+LOCAL_INDEX_MAX_POINTS = int(os.getenv("LOCAL_INDEX_MAX_POINTS", "2000"))
+LOCAL_INDEX_SNAPSHOT_MAX_POINTS = int(os.getenv("LOCAL_INDEX_SNAPSHOT_MAX_POINTS", "20000"))
+# Snapshots kept open in memory
+LOCAL_INDEX_MAX_TENANTS = int(os.getenv("LOCAL_INDEX_MAX_TENANTS", "256"))
+# Seconds before a snapshot is re-checked against Qdrant (catches writes from other processes)
+LOCAL_INDEX_REVALIDATE_SECONDS = float(os.getenv("LOCAL_INDEX_REVALIDATE_SECONDS", "60"))
+
+# Retrieval mode when a query doesn't choose one: "dense" (vectors only),
+# "lexical" (BM25 only) or "hybrid" (both, merged with reciprocal-rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense").lower()
+# RRF constant k: higher values flatten the contribution of top ranks
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# In-memory BM25 indexes (one per crawl / widget site) and their lifetime in seconds
+LEXICAL_INDEX_CACHE_SIZE = int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", "64"))
+LEXICAL_INDEX_TTL = float(os.getenv("LEXICAL_INDEX_TTL", "600"))
+# Chunks held by all cached BM25 indexes together (least recently used go first)
+LEXICAL_INDEX_MAX_DOCS = int(os.getenv("LEXICAL_INDEX_MAX_DOCS", "200000"))
+# After a write, the previous index keeps answering while a new one is built in
+# the background, at most once per this many seconds (a crawl writes constantly)
+LEXICAL_INDEX_REBUILD_INTERVAL = float(os.getenv("LEXICAL_INDEX_REBUILD_INTERVAL", "30"))
+# Retrieval result cache, keyed by (crawl / site, normalized query, limit,
+# threshold) and the tenant's write version, so writes invalidate it at once.
+# The TTL bounds staleness from writes made by other processes. 0 disables it.
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "2048"))
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", "300"))
+
+# Diversification of retrieved chunks before prompt assembly: near-duplicate
+# chunks (repeated headers / footers / nav) are dropped, then maximal marginal
+# relevance picks the chunks sent to the LLM
+DIVERSIFY_ENABLED = os.getenv("DIVERSIFY_ENABLED", "true").lower() == "true"
+# 1.0 = pure relevance, lower values favour chunks unlike those already picked
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Chunks sent to the LLM (0 = the request's "limit")
+CONTEXT_CHUNK_BUDGET = int(os.getenv("CONTEXT_CHUNK_BUDGET", "0"))
+# Word-shingle Jaccard similarity at which two chunks count as duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+SHINGLE_SIZE = int(os.getenv("SHINGLE_SIZE", "5"))
+
+# Maximum queries per POST /api/search/batch request
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "64"))
+
+# Opt-in gRPC transport for search / count / upsert / delete (binary protobuf
+# instead of JSON; port 6334 is exposed in docker-compose.yml)
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+
+# Qdrant writes run off the event loop; large upserts are split into
+# sub-batches sent concurrently (at most QDRANT_WRITE_CONCURRENCY at a time)
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "64"))
+QDRANT_WRITE_CONCURRENCY = int(os.getenv("QDRANT_WRITE_CONCURRENCY", "4"))
+
+# Crawled pages are chunked, embedded and stored while the crawl is still
+# running: chunks are sent in batches of up to INGEST_BATCH_CHUNKS, with at
+# most INGEST_MAX_INFLIGHT_BATCHES embedding at once (chunks queue up meanwhile)
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "64"))
+INGEST_MAX_INFLIGHT_BATCHES = int(os.getenv("INGEST_MAX_INFLIGHT_BATCHES", "2"))
+
+# Online re-index (model / dimension changes). Collections are versioned
+# (e.g. scraped_pages_v1718000000000) and reads go through an alias, so a
+# re-index builds a new collection and switches the alias when it is done.
+# Start a re-index automatically on startup when a dimension mismatch is found
+QDRANT_AUTO_REINDEX = os.getenv("QDRANT_AUTO_REINDEX", "true").lower() == "true"
+# Points re-embedded and written per batch
+REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "256"))
+# Checkpoints used to resume an interrupted re-index
+REINDEX_STATE_DIR = os.getenv("REINDEX_STATE_DIR", ".cache/reindex")
+# Keep the previous collection after the alias switch (for rollback)
+QDRANT_REINDEX_KEEP_OLD = os.getenv("QDRANT_REINDEX_KEEP_OLD", "false").lower() == "true"
+
 # Widget-specific Supabase Configuration (separate from main app)
 WIDGET_SUPABASE_URL = os.getenv("WIDGET_SUPABASE_URL")
 WIDGET_SUPABASE_KEY = os.getenv("WIDGET_SUPABASE_KEY")
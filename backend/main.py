@@ -1,12 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import config  # Load environment variables first
-from routes import router
+from routes import router, reindex_manager, vector_store_service, scraper_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume interrupted re-index jobs / re-index after an embedding model change
+    await reindex_manager.resume_pending()
+    # Delete chunk store texts no point refers to any more
+    chunk_gc = None
+    if vector_store_service.chunk_store is not None and config.CHUNK_STORE_GC_INTERVAL_SECONDS > 0:
+        chunk_gc = asyncio.create_task(vector_store_service.run_chunk_gc())
+    yield
+    if chunk_gc is not None:
+        chunk_gc.cancel()
+    # Close pooled Qdrant and crawler connections
+    await vector_store_service.aclose()
+    await scraper_service.aclose()
+
 
 app = FastAPI(
     title="Web Scraper & RAG Chatbot API",
     description="Backend API for web scraping and RAG-powered chatbot",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS - Allow all origins for development (including file:// protocol for widget demo)
@@ -32,10 +52,17 @@ async def root():
             "get_pages": "GET /api/pages",
             "get_page": "GET /api/pages/{page_id}",
             "query": "POST /api/query",
+            "search_batch": "POST /api/search/batch",
             "create_chat": "POST /api/chats",
             "get_chat": "GET /api/chats/{chat_id}",
             "list_crawls": "GET /api/crawls",
             "get_crawl": "GET /api/crawls/{crawl_id}",
+            "export_crawl": "GET /api/crawls/{crawl_id}/export",
+            "embedding_stats": "GET /api/embeddings/stats",
+            "retrieval_stats": "GET /api/retrieval/stats",
+            "reindex": "POST /api/vector-store/reindex",
+            "reindex_status": "GET /api/vector-store/reindex",
+            "local_index": "GET /api/vector-store/local-index",
         },
     }
 
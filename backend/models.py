@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 
 class ScrapeRequest(BaseModel):
@@ -7,6 +7,10 @@ class ScrapeRequest(BaseModel):
     max_depth: Optional[int] = 3
     crawl_id: Optional[str] = None  # If not provided, will be generated
     force_refresh: Optional[bool] = False  # Force re-scraping even if data exists
+    engine: Optional[Literal["firecrawl", "http"]] = None  # Defaults to SCRAPER_ENGINE
+    # With force_refresh: update the existing crawl in place, re-embedding only
+    # pages whose content changed (False = scrape into a new crawl)
+    incremental: Optional[bool] = True
 
 
 class PageInfo(BaseModel):
@@ -24,12 +28,15 @@ class ScrapeResponse(BaseModel):
     crawl_id: str  # Unique ID for this crawl session
     chat_id: str  # Chat session ID created during scraping
     message: Optional[str] = None
+    refresh: Optional[Dict[str, int]] = None  # Incremental refresh: changed / added / unchanged / removed pages
 
 
 class QueryRequest(BaseModel):
     query: str
     chat_id: str  # Required: identifies which crawl/chat session to search
     limit: Optional[int] = 5
+    # "dense", "lexical" (BM25) or "hybrid" (RRF of both); None = RETRIEVAL_MODE
+    retrieval_mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
 
 
 class Source(BaseModel):
@@ -86,6 +93,8 @@ class WidgetQueryRequest(BaseModel):
     api_key: str
     query: str
     limit: Optional[int] = 5
+    # "dense", "lexical" (BM25) or "hybrid" (RRF of both); None = RETRIEVAL_MODE
+    retrieval_mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
 
 
 class WidgetQueryResponse(BaseModel):
@@ -94,6 +103,7 @@ class WidgetQueryResponse(BaseModel):
     answer: str
     sources: List[Source]
     site_id: str
+    metadata: Optional[Dict[str, Any]] = None
 
 
 class WidgetRefreshRequest(BaseModel):
@@ -102,6 +112,7 @@ class WidgetRefreshRequest(BaseModel):
     site_id: str
     api_key: str
     pages: List[WidgetPage]  # Pages to re-index
+    full: Optional[bool] = False  # Re-embed every page, even unchanged ones
 
 
 class WidgetRefreshResponse(BaseModel):
@@ -111,6 +122,7 @@ class WidgetRefreshResponse(BaseModel):
     site_id: str
     indexed_page_count: int
     message: str
+    refresh: Optional[Dict[str, int]] = None  # changed / added / unchanged / removed pages
 
 
 class SummarizeRequest(BaseModel):
@@ -122,3 +134,34 @@ class SummarizeResponse(BaseModel):
     chat_id: str
     crawl_id: Optional[str] = None
     metadata: Dict[str, Any]
+
+
+class BatchSearchRequest(BaseModel):
+    """Many queries against one chat's crawl (chat_id) or one widget site (site_id + api_key)."""
+
+    queries: List[str]
+    chat_id: Optional[str] = None
+    site_id: Optional[str] = None
+    api_key: Optional[str] = None  # Required with site_id
+    limit: Optional[int] = 5
+
+
+class SearchHit(BaseModel):
+    page_id: str
+    url: str
+    title: str
+    markdown: str
+    score: float
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class BatchSearchResult(BaseModel):
+    query: str
+    results: List[SearchHit]
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]  # Same order as the request's queries
+    crawl_id: Optional[str] = None
+    site_id: Optional[str] = None
+    metadata: Dict[str, Any]
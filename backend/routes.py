@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
-from typing import List, Optional
-from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import uuid
 import json
+import time
 import asyncio
 from models import (
     ScrapeRequest,
@@ -21,14 +21,28 @@ from models import (
     WidgetRefreshResponse,
     SummarizeRequest,
     SummarizeResponse,
+    BatchSearchRequest,
+    BatchSearchResponse,
+    BatchSearchResult,
+    SearchHit,
+)
+from config import (
+    WIDGET_API_KEY_PREFIX,
+    COLLECTION_NAME,
+    WIDGET_COLLECTION_NAME,
+    SEARCH_BATCH_MAX_QUERIES,
 )
-from config import WIDGET_API_KEY_PREFIX
 from services.scraper import ScraperService
 from services.embeddings import EmbeddingService
 from services.vector_store import VectorStoreService
 from services.rag import RAGService
 from services.database import DatabaseService
 from services.chunking import ChunkingService
+from services.cache import LRUCache
+from services.reindex import ReindexManager
+from services.hybrid import HybridRetriever
+from services.ingest import PageIngestor
+from services.refresh import FINGERPRINT_KEYS, RefreshPlan, REMOVED, UNCHANGED, is_gone
 
 router = APIRouter()
 
@@ -39,31 +53,145 @@ vector_store_service = VectorStoreService()
 rag_service = RAGService()
 db_service = DatabaseService()
 chunking_service = ChunkingService(chunk_size=800, chunk_overlap=200)
+reindex_manager = ReindexManager(vector_store_service, embedding_service)
+retriever = HybridRetriever(vector_store_service, embedding_service)
+
+# In-memory storage with LRU eviction to prevent memory leaks
+scraped_pages_store: LRUCache = LRUCache(maxsize=1000)
 
 
-class LRUCache(OrderedDict):
-    """Thread-safe LRU cache with max size limit to prevent memory leaks."""
+def _record_page(page_data: dict, crawl_id: str):
+    """Store a scraped page in Supabase (root-level, flat list) and in memory."""
+    page_url = page_data["url"]
+    db_service.store_page(
+        crawl_id=crawl_id,
+        url=page_url,
+        title=page_data.get("metadata", {}).get("title", page_url),
+        parent_url=None,  # All pages are root-level
+        metadata=page_data.get("metadata", {}),
+    )
+    scraped_pages_store[page_data["page_id"]] = PageInfo(
+        page_id=page_data["page_id"],
+        url=page_url,
+        base_url=page_data.get("base_url"),
+        markdown=page_data.get("markdown", ""),
+        metadata=page_data.get("metadata", {}),
+        crawl_id=crawl_id,
+    )
 
-    def __init__(self, maxsize: int = 1000):
-        super().__init__()
-        self.maxsize = maxsize
 
-    def __setitem__(self, key, value):
-        if key in self:
-            self.move_to_end(key)
-        super().__setitem__(key, value)
-        while len(self) > self.maxsize:
-            oldest = next(iter(self))
-            del self[oldest]
+def _unmark_failed_pages(ingestor: PageIngestor, crawl_id: str):
+    """
+    Re-record the pages that failed to index without their fingerprint.
 
-    def __getitem__(self, key):
-        value = super().__getitem__(key)
-        self.move_to_end(key)
-        return value
+    Scrapes record pages as they arrive, before their chunks are stored;
+    dropping the hash and validators makes the next refresh re-embed them.
+    """
+    for page_data in ingestor.failed_pages.values():
+        metadata = {
+            key: value
+            for key, value in page_data.get("metadata", {}).items()
+            if key not in FINGERPRINT_KEYS
+        }
+        _record_page({**page_data, "metadata": metadata}, crawl_id)
 
 
-# In-memory storage with LRU eviction to prevent memory leaks
-scraped_pages_store: LRUCache = LRUCache(maxsize=1000)
+def _find_refresh_target(request: ScrapeRequest) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    """Crawl an incremental force_refresh updates in place, with its stored pages."""
+    if not (request.force_refresh and request.incremental):
+        return None
+    if request.crawl_id:
+        crawl = db_service.get_crawl(request.crawl_id)
+    else:
+        crawl = db_service.find_crawl_by_url(request.url)
+    if not crawl:
+        return None
+    pages = db_service.get_crawl_pages(crawl["id"])
+    return (crawl["id"], pages) if pages else None
+
+
+async def _refresh_crawl(
+    crawl_id: str, request: ScrapeRequest, stored_pages: List[Dict[str, Any]]
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Re-crawl an existing crawl, re-embedding only the pages whose content changed.
+
+    Stored pages are re-fetched conditionally where the engine supports it
+    (http: ETag / Last-Modified) and compared by content hash otherwise.
+    Changed and new pages are chunked and embedded; a page's record (and
+    its new content hash) is written once all its chunks are stored, and the
+    old chunks of changed pages are deleted at the end. Pages whose
+    re-embedding failed keep their old chunks and record, so the next
+    refresh tries them again. Only pages the engine reports gone (404/410)
+    lose their chunks and records; pages the refresh did not reach are kept
+    as indexed.
+
+    Yields:
+        (status, page_data) per page (added / changed / unchanged / removed),
+        then ("done", counts) with the changed / added / unchanged / removed /
+        kept counts
+    """
+    plan = RefreshPlan({page["url"]: page.get("metadata") or {} for page in stored_pages})
+    ingestor = PageIngestor(
+        crawl_id,
+        chunking_service,
+        embedding_service,
+        vector_store_service,
+        on_page_stored=lambda page_data: _record_page(page_data, crawl_id),
+    )
+    new_page_ids = []
+    try:
+        async for page_data in scraper_service.scrape_site(
+            url=request.url,
+            max_depth=request.max_depth,
+            crawl_id=crawl_id,
+            engine=request.engine,
+            known=plan.previous,
+        ):
+            if is_gone(page_data):
+                plan.gone(page_data["url"])
+                yield REMOVED, page_data
+                continue
+            status = plan.classify(page_data)
+            if status != UNCHANGED:
+                ingestor.add_page(page_data)  # recorded once its chunks are stored
+                new_page_ids.append(page_data["page_id"])
+            elif not page_data.get("not_modified"):
+                _record_page(page_data, crawl_id)  # fresh validators
+            yield status, page_data
+    except BaseException:
+        await ingestor.cancel()
+        raise
+
+    chunks_stored = await ingestor.finish()
+    for page_url in ingestor.failed_pages:
+        plan.failed(page_url)  # old chunks and record stay until a refresh succeeds
+    await vector_store_service.delete_page_chunks(crawl_id, ingestor.failed_page_ids)
+    for page_url in plan.unreached():
+        plan.keep(page_url)  # crawl limit, throttling, timeouts: not evidence it is gone
+    removed = plan.removed()
+    await vector_store_service.delete_url_chunks(
+        COLLECTION_NAME,
+        crawl_id,
+        plan.changed + removed,
+        keep=("original_page_id", new_page_ids),
+    )
+    if removed:
+        db_service.delete_pages(crawl_id, removed)
+    db_service.update_crawl_page_count(
+        crawl_id, len(plan.previous) + len(plan.added) - len(removed)
+    )
+    yield "done", {**plan.counts(), "chunks_stored": chunks_stored}
+
+
+def _refresh_summary(counts: Dict[str, int]) -> str:
+    summary = (
+        f"{counts['changed']} changed, {counts['added']} new, "
+        f"{counts['unchanged']} unchanged, {counts['removed']} removed"
+    )
+    if counts.get("kept"):
+        summary += f", {counts['kept']} kept (not reached)"
+    return summary + (f", {counts['failed']} failed" if counts.get("failed") else "")
 
 
 async def scrape_stream_generator(request: ScrapeRequest):
@@ -75,6 +203,7 @@ async def scrape_stream_generator(request: ScrapeRequest):
     - Reuses existing data if found (unless force_refresh=True)
     - Creates new chat session for cached data
     - Only scrapes if no cache exists or force_refresh is requested
+    - force_refresh of an existing crawl (incremental=True) re-embeds only changed pages
     """
     try:
         # Stage 1: Initialize
@@ -184,6 +313,36 @@ async def scrape_stream_generator(request: ScrapeRequest):
                     yield f"data: {json.dumps({'stage': 'complete', 'message': 'Loaded from cache!', 'chat_id': chat_id, 'crawl_id': crawl_id, 'page_count': len(pages_data), 'from_cache': True, 'progress': 100})}\n\n"
                     return
 
+        # Incremental refresh: update the existing crawl in place
+        refresh_target = _find_refresh_target(request)
+        if refresh_target:
+            crawl_id, stored_pages = refresh_target
+            existing_chat = db_service.find_chat_by_crawl_id(crawl_id)
+            chat_id = existing_chat["id"] if existing_chat else db_service.create_chat(crawl_id)
+
+            yield f"data: {json.dumps({'stage': 'refreshing', 'message': f'Checking {len(stored_pages)} indexed pages for changes...', 'chat_id': chat_id, 'crawl_id': crawl_id, 'progress': 10})}\n\n"
+
+            counts = {}
+            checked = 0
+            async for status, data in _refresh_crawl(crawl_id, request, stored_pages):
+                if status == "done":
+                    counts = data
+                    continue
+                checked += 1
+                page_url = data["url"]
+                progress = min(10 + checked * 70 // max(len(stored_pages), 1), 80)
+                yield f"data: {json.dumps({'stage': 'page_refreshed', 'status': status, 'message': f'{page_url}: {status}', 'url': page_url, 'progress': progress})}\n\n"
+
+            if not checked:
+                yield f"data: {json.dumps({'stage': 'error', 'message': 'No pages could be re-fetched; the existing index was kept'})}\n\n"
+                return
+
+            summary = _refresh_summary(counts)
+            db_service.store_message(chat_id, "ai", f"**Index Refreshed**\n\n{summary}.")
+            page_count = counts["changed"] + counts["added"] + counts["unchanged"] + counts["kept"]
+            yield f"data: {json.dumps({'stage': 'complete', 'message': f'Refresh complete: {summary}', 'chat_id': chat_id, 'crawl_id': crawl_id, 'page_count': page_count, 'from_cache': False, 'refresh': counts, 'progress': 100})}\n\n"
+            return
+
         # Generate or use provided crawl_id
         if request.crawl_id:
             crawl_id = request.crawl_id
@@ -200,123 +359,40 @@ async def scrape_stream_generator(request: ScrapeRequest):
         # Stage 2: Scraping
         yield f"data: {json.dumps({'stage': 'scraping', 'message': 'Scraping website pages...', 'progress': 20})}\n\n"
 
-        pages_data = await scraper_service.scrape_site(
-            url=request.url, max_depth=request.max_depth, crawl_id=crawl_id
+        # Pages are chunked and embedded as they arrive, overlapping with the crawl
+        pages_data = []
+        ingestor = PageIngestor(
+            crawl_id, chunking_service, embedding_service, vector_store_service
         )
+        try:
+            async for page_data in scraper_service.scrape_site(
+                url=request.url,
+                max_depth=request.max_depth,
+                crawl_id=crawl_id,
+                engine=request.engine,
+            ):
+                pages_data.append(page_data)
+                _record_page(page_data, crawl_id)
+                ingestor.add_page(page_data)
+
+                page_url = page_data["url"]
+                progress = min(20 + len(pages_data), 60)
+                yield f"data: {json.dumps({'stage': 'page_scraped', 'message': f'Scraped {page_url}', 'url': page_url, 'page_count': len(pages_data), 'progress': progress})}\n\n"
+        except BaseException:
+            await ingestor.cancel()
+            raise
 
         if not pages_data:
             yield f"data: {json.dumps({'stage': 'error', 'message': 'No pages were scraped'})}\n\n"
             return
 
-        yield f"data: {json.dumps({'stage': 'scraped', 'message': f'Scraped {len(pages_data)} pages successfully', 'progress': 40})}\n\n"
-
-        # Stage 3: Storing pages
-        yield f"data: {json.dumps({'stage': 'storing', 'message': 'Storing page data...', 'progress': 50})}\n\n"
-
-        # Store all pages as root-level entries (flat list for sidebar display)
-        for page_data in pages_data:
-            page_url = page_data["url"]
-            title = page_data.get("metadata", {}).get("title", page_url)
+        yield f"data: {json.dumps({'stage': 'scraped', 'message': f'Scraped {len(pages_data)} pages successfully', 'progress': 60})}\n\n"
 
-            db_service.store_page(
-                crawl_id=crawl_id,
-                url=page_url,
-                title=title,
-                parent_url=None,  # All pages are root-level
-                metadata=page_data.get("metadata", {}),
-            )
-
-        yield f"data: {json.dumps({'stage': 'stored', 'message': 'Pages stored successfully', 'progress': 60})}\n\n"
-
-        # Stage 4: Generating embeddings - Optimized with batching and parallelization - Optimized with batching and parallelization
+        # Stage 3: Finishing embeddings still in flight
         yield f"data: {json.dumps({'stage': 'embedding', 'message': 'Generating embeddings...', 'progress': 70})}\n\n"
 
-        # Collect all chunks from all pages first
-        all_page_chunks = []
-        for page_data in pages_data:
-            markdown = page_data.get("markdown", "")
-            if markdown and len(markdown.strip()) > 0:
-                try:
-                    chunks = chunking_service.chunk_markdown(markdown)
-                    if chunks:
-                        all_page_chunks.append(
-                            {
-                                "page_data": page_data,
-                                "chunks": chunks,
-                                "markdown": markdown,
-                            }
-                        )
-                except Exception as e:
-                    print(f"Warning: Failed to chunk {page_data['url']}: {str(e)}")
-
-            # Store page info
-            page_info = PageInfo(
-                page_id=page_data["page_id"],
-                url=page_data["url"],
-                base_url=page_data.get("base_url"),
-                markdown=page_data.get("markdown", ""),
-                metadata=page_data.get("metadata", {}),
-                crawl_id=crawl_id,
-            )
-            scraped_pages_store[page_data["page_id"]] = page_info
-
-        # Batch generate embeddings for ALL chunks at once (major optimization)
-        total_chunks_stored = 0
-        if all_page_chunks:
-            # Flatten all chunk texts
-            all_chunk_texts = []
-            chunk_metadata = []  # Keep track of which chunk belongs to which page
-
-            for page_chunk_data in all_page_chunks:
-                page_data = page_chunk_data["page_data"]
-                chunks = page_chunk_data["chunks"]
-
-                for idx, chunk in enumerate(chunks):
-                    all_chunk_texts.append(chunk["text"])
-                    chunk_metadata.append(
-                        {"page_data": page_data, "chunk": chunk, "idx": idx}
-                    )
-
-            # Generate ALL embeddings in one batch call
-            try:
-                all_embeddings = await embedding_service.generate_embeddings(
-                    all_chunk_texts
-                )
-
-                # Prepare all data for batch storage
-                embeddings_batch = []
-                for embedding, meta in zip(all_embeddings, chunk_metadata):
-                    chunk_id = f"{meta['page_data']['page_id']}_chunk_{meta['idx']}"
-                    embeddings_batch.append(
-                        {
-                            "page_id": chunk_id,
-                            "url": meta["page_data"]["url"],
-                            "markdown": meta["chunk"]["text"],
-                            "embedding": embedding,
-                            "metadata": {
-                                **meta["page_data"].get("metadata", {}),
-                                "chunk_index": meta["chunk"]["chunk_index"],
-                                "total_chunks": meta["chunk"]["total_chunks"],
-                                "original_page_id": meta["page_data"]["page_id"],
-                            },
-                            "crawl_id": crawl_id,
-                            "base_url": meta["page_data"].get("base_url"),
-                        }
-                    )
-
-                # Store all embeddings using batch operation - much faster!
-                batch_size = 100  # Qdrant can handle large batches efficiently
-                for i in range(0, len(embeddings_batch), batch_size):
-                    batch = embeddings_batch[i : i + batch_size]
-                    await vector_store_service.store_embeddings_batch(batch)
-                    total_chunks_stored += len(batch)
-
-            except Exception as e:
-                print(f"Warning: Failed to generate/store embeddings: {str(e)}")
-                import traceback
-
-                traceback.print_exc()
-
+        total_chunks_stored = await ingestor.finish()
+        _unmark_failed_pages(ingestor, crawl_id)
         yield f"data: {json.dumps({'stage': 'embedded', 'message': f'Generated embeddings for {total_chunks_stored} chunks', 'progress': 80})}\n\n"
 
         # Update crawl page count
@@ -383,6 +459,44 @@ async def scrape_website(request: ScrapeRequest):
     Returns scraped pages, crawl_id, and chat_id.
     """
     try:
+        # Incremental refresh: update the existing crawl in place
+        refresh_target = _find_refresh_target(request)
+        if refresh_target:
+            crawl_id, stored_pages = refresh_target
+            existing_chat = db_service.find_chat_by_crawl_id(crawl_id)
+            chat_id = existing_chat["id"] if existing_chat else db_service.create_chat(crawl_id)
+
+            counts = {}
+            refreshed_ids = []
+            async for status, data in _refresh_crawl(crawl_id, request, stored_pages):
+                if status == "done":
+                    counts = data
+                elif status not in (UNCHANGED, REMOVED):
+                    refreshed_ids.append(data["page_id"])
+            # Pages are recorded once stored, so failed ones are not in the store
+            updated_pages = [
+                scraped_pages_store[page_id]
+                for page_id in refreshed_ids
+                if page_id in scraped_pages_store
+            ]
+
+            if not any(counts.get(key) for key in ("changed", "added", "unchanged", "removed")):
+                raise HTTPException(
+                    status_code=404,
+                    detail="No pages could be re-fetched; the existing index was kept.",
+                )
+
+            summary = _refresh_summary(counts)
+            db_service.store_message(chat_id, "ai", f"**Index Refreshed**\n\n{summary}.")
+            return ScrapeResponse(
+                success=True,
+                pages=updated_pages,
+                crawl_id=crawl_id,
+                chat_id=chat_id,
+                message=f"Refreshed crawl: {summary}",
+                refresh=counts,
+            )
+
         # Generate or use provided crawl_id
         if request.crawl_id:
             crawl_id = request.crawl_id
@@ -395,10 +509,24 @@ async def scrape_website(request: ScrapeRequest):
         # Create chat session immediately
         chat_id = db_service.create_chat(crawl_id)
 
-        # Scrape the website
-        pages_data = await scraper_service.scrape_site(
-            url=request.url, max_depth=request.max_depth, crawl_id=crawl_id
+        # Scrape the website; pages are chunked and embedded as they arrive
+        pages_data = []
+        ingestor = PageIngestor(
+            crawl_id, chunking_service, embedding_service, vector_store_service
         )
+        try:
+            async for page_data in scraper_service.scrape_site(
+                url=request.url,
+                max_depth=request.max_depth,
+                crawl_id=crawl_id,
+                engine=request.engine,
+            ):
+                pages_data.append(page_data)
+                _record_page(page_data, crawl_id)
+                ingestor.add_page(page_data)
+        except BaseException:
+            await ingestor.cancel()
+            raise
 
         if not pages_data:
             raise HTTPException(
@@ -406,107 +534,8 @@ async def scrape_website(request: ScrapeRequest):
                 detail="No pages were scraped. Please check the URL and try again.",
             )
 
-        # Store pages in Supabase - all pages as root-level (flat list)
-        for page_data in pages_data:
-            page_url = page_data["url"]
-            title = page_data.get("metadata", {}).get("title", page_url)
-
-            # Store in Supabase
-            db_service.store_page(
-                crawl_id=crawl_id,
-                url=page_url,
-                title=title,
-                parent_url=None,  # All pages are root-level
-                metadata=page_data.get("metadata", {}),
-            )
-
-        # Generate embeddings and store in vector database using batch processing
-        total_chunks_stored = 0
-
-        # Collect all chunks from all pages first for batch processing
-        all_page_chunks = []
-        for page_data in pages_data:
-            markdown = page_data.get("markdown", "")
-            if markdown and len(markdown.strip()) > 0:
-                try:
-                    chunks = chunking_service.chunk_markdown(markdown)
-                    if chunks:
-                        all_page_chunks.append(
-                            {
-                                "page_data": page_data,
-                                "chunks": chunks,
-                                "markdown": markdown,
-                            }
-                        )
-                except Exception as e:
-                    print(f"Warning: Failed to chunk {page_data['url']}: {str(e)}")
-
-            # Store page info in memory (for backward compatibility)
-            page_info = PageInfo(
-                page_id=page_data["page_id"],
-                url=page_data["url"],
-                base_url=page_data.get("base_url"),
-                markdown=markdown,
-                metadata=page_data.get("metadata", {}),
-                crawl_id=crawl_id,
-            )
-            scraped_pages_store[page_data["page_id"]] = page_info
-
-        # Batch generate embeddings for ALL chunks at once
-        if all_page_chunks:
-            # Flatten all chunk texts
-            all_chunk_texts = []
-            chunk_metadata = []
-
-            for page_chunk_data in all_page_chunks:
-                page_data = page_chunk_data["page_data"]
-                chunks = page_chunk_data["chunks"]
-
-                for idx, chunk in enumerate(chunks):
-                    all_chunk_texts.append(chunk["text"])
-                    chunk_metadata.append(
-                        {"page_data": page_data, "chunk": chunk, "idx": idx}
-                    )
-
-            # Generate ALL embeddings in one batch call
-            try:
-                all_embeddings = await embedding_service.generate_embeddings(
-                    all_chunk_texts
-                )
-
-                # Prepare all data for batch storage
-                embeddings_batch = []
-                for embedding, meta in zip(all_embeddings, chunk_metadata):
-                    chunk_id = f"{meta['page_data']['page_id']}_chunk_{meta['idx']}"
-                    embeddings_batch.append(
-                        {
-                            "page_id": chunk_id,
-                            "url": meta["page_data"]["url"],
-                            "markdown": meta["chunk"]["text"],
-                            "embedding": embedding,
-                            "metadata": {
-                                **meta["page_data"].get("metadata", {}),
-                                "chunk_index": meta["chunk"]["chunk_index"],
-                                "total_chunks": meta["chunk"]["total_chunks"],
-                                "original_page_id": meta["page_data"]["page_id"],
-                            },
-                            "crawl_id": crawl_id,
-                            "base_url": meta["page_data"].get("base_url"),
-                        }
-                    )
-
-                # Store all embeddings using batch operation
-                batch_size = 100
-                for i in range(0, len(embeddings_batch), batch_size):
-                    batch = embeddings_batch[i : i + batch_size]
-                    await vector_store_service.store_embeddings_batch(batch)
-                    total_chunks_stored += len(batch)
-
-            except Exception as e:
-                print(f"Warning: Failed to generate/store embeddings: {str(e)}")
-                import traceback
-
-                traceback.print_exc()
+        total_chunks_stored = await ingestor.finish()
+        _unmark_failed_pages(ingestor, crawl_id)
 
         # Update crawl page count in database
         db_service.update_crawl_page_count(crawl_id, len(pages_data))
@@ -557,9 +586,14 @@ async def scrape_website(request: ScrapeRequest):
             pages=pages,
             crawl_id=crawl_id,
             chat_id=chat_id,
-            message=f"Successfully scraped {len(pages)} pages and created chat session",
+            message=(
+                f"Successfully scraped {len(pages)} pages ({total_chunks_stored} chunks "
+                f"embedded) and created chat session"
+            ),
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
 
@@ -716,6 +750,35 @@ async def get_crawl_tree(crawl_id: str):
     return {"crawl_id": crawl_id, "tree": tree}
 
 
+@router.get("/crawls/{crawl_id}/export")
+async def export_crawl(crawl_id: str, fields: Optional[str] = None):
+    """
+    Export every indexed chunk of a crawl as NDJSON (one chunk per line),
+    ordered by page and chunk index.
+
+    Args:
+        fields: Comma-separated payload fields to include (default: all)
+    """
+    crawl = db_service.get_crawl(crawl_id)
+    if not crawl:
+        raise HTTPException(status_code=404, detail=f"Crawl ID '{crawl_id}' not found")
+
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    async def ndjson_lines():
+        async for page in vector_store_service.iter_crawl_chunks(
+            crawl_id, fields=selected
+        ):
+            for chunk in page:
+                yield json.dumps(chunk) + "\n"
+
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{crawl_id}.ndjson"'},
+    )
+
+
 @router.get("/chats/{chat_id}/tree")
 async def get_chat_tree(chat_id: str):
     """
@@ -772,18 +835,18 @@ async def query_rag(request: QueryRequest):
             chat_id=request.chat_id, role="user", content=request.query
         )
 
-        # Generate embedding for the query
-        query_embedding = await embedding_service.generate_query_embedding(
-            request.query
-        )
-
-        # Search for similar documents (filtered by crawl_id)
+        # Search for relevant chunks (filtered by crawl_id) with the requested
+        # retrieval mode: dense vectors, BM25, or both fused
         # Increase limit to get more relevant chunks
         search_limit = max(
             request.limit, 10
         )  # Get at least 10 chunks for better context
-        similar_docs = await vector_store_service.search_similar(
-            query_embedding=query_embedding, crawl_id=crawl_id, limit=search_limit
+        similar_docs, retrieval_stats = await retriever.search_crawl(
+            request.query,
+            crawl_id=crawl_id,
+            limit=search_limit,
+            mode=request.retrieval_mode,
+            budget=request.limit,
         )
 
         if not similar_docs:
@@ -823,7 +886,7 @@ async def query_rag(request: QueryRequest):
             sources=sources,
             chat_id=request.chat_id,
             crawl_id=crawl_id,
-            metadata=rag_response["metadata"],
+            metadata={**rag_response["metadata"], "retrieval": retrieval_stats},
         )
 
     except HTTPException:
@@ -832,6 +895,83 @@ async def query_rag(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest):
+    """
+    Retrieve chunks for many queries at once (evaluation jobs, related questions).
+    All queries are embedded in one call and searched in a single Qdrant
+    request; results come back in the order of the queries. No LLM call.
+    """
+    try:
+        if not request.queries:
+            raise HTTPException(status_code=400, detail="No queries provided")
+        if len(request.queries) > SEARCH_BATCH_MAX_QUERIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch",
+            )
+
+        crawl_id = None
+        if request.chat_id:
+            crawl_id = db_service.get_crawl_id_from_chat_id(request.chat_id)
+            if not crawl_id:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Chat ID '{request.chat_id}' not found. Please create a chat session first.",
+                )
+        elif request.site_id:
+            if not request.api_key or not _validate_widget_api_key(request.api_key):
+                raise HTTPException(status_code=401, detail="Invalid API key")
+        else:
+            raise HTTPException(status_code=400, detail="chat_id or site_id is required")
+
+        start = time.perf_counter()
+        query_embeddings = await embedding_service.generate_embeddings(request.queries)
+        embed_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        batches = await vector_store_service.search_batch(
+            query_embeddings,
+            crawl_id=crawl_id,
+            site_id=None if crawl_id else request.site_id,
+            limit=request.limit,
+        )
+        search_ms = (time.perf_counter() - start) * 1000
+
+        results = [
+            BatchSearchResult(
+                query=query,
+                results=[
+                    SearchHit(
+                        page_id=doc["page_id"],
+                        url=doc["url"],
+                        title=doc.get("title") or doc.get("label", ""),
+                        markdown=doc.get("markdown", ""),
+                        score=doc["score"],
+                        metadata=doc.get("metadata"),
+                    )
+                    for doc in docs
+                ],
+            )
+            for query, docs in zip(request.queries, batches)
+        ]
+
+        return BatchSearchResponse(
+            results=results,
+            crawl_id=crawl_id,
+            site_id=None if crawl_id else request.site_id,
+            metadata={
+                "queries": len(request.queries),
+                "timings_ms": {"embed": round(embed_ms, 2), "search": round(search_ms, 2)},
+            },
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+
 # ============== Widget API Endpoints ==============
 
 
@@ -883,7 +1023,9 @@ async def widget_init(request: WidgetInitRequest):
 async def widget_refresh(request: WidgetRefreshRequest):
     """
     Refresh embeddings for a widget site.
-    Scrapes all pages and regenerates embeddings.
+    Re-fetches the given pages (conditionally where the scraper engine
+    supports it) and only re-embeds pages whose content changed; pages no
+    longer in the list are removed. full=True re-embeds every page.
     Only call this when developer explicitly wants to update.
     """
     try:
@@ -894,71 +1036,98 @@ async def widget_refresh(request: WidgetRefreshRequest):
         if not request.pages:
             raise HTTPException(status_code=400, detail="No pages provided")
 
-        # Delete existing embeddings for this site
-        await vector_store_service.widget_delete_site_embeddings(request.site_id)
+        if request.full:
+            await vector_store_service.widget_delete_site_embeddings(request.site_id)
+            plan = RefreshPlan({})
+        else:
+            plan = RefreshPlan(
+                await vector_store_service.widget_page_fingerprints(request.site_id)
+            )
+            # The page list is authoritative: indexed pages left off it are gone
+            listed = {page.url for page in request.pages}
+            for page_url in plan.previous:
+                if page_url not in listed:
+                    plan.gone(page_url)
+
+        # Fetch pages concurrently; unchanged pages are dropped right away
+        async def _fetch(page):
+            try:
+                return page, await scraper_service.scrape_page(
+                    page.url, previous=plan.previous.get(page.url)
+                )
+            except Exception as page_error:
+                print(f"Error processing page {page.url}: {str(page_error)}")
+                return page, None
 
-        # Scrape and process each page
         all_embeddings_data = []
+        for page, scraped_data in await asyncio.gather(*(_fetch(p) for p in request.pages)):
+            if not scraped_data or not (
+                scraped_data.get("not_modified") or scraped_data.get("markdown")
+            ):
+                plan.keep(page.url)  # keep what is indexed until it can be fetched
+                continue
+            if plan.classify(scraped_data, url=page.url) == UNCHANGED:
+                continue
 
-        for page in request.pages:
             try:
-                # Scrape the page
-                scraped_data = await scraper_service.scrape_page(page.url)
-                if not scraped_data or not scraped_data.get("markdown"):
-                    continue
-
-                markdown = scraped_data.get("markdown", "")
                 metadata = scraped_data.get("metadata", {})
+                chunks = chunking_service.chunk_markdown(scraped_data["markdown"])
+                if not chunks:
+                    continue
 
-                # Chunk the content
-                chunks = chunking_service.chunk_text(
-                    markdown,
-                    metadata={
-                        "url": page.url,
-                        "title": metadata.get("title", page.label or ""),
-                        "label": page.label or "",
-                    },
-                )
-
-                # Generate embeddings for chunks
-                chunk_texts = [c["text"] for c in chunks]
-                embeddings = await embedding_service.generate_embeddings_batch(
-                    chunk_texts
+                embeddings = await embedding_service.generate_embeddings(
+                    [c["text"] for c in chunks]
                 )
 
                 # Prepare data for storage
                 for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                    page_id = f"{request.site_id}:{page.url}:chunk_{i}"
                     all_embeddings_data.append(
                         {
-                            "page_id": page_id,
+                            "page_id": f"{request.site_id}:{page.url}:chunk_{i}",
                             "url": page.url,
                             "markdown": chunk["text"],
                             "embedding": embedding,
                             "label": page.label or "",
                             "metadata": {
-                                "title": metadata.get("title", ""),
-                                "chunk_index": i,
-                                "total_chunks": len(chunks),
+                                **metadata,
+                                "title": metadata.get("title") or page.label or "",
+                                "chunk_index": chunk["chunk_index"],
+                                "total_chunks": chunk["total_chunks"],
                             },
                         }
                     )
 
             except Exception as page_error:
                 print(f"Error processing page {page.url}: {str(page_error)}")
+                plan.failed(page.url)
                 continue
 
-        # Store all embeddings
+        # Store the new chunks, then drop what they replace: surplus chunks of
+        # changed pages (chunk ids are per URL and index) and removed pages
         if all_embeddings_data:
             await vector_store_service.widget_store_embeddings_batch(
                 request.site_id, all_embeddings_data
             )
+        await vector_store_service.delete_url_chunks(
+            WIDGET_COLLECTION_NAME,
+            request.site_id,
+            plan.changed + plan.removed(),
+            keep=("page_id", [d["page_id"] for d in all_embeddings_data]),
+        )
 
+        counts = plan.counts()
+        _, indexed_count = await vector_store_service.widget_has_embeddings(
+            request.site_id
+        )
         return WidgetRefreshResponse(
             success=True,
             site_id=request.site_id,
-            indexed_page_count=len(all_embeddings_data),
-            message=f"Successfully indexed {len(all_embeddings_data)} chunks from {len(request.pages)} pages.",
+            indexed_page_count=indexed_count,
+            message=(
+                f"Indexed {len(all_embeddings_data)} chunks from {len(request.pages)} pages "
+                f"({_refresh_summary(counts)})."
+            ),
+            refresh=counts,
         )
 
     except HTTPException:
@@ -989,16 +1158,13 @@ async def widget_query(request: WidgetQueryRequest):
                 detail="No embeddings found for this site. Call /widget/refresh first.",
             )
 
-        # Generate query embedding
-        query_embedding = await embedding_service.generate_query_embedding(
-            request.query
-        )
-
-        # Search for similar documents
-        similar_docs = await vector_store_service.widget_search_similar(
-            query_embedding=query_embedding,
+        # Search for relevant chunks with the requested retrieval mode
+        similar_docs, retrieval_stats = await retriever.search_widget(
+            request.query,
             site_id=request.site_id,
             limit=max(request.limit, 10),
+            mode=request.retrieval_mode,
+            budget=request.limit,
         )
 
         if not similar_docs:
@@ -1026,6 +1192,7 @@ async def widget_query(request: WidgetQueryRequest):
             answer=rag_response["answer"],
             sources=sources,
             site_id=request.site_id,
+            metadata={"retrieval": retrieval_stats},
         )
 
     except HTTPException:
@@ -1050,20 +1217,18 @@ async def summarize_page(request: SummarizeRequest):
                 detail=f"Chat ID '{request.chat_id}' not found. Please create a chat session first.",
             )
 
-        # Get all relevant documents for this crawl (no query embedding needed)
-        # We'll use a dummy embedding and high limit to get all content
-        # Better approach: retrieve all chunks for the crawl_id directly
-        from config import EMBEDDING_DIMENSION
-
-        dummy_embedding = [0.0] * EMBEDDING_DIMENSION
-
-        # Get more chunks for comprehensive summary
-        all_docs = await vector_store_service.search_similar(
-            query_embedding=dummy_embedding,
-            crawl_id=crawl_id,
-            limit=50,  # Get more content for summary
-            score_threshold=0.0,  # No filtering, get all content
-        )
+        # Read the crawl's chunks in document order (page, then chunk index)
+        # directly; no query embedding or vector scoring needed
+        max_chunks = 20  # Limit to avoid token limits
+        all_docs = []
+        async for page in vector_store_service.iter_crawl_chunks(
+            crawl_id,
+            fields=["markdown", "title", "url", "original_page_id", "chunk_index"],
+            page_size=max_chunks,
+        ):
+            all_docs.extend(page)
+            if len(all_docs) >= max_chunks:
+                break
 
         if not all_docs:
             raise HTTPException(
@@ -1075,7 +1240,7 @@ async def summarize_page(request: SummarizeRequest):
         combined_content = "\n\n".join(
             [
                 f"Section {i+1}:\n{doc.get('markdown', '')}"
-                for i, doc in enumerate(all_docs[:20])  # Limit to avoid token limits
+                for i, doc in enumerate(all_docs[:max_chunks])
             ]
         )
 
@@ -1132,6 +1297,83 @@ Now provide the summary following this exact format:"""
         raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
 
 
+@router.get("/embeddings/stats")
+async def get_embedding_stats():
+    """
+    Get embedding pipeline metrics (query batching, query cache, concurrency, persistent cache).
+    """
+    return embedding_service.stats()
+
+
+@router.get("/retrieval/stats")
+async def get_retrieval_stats():
+    """
+    Get retrieval cache metrics (result cache hit rate, BM25 index cache).
+    """
+    return retriever.stats()
+
+
+@router.get("/vector-store/profile")
+async def get_vector_store_profile():
+    """
+    Get the configured Qdrant storage profile (quantization, HNSW, on-disk vectors).
+    """
+    return vector_store_service.storage_profile()
+
+
+@router.get("/vector-store/local-index")
+async def get_local_index_stats():
+    """
+    Get the in-process index routing settings and counters (local / fallback searches, builds).
+    """
+    return vector_store_service.local_index_stats()
+
+
+@router.post("/vector-store/profile/apply")
+async def apply_vector_store_profile():
+    """
+    Apply the configured storage profile to the existing Qdrant collections.
+    Qdrant re-optimizes the collections in the background; they stay searchable.
+    """
+    try:
+        results = []
+        for collection_name in (COLLECTION_NAME, WIDGET_COLLECTION_NAME):
+            results.append(
+                await asyncio.to_thread(
+                    vector_store_service.apply_storage_profile, collection_name
+                )
+            )
+        return {"success": True, "collections": results}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to apply storage profile: {str(e)}"
+        )
+
+
+@router.post("/vector-store/reindex")
+async def start_reindex(collection: Optional[str] = None):
+    """
+    Re-embed a collection with the current embedding model into a new
+    versioned collection and switch its alias when done. Reads keep using
+    the current collection meanwhile. Re-indexes both collections by default.
+    """
+    collections = [collection] if collection else [COLLECTION_NAME, WIDGET_COLLECTION_NAME]
+    for name in collections:
+        if name not in (COLLECTION_NAME, WIDGET_COLLECTION_NAME):
+            raise HTTPException(status_code=400, detail=f"Unknown collection: {name}")
+
+    jobs = [reindex_manager.start(name).status_dict() for name in collections]
+    return {"success": True, "jobs": jobs}
+
+
+@router.get("/vector-store/reindex")
+async def get_reindex_status():
+    """
+    Get re-index progress (points processed, throughput, ETA) per collection.
+    """
+    return reindex_manager.status()
+
+
 @router.get("/chats/{chat_id}/history")
 async def get_chat_history(chat_id: str, limit: Optional[int] = None):
     """
@@ -4,12 +4,25 @@ Handles asynchronous crawling of discovered links.
 """
 
 import asyncio
-from typing import Dict, Set
+import functools
+import time
+from typing import Dict, List, Optional, Set
+from config import (
+    SCRAPE_CONCURRENCY,
+    SCRAPE_HOST_CONCURRENCY,
+    SCRAPE_GLOBAL_RATE,
+    SCRAPE_HOST_RATE,
+    SCRAPE_MAX_BACKOFF,
+    SCRAPE_MAX_RETRIES,
+    DEEP_SCRAPE_MAX_PAGES,
+    SITEMAP_DISCOVERY,
+)
 from services.scraper import ScraperService
-from services.embeddings import EmbeddingService
+from services.embeddings import EmbeddingService, _is_rate_limited
 from services.vector_store import VectorStoreService
 from services.database import DatabaseService
 from services.chunking import ChunkingService
+from services.rate_limit import PolitenessScheduler, Throttled
 
 
 class BackgroundTaskManager:
@@ -22,6 +35,15 @@ class BackgroundTaskManager:
         self.vector_store = VectorStoreService()
         self.db_service = DatabaseService()
         self.chunking_service = ChunkingService(chunk_size=800, chunk_overlap=200)
+        # Shared by all deep scrapes, so per-host and FireCrawl limits hold across crawls
+        self.scheduler = PolitenessScheduler(
+            concurrency=SCRAPE_CONCURRENCY,
+            host_concurrency=SCRAPE_HOST_CONCURRENCY,
+            global_rate=SCRAPE_GLOBAL_RATE,
+            host_rate=SCRAPE_HOST_RATE,
+            max_backoff=SCRAPE_MAX_BACKOFF,
+            max_retries=SCRAPE_MAX_RETRIES,
+        )
 
     async def start_deep_scrape(
         self,
@@ -34,6 +56,10 @@ class BackgroundTaskManager:
         """
         Start deep scraping background task.
 
+        Pages go through the shared politeness scheduler as soon as they are
+        discovered, so up to SCRAPE_CONCURRENCY pages are in flight at all
+        times instead of one batch (or depth level) at a time.
+
         Args:
             crawl_id: The crawl session ID
             base_url: Base URL for domain filtering
@@ -47,68 +73,106 @@ class BackgroundTaskManager:
         )
 
         # Track all discovered URLs to avoid duplicates
-        discovered_urls: Set[str] = set(initial_links)
-
-        # Queue initial links as pending pages
-        for link in initial_links:
-            try:
-                self.db_service.add_pending_page(
-                    crawl_id=crawl_id,
-                    url=link,
-                    title="",  # Will be filled in when scraped
-                    depth=1,
-                    discovered_from_page_id=None,  # From root page
-                )
-            except Exception as e:
-                print(f"Error adding pending page {link}: {str(e)}")
-
-        # Update total links found
-        self.db_service.update_crawl_status(crawl_id, total_links=len(discovered_urls))
-
-        # Process pages depth by depth
-        for current_depth in range(1, max_depth + 1):
-            self.db_service.update_crawl_status(crawl_id, current_depth=current_depth)
-
-            # Get pending pages at this depth
-            pending_pages = self.db_service.get_pending_pages(crawl_id, limit=50)
-
-            if not pending_pages:
-                print(f"No more pending pages at depth {current_depth}")
-                break
-
-            print(
-                f"Processing {len(pending_pages)} pages at depth {current_depth}/{max_depth}"
-            )
-
-            # Process pages in batches to avoid overwhelming the API
-            batch_size = 5
-            for i in range(0, len(pending_pages), batch_size):
-                batch = pending_pages[i : i + batch_size]
-
-                # Create tasks for concurrent scraping
-                scrape_tasks = [
-                    self._scrape_and_index_page(
+        discovered_urls: Set[str] = set()
+        allowed = None  # robots.txt rules, once read
+        outstanding: Set[asyncio.Future] = set()
+        finished = asyncio.Event()
+        progress = {"depth": 1, "done": 0}
+        started = time.perf_counter()
+
+        def _queue(links: List[str], depth: int, parent_id: Optional[str]):
+            for link in links:
+                if link in discovered_urls or len(discovered_urls) >= DEEP_SCRAPE_MAX_PAGES:
+                    continue
+                if allowed is not None and not allowed(link):
+                    continue
+                discovered_urls.add(link)
+                try:
+                    page = self.db_service.add_pending_page(
+                        crawl_id=crawl_id,
+                        url=link,
+                        title="",  # Will be filled in when scraped
+                        depth=depth,
+                        discovered_from_page_id=parent_id,
+                    )
+                except Exception as e:
+                    print(f"Error adding pending page {link}: {str(e)}")
+                    continue
+                if not page:
+                    continue  # Already stored for this crawl
+                future = self.scheduler.submit(
+                    link,
+                    functools.partial(
+                        self._scrape_and_index_page,
                         page,
                         crawl_id,
                         base_url,
-                        current_depth,
+                        depth,
                         max_depth,
-                        discovered_urls,
-                    )
-                    for page in batch
-                ]
-
-                # Wait for batch to complete
-                await asyncio.gather(*scrape_tasks, return_exceptions=True)
-
-                # Update total links count
+                    ),
+                )
+                outstanding.add(future)
+                future.add_done_callback(
+                    functools.partial(_on_page_done, page=page, depth=depth)
+                )
+            if depth > progress["depth"] and outstanding:
+                progress["depth"] = depth
+                self.db_service.update_crawl_status(crawl_id, current_depth=depth)
+
+        def _on_page_done(future: asyncio.Future, page: Dict, depth: int):
+            outstanding.discard(future)
+            if not future.cancelled():
+                if future.exception() is not None:
+                    # Still throttled after every retry
+                    print(f"Error scraping {page['url']}: {str(future.exception())}")
+                    self.db_service.update_page_status(page["id"], "failed")
+                elif future.result():
+                    _queue(future.result(), depth + 1, page["id"])
+            progress["done"] += 1
+            if progress["done"] % 10 == 0 or not outstanding:
                 self.db_service.update_crawl_status(
                     crawl_id, total_links=len(discovered_urls)
                 )
+                stats = self.scheduler.stats()
+                print(
+                    f"Deep scrape {crawl_id}: {progress['done']}/{len(discovered_urls)} pages, "
+                    f"{stats['queue_depth']} queued, {stats['in_flight']} in flight, "
+                    f"{stats['throughput']:.1f} pages/s"
+                )
+            if not outstanding:
+                finished.set()
+
+        # Seed from robots.txt and sitemaps before any page is scraped
+        if SITEMAP_DISCOVERY:
+            try:
+                robots, sitemap_urls = await self.scraper.discover(
+                    base_url, DEEP_SCRAPE_MAX_PAGES
+                )
+                allowed = robots.allowed
+                if robots.crawl_delay:
+                    self.scheduler.limit_host(base_url, 1 / robots.crawl_delay)
+                initial_links = list(initial_links) + list(sitemap_urls)
+            except Exception as e:
+                print(f"Sitemap discovery failed for {base_url}: {str(e)}")
+
+        # Queue initial links as pending pages
+        _queue(initial_links, 1, None)  # From root page
+        self.db_service.update_crawl_status(crawl_id, total_links=len(discovered_urls))
+
+        try:
+            if outstanding:
+                await finished.wait()
+        finally:
+            # Cancelled task: drop this crawl's queued and running pages
+            for future in list(outstanding):
+                future.cancel()
 
         # Mark crawl as completed
         self.db_service.update_crawl_status(crawl_id, status="completed")
-        print(f"Deep scrape completed for crawl {crawl_id}")
+        print(
+            f"Deep scrape completed for crawl {crawl_id}: {progress['done']} pages "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
 
     async def _scrape_and_index_page(
         self,
@@ -117,8 +181,7 @@ class BackgroundTaskManager:
         base_url: str,
         current_depth: int,
         max_depth: int,
-        discovered_urls: Set[str],
-    ):
+    ) -> List[str]:
         """
         Scrape a single page, extract links, and index its content.
 
@@ -128,25 +191,40 @@ class BackgroundTaskManager:
             base_url: Base URL for filtering
             current_depth: Current depth level
             max_depth: Maximum depth
-            discovered_urls: Set of all discovered URLs (modified in place)
+
+        Returns:
+            Links to queue at the next depth (empty at max_depth)
+
+        Raises:
+            Throttled: The site or FireCrawl answered 429/5xx; the scheduler
+                backs off and retries the page
         """
         page_id = page["id"]
         url = page["url"]
+        new_links: List[str] = []
 
         try:
             # Mark as being scraped
             self.db_service.update_page_status(page_id, "scraped")
 
             # Scrape the page
-            scraped_data = await self.scraper._scrape_single_page(
-                url, base_url, crawl_id
-            )
+            try:
+                page_data = await self.scraper.scrape_page(url, crawl_id)
+            except Throttled:
+                raise
+            except Exception as e:
+                if _is_rate_limited(e):
+                    raise Throttled(429, host_scoped=False) from e
+                raise
 
-            if not scraped_data or len(scraped_data) == 0:
+            status_code = (page_data or {}).get("metadata", {}).get("statusCode")
+            if isinstance(status_code, int) and (status_code == 429 or status_code >= 500):
+                raise Throttled(status_code)
+
+            if not page_data or page_data.get("gone"):
                 self.db_service.update_page_status(page_id, "failed")
-                return
+                return new_links
 
-            page_data = scraped_data[0]
             markdown = page_data.get("markdown", "")
             title = page_data.get("metadata", {}).get("title", url)
 
@@ -157,22 +235,6 @@ class BackgroundTaskManager:
             if current_depth < max_depth and markdown:
                 new_links = self.scraper.extract_links_from_markdown(markdown, base_url)
 
-                for link in new_links:
-                    if link not in discovered_urls:
-                        discovered_urls.add(link)
-                        # Queue for next depth level
-                        try:
-                            self.db_service.add_pending_page(
-                                crawl_id=crawl_id,
-                                url=link,
-                                title="",
-                                depth=current_depth + 1,
-                                discovered_from_page_id=page_id,
-                            )
-                        except Exception as e:
-                            # Likely duplicate; skip
-                            pass
-
             # Generate and store embeddings
             if markdown and len(markdown.strip()) > 0:
                 try:
@@ -217,10 +279,14 @@ class BackgroundTaskManager:
             # Mark as indexed
             self.db_service.update_page_status(page_id, "indexed")
 
+        except Throttled:
+            raise
         except Exception as e:
             print(f"Error scraping {url}: {str(e)}")
             self.db_service.update_page_status(page_id, "failed")
 
+        return new_links
+
     def start_task(self, crawl_id: str, *args, **kwargs):
         """
         Start a background task for deep scraping.
@@ -247,6 +313,13 @@ class BackgroundTaskManager:
             return True
         return False
 
+    def get_stats(self) -> Dict:
+        """Running deep scrapes plus scheduler queue depth, throughput and host state."""
+        return {
+            "active_crawls": list(self.active_tasks),
+            "scheduler": self.scheduler.stats(),
+        }
+
 
 # Global instance
 background_task_manager = BackgroundTaskManager()
@@ -0,0 +1,187 @@
+"""
+In-memory caches shared by the routes and services.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a max size and optional TTL.
+
+    Supports the dict operations the routes use (`[]`, `in`, `values()`),
+    plus `get_or_compute` for async callers: concurrent misses for the same
+    key share a single computation instead of each running their own.
+
+    With `weigh`, entries are also evicted while their total weight is above
+    `max_weight` (the most recent entry is always kept).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        ttl: Optional[float] = None,
+        max_weight: Optional[float] = None,
+        weigh: Optional[Callable[[Any], float]] = None,
+    ):
+        """
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid (None = no expiry)
+            max_weight: Maximum total weight of the entries (None = no limit)
+            weigh: Weight of a value, e.g. the number of documents it holds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight if weigh is not None else None
+        self.weigh = weigh
+        self.weight = 0.0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.inflight_joins = 0
+
+    def _expired(self, expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at, weight = entry
+            if self._expired(expires_at):
+                del self._data[key]
+                self.weight -= weight
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        weight = self.weigh(value) if self.weigh is not None else 0
+        with self._lock:
+            if key in self._data:
+                self.weight -= self._data[key][2]
+                self._data.move_to_end(key)
+            self._data[key] = (value, expires_at, weight)
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.max_weight is not None
+                and self.weight > self.max_weight
+                and len(self._data) > 1
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self.weight -= evicted[2]
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            if entry is not _MISSING:
+                self.weight -= entry[2]
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0.0
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and not self._expired(entry[1])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def values(self):
+        """Snapshot of all live values, least recently used first."""
+        with self._lock:
+            return [
+                value
+                for value, expires_at, _ in self._data.values()
+                if not self._expired(expires_at)
+            ]
+
+    async def get_or_compute(
+        self, key: Hashable, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return the cached value or compute it once for all concurrent callers.
+
+        The computation runs in its own task, so a cancelled caller doesn't
+        cancel it for the others. Failures are not cached.
+
+        Args:
+            key: Cache key
+            factory: Async callable producing the value on a miss
+
+        Returns:
+            Cached or freshly computed value
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_computed(key, t))
+        else:
+            self.inflight_joins += 1
+
+        return await asyncio.shield(task)
+
+    def _on_computed(self, key: Hashable, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        # exception() also marks the error as retrieved for asyncio
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        stats = {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "inflight": len(self._inflight),
+            "inflight_joins": self.inflight_joins,
+        }
+        if self.max_weight is not None:
+            stats["weight"] = self.weight
+            stats["max_weight"] = self.max_weight
+        return stats
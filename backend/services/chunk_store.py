@@ -0,0 +1,220 @@
+"""
+Compressed, content-addressed store for chunk text.
+
+Qdrant payloads only carry a `chunk_hash` (sha256 of the chunk text) plus
+the fields used for filtering and display; the text itself lives here as a
+compressed blob and is fetched in bulk for the final search results only.
+Identical chunks (repeated headers, footers, re-crawls) are stored once.
+
+Texts no point refers to any more (deleted crawls, replaced pages) are
+removed by a mark-and-sweep pass: the caller collects the chunk_hash of
+every point, and sweep() deletes the other rows written before the scan
+started.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Set
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+# One-byte codec prefix on every blob, so stores can mix codecs
+_ZLIB = b"z"
+_ZSTD = b"s"
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkStore:
+    """SQLite table of compressed chunk texts keyed by content hash."""
+
+    def __init__(self, path: str, compression: str = "zlib"):
+        """
+        Initialize the store.
+
+        Args:
+            path: SQLite database file (created if missing)
+            compression: "zlib" or "zstd" (falls back to zlib if zstandard isn't installed)
+        """
+        self.path = path
+        if compression == "zstd" and zstandard is None:
+            print("zstandard is not installed; chunk store falls back to zlib")
+            compression = "zlib"
+        self.compression = compression
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.writes = 0
+        self.reads = 0
+        self.misses = 0
+        self.swept = 0
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Shared across worker threads; every access goes through self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                written_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        if "written_at" not in columns:  # stores created before garbage collection
+            self._conn.execute(
+                "ALTER TABLE chunks ADD COLUMN written_at REAL NOT NULL DEFAULT 0"
+            )
+        self._conn.commit()
+
+    def _compress(self, text: str) -> bytes:
+        raw = text.encode("utf-8")
+        if self.compression == "zstd":
+            data = _ZSTD + zstandard.ZstdCompressor(level=3).compress(raw)
+        else:
+            data = _ZLIB + zlib.compress(raw, 6)
+        self.bytes_raw += len(raw)
+        self.bytes_stored += len(data)
+        return data
+
+    @staticmethod
+    def _decompress(data: bytes) -> str:
+        codec, body = data[:1], data[1:]
+        if codec == _ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Chunk was stored with zstd but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+        return zlib.decompress(body).decode("utf-8")
+
+    def put_many(self, texts: List[str]) -> List[str]:
+        """
+        Store chunk texts (already stored ones are only marked as written now,
+        so a sweep that started earlier does not delete them).
+
+        Args:
+            texts: Chunk texts
+
+        Returns:
+            Content hash of each text, in order
+        """
+        hashes = [chunk_hash(t) for t in texts]
+        unique = dict(zip(hashes, texts))
+        if not unique:
+            return hashes
+
+        with self._lock:
+            existing = set()
+            keys = list(unique)
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT hash FROM chunks WHERE hash IN ({placeholders})", chunk
+                    )
+                )
+            now = time.time()
+            rows = [
+                (h, self._compress(t), now) for h, t in unique.items() if h not in existing
+            ]
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (hash, data, written_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.executemany(
+                "UPDATE chunks SET written_at = ? WHERE hash = ?",
+                [(now, h) for h in existing],
+            )
+            self._conn.commit()
+            self.writes += len(rows)
+        return hashes
+
+    def get_many(self, hashes: List[str]) -> Dict[str, str]:
+        """
+        Fetch chunk texts in bulk.
+
+        Args:
+            hashes: Content hashes
+
+        Returns:
+            Mapping of hash -> text for every hash found (misses are counted
+            in `misses`)
+        """
+        found: Dict[str, str] = {}
+        keys = list(set(hashes))
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for h, data in self._conn.execute(
+                    f"SELECT hash, data FROM chunks WHERE hash IN ({placeholders})", chunk
+                ):
+                    found[h] = self._decompress(data)
+        self.reads += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def sweep(self, live: Set[str], started_at: float) -> int:
+        """
+        Delete the texts no point refers to.
+
+        Args:
+            live: chunk_hash of every point, collected after `started_at`
+            started_at: time.time() when collecting began; rows written since
+                then may belong to points the scan did not see and are kept
+
+        Returns:
+            Number of texts deleted
+        """
+        with self._lock:
+            candidates = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT hash FROM chunks WHERE written_at < ?", (started_at,)
+                )
+                if row[0] not in live
+            ]
+            for i in range(0, len(candidates), 500):
+                chunk = candidates[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(
+                    f"DELETE FROM chunks WHERE hash IN ({placeholders}) AND written_at < ?",
+                    chunk + [started_at],
+                )
+            self._conn.commit()
+        self.swept += len(candidates)
+        return len(candidates)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Write/read counters and the compression ratio of this process's writes."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return {
+            "path": self.path,
+            "compression": self.compression,
+            "entries": entries,
+            "writes": self.writes,
+            "reads": self.reads,
+            "misses": self.misses,
+            "swept": self.swept,
+            "compression_ratio": (
+                round(self.bytes_raw / self.bytes_stored, 2) if self.bytes_stored else None
+            ),
+        }
@@ -0,0 +1,1008 @@
+"""
+Built-in async HTTP crawler (the "http" scraper engine).
+
+An alternative to the hosted FireCrawl API for sites that serve plain HTML:
+pages are fetched over a pooled async HTTP client and converted to markdown
+in-process, with no queueing behind a remote crawl job and no per-page cost.
+JavaScript is not executed, so client-rendered sites still need FireCrawl.
+
+Crawling is breadth-first from the start URL (depth 0) down to `max_depth`,
+staying on the start URL's host. All workers of a crawl share one frontier:
+URLs are normalized before they are queued, so each page is fetched once,
+and fetches are capped both overall and per host. A host answering 429
+or 5xx is paused (Retry-After, or exponential backoff) and the page is
+queued again, up to CRAWLER_MAX_RETRIES times.
+
+Re-crawls can pass the metadata stored for each known page: those pages are
+requested conditionally (If-None-Match / If-Modified-Since) and come back as
+`not_modified` pages on a 304, with no body to download or convert, and
+as `gone` pages on a 404/410.
+
+Before the first page is fetched, robots.txt and the site's sitemaps are
+read (see services.discovery): sitemap URLs seed the frontier at depth 1,
+Disallow rules filter every queued link, a Crawl-delay caps the host's
+request rate, and known pages whose sitemap <lastmod> has not moved since
+they were fetched are not requested at all.
+"""
+
+import asyncio
+import itertools
+import re
+import time
+import uuid
+from contextlib import aclosing
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import httpx
+from config import (
+    CRAWLER_MAX_PAGES,
+    CRAWLER_CONCURRENCY,
+    CRAWLER_PER_HOST_CONCURRENCY,
+    CRAWLER_TIMEOUT,
+    CRAWLER_MAX_PAGE_BYTES,
+    CRAWLER_USER_AGENT,
+    CRAWLER_MAX_RETRIES,
+    CRAWLER_MAX_BACKOFF,
+    SITEMAP_DISCOVERY,
+    SITEMAP_MAX_FILES,
+    SITEMAP_MAX_BYTES,
+)
+from services.discovery import RobotsRules, fetch_robots, iter_sitemap_urls, parse_lastmod
+from services.rate_limit import Backoff, Throttled, TokenBucket, parse_retry_after
+
+# ============== URL normalization ==============
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# Statuses that mean a page no longer exists (refreshes delete it)
+GONE_STATUSES = (404, 410)
+# Query parameters that never change the page content
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
+# Links to these are never HTML pages
+_SKIP_EXTENSIONS = re.compile(
+    r"\.(?:png|jpe?g|gif|webp|svg|ico|bmp|tiff?|pdf|zip|gz|tgz|rar|7z|tar|"
+    r"mp3|mp4|m4a|wav|ogg|webm|avi|mov|css|js|json|xml|rss|woff2?|ttf|eot|exe|dmg|apk)$",
+    re.IGNORECASE,
+)
+
+
+def _remove_dot_segments(path: str) -> str:
+    """Resolve "." and ".." path segments (RFC 3986 section 5.2.4)."""
+    if "." not in path:
+        return path
+    output: List[str] = []
+    segments = path.split("/")
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == ".":
+            if last:
+                output.append("")  # "/a/." is the directory "/a/"
+        elif segment == "..":
+            if len(output) > 1:
+                output.pop()
+            if last:
+                output.append("")
+        else:
+            output.append(segment)
+    resolved = "/".join(output)
+    return resolved if resolved.startswith("/") else "/" + resolved
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Canonical form of a link, used as the frontier's dedup key.
+
+    Resolves it against `base`, lowercases scheme and host, removes "." and
+    ".." path segments, drops default ports, fragments and tracking
+    parameters, and sorts the query string.
+
+    Returns:
+        The normalized URL, or None for non-HTTP links (mailto:, javascript:, ...)
+    """
+    try:
+        url = urljoin(base, url.strip()) if base else url.strip()
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower().rstrip(".")
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    netloc = host if port in (None, _DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith(_TRACKING_PARAMS)
+        )
+    )
+    return urlunsplit((scheme, netloc, _remove_dot_segments(parts.path or "/"), query, ""))
+
+
+def _site_host(url: str) -> str:
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def is_crawlable(url: str, site_url: str) -> bool:
+    """Whether a normalized URL is on the same site as `site_url` and may be an HTML page."""
+    return _site_host(url) == _site_host(site_url) and not _SKIP_EXTENSIONS.search(
+        urlsplit(url).path
+    )
+
+
+# ============== HTML to markdown ==============
+
+# Content never shown as page text (nav / footer / aside: like FireCrawl's
+# onlyMainContent). Links inside them are still followed.
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe", "canvas",
+    "nav", "footer", "aside", "select", "button",
+}
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "table", "form",
+    "figure", "figcaption", "dl", "dt", "dd", "details", "summary", "address",
+}
+_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _MarkdownParser(HTMLParser):
+    """Single-pass HTML to markdown converter that also collects links and metadata."""
+
+    def __init__(self, url: str):
+        super().__init__(convert_charrefs=True)
+        self.base = url
+        self.out: List[str] = []
+        self.links: List[str] = []
+        self.title = ""
+        self.description = ""
+
+        self._skip = 0
+        self._pre = 0
+        self._in_title = False
+        self._newlines = 2  # trailing newlines in out (start counts as a paragraph break)
+        self._space = True  # out ends with whitespace
+        self._lists: List[List[Any]] = []  # [ordered, next number] per open list
+        self._anchors: List[Tuple[Optional[str], int]] = []  # (href, index of "[")
+        self._row_cells = 0
+        self._header_row = False
+
+    # ---------- output helpers ----------
+
+    def _emit(self, text: str):
+        if not text:
+            return
+        self.out.append(text)
+        self._newlines = len(text) - len(text.rstrip("\n")) if text.endswith("\n") else 0
+        self._space = text[-1].isspace()
+
+    def _break(self, newlines: int):
+        """End the current line (1) or paragraph (2), dropping trailing spaces."""
+        while self.out and self.out[-1].endswith((" ", "\t")):
+            self.out[-1] = self.out[-1].rstrip(" \t")
+            if not self.out[-1]:
+                self.out.pop()
+        if self._newlines < newlines:
+            self.out.append("\n" * (newlines - self._newlines))
+            self._newlines = newlines
+        self._space = True
+
+    # ---------- parser callbacks ----------
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        link = None
+        if tag == "a":
+            href = attrs.get("href")
+            link = normalize_url(href, self.base) if href else None
+            if link:
+                self.links.append(link)
+        elif tag == "base" and attrs.get("href"):
+            self.base = urljoin(self.base, attrs["href"])
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            name = (attrs.get("name") or attrs.get("property") or "").lower()
+            if name in ("description", "og:description") and not self.description:
+                self.description = (attrs.get("content") or "").strip()
+
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        if self._skip:
+            return
+
+        if tag in _HEADINGS:
+            self._break(2)
+            self._emit("#" * _HEADINGS[tag] + " ")
+        elif tag in _BLOCK_TAGS:
+            self._break(2)
+        elif tag == "br":
+            self._break(1)
+        elif tag == "hr":
+            self._break(2)
+            self._emit("---")
+            self._break(2)
+        elif tag in ("ul", "ol"):
+            self._break(1 if self._lists else 2)
+            self._lists.append([tag == "ol", 1])
+        elif tag == "li":
+            self._break(1)
+            indent = "  " * max(0, len(self._lists) - 1)
+            if self._lists and self._lists[-1][0]:
+                self._emit(f"{indent}{self._lists[-1][1]}. ")
+                self._lists[-1][1] += 1
+            else:
+                self._emit(f"{indent}- ")
+        elif tag == "blockquote":
+            self._break(2)
+            self._emit("> ")
+        elif tag == "pre":
+            self._break(2)
+            self._emit("```\n")
+            self._pre += 1
+        elif tag == "code" and not self._pre:
+            self._emit("`")
+        elif tag in ("strong", "b"):
+            self._emit("**")
+        elif tag in ("em", "i"):
+            self._emit("*")
+        elif tag == "a":
+            self._anchors.append((link, len(self.out)))
+            if link:
+                self._emit("[")
+        elif tag == "img":
+            alt = (attrs.get("alt") or "").strip()
+            src = attrs.get("src")
+            if alt and src:
+                self._emit(f"![{alt}]({urljoin(self.base, src)})")
+        elif tag == "tr":
+            self._break(1)
+            self._emit("|")
+            self._row_cells = 0
+            self._header_row = False
+        elif tag in ("td", "th"):
+            self._emit(" ")
+            self._row_cells += 1
+            self._header_row = self._header_row or tag == "th"
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+        if self._skip:
+            return
+
+        if tag in _HEADINGS or tag in _BLOCK_TAGS or tag == "blockquote":
+            self._break(2)
+        elif tag in ("ul", "ol"):
+            if self._lists:
+                self._lists.pop()
+            self._break(1 if self._lists else 2)
+        elif tag == "pre":
+            self._pre = max(0, self._pre - 1)
+            self._break(1)
+            self._emit("```")
+            self._break(2)
+        elif tag == "code" and not self._pre:
+            self._emit("`")
+        elif tag in ("strong", "b"):
+            self._emit("**")
+        elif tag in ("em", "i"):
+            self._emit("*")
+        elif tag == "a" and self._anchors:
+            link, start = self._anchors.pop()
+            if link:
+                if "".join(self.out[start + 1 :]).strip():
+                    self._emit(f"]({link})")
+                else:
+                    del self.out[start:]  # nothing to link (icon-only anchor): drop the "["
+        elif tag in ("td", "th"):
+            self._emit(" |")
+        elif tag == "tr" and self._header_row:
+            self._break(1)
+            self._emit("|" + " --- |" * self._row_cells)
+            self._header_row = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip or not data:
+            return
+        if self._pre:
+            self._emit(data)
+            return
+        text = _WHITESPACE.sub(" ", data)
+        if self._space:
+            text = text.lstrip(" ")
+        self._emit(text)
+
+    def markdown(self) -> str:
+        text = "".join(self.out)
+        return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def html_to_markdown(html: str, url: str) -> Dict[str, Any]:
+    """
+    Convert an HTML page to markdown.
+
+    Args:
+        html: Page source
+        url: Page URL (resolves relative links)
+
+    Returns:
+        Dict with markdown, title, description and links (normalized, absolute)
+    """
+    parser = _MarkdownParser(url)
+    parser.feed(html)
+    parser.close()
+    return {
+        "markdown": parser.markdown(),
+        "title": _WHITESPACE.sub(" ", parser.title).strip(),
+        "description": parser.description,
+        "links": parser.links,
+    }
+
+
+# ============== Crawler ==============
+
+
+class CrawlFrontier:
+    """
+    URLs left to fetch in one crawl, shared by all of its workers.
+
+    A priority queue ordered by depth, so shallower pages are always fetched
+    first (breadth-first) even with many workers pulling concurrently.
+    """
+
+    def __init__(self, start_url: str, max_depth: int, max_pages: int):
+        self.host = _site_host(start_url)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.seen: Set[str] = set()
+        self.pages = 0
+        self.attempts: Dict[str, int] = {}  # throttled fetches per URL
+        self.allowed: Optional[Callable[[str], bool]] = None  # robots.txt rules
+        self._order = itertools.count()
+        self.add(start_url, 0)
+
+    @property
+    def full(self) -> bool:
+        return self.pages >= self.max_pages
+
+    def add(self, url: str, depth: int) -> bool:
+        """Queue a normalized URL unless it was seen, is too deep, leaves the site or is disallowed."""
+        if (
+            self.full
+            or depth > self.max_depth
+            or url in self.seen
+            or _site_host(url) != self.host
+            or _SKIP_EXTENSIONS.search(urlsplit(url).path)
+            or (self.allowed is not None and not self.allowed(url))
+        ):
+            return False
+        self.seen.add(url)
+        self.queue.put_nowait((depth, next(self._order), url))
+        return True
+
+    def retry(self, url: str, depth: int, max_retries: int) -> bool:
+        """Queue a throttled URL again, unless it already had `max_retries` retries."""
+        attempts = self.attempts.get(url, 0) + 1
+        if attempts > max_retries:
+            return False
+        self.attempts[url] = attempts
+        self.queue.put_nowait((depth, next(self._order), url))
+        return True
+
+
+def _unchanged_since(lastmod: Optional[datetime], stored: Optional[str]) -> bool:
+    """Whether a sitemap lastmod is no later than the one recorded at the last fetch."""
+    previous = parse_lastmod(stored)
+    return lastmod is not None and previous is not None and lastmod <= previous
+
+
+class Fetched(NamedTuple):
+    url: str  # final URL after redirects
+    html: Optional[str]  # None for a 304
+    status_code: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class HttpCrawler:
+    """Breadth-first crawler over a pooled async HTTP client."""
+
+    def __init__(
+        self,
+        concurrency: int = CRAWLER_CONCURRENCY,
+        per_host: int = CRAWLER_PER_HOST_CONCURRENCY,
+        max_pages: int = CRAWLER_MAX_PAGES,
+        timeout: float = CRAWLER_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        max_retries: int = CRAWLER_MAX_RETRIES,
+        max_backoff: float = CRAWLER_MAX_BACKOFF,
+    ):
+        """
+        Args:
+            concurrency: Fetches in flight per crawl
+            per_host: Fetches in flight per host, across all crawls
+            max_pages: Pages returned per crawl
+            timeout: Per-request timeout in seconds
+            transport: Custom httpx transport (tests / benchmarks)
+            max_retries: Times a page answered with 429/5xx is queued again
+            max_backoff: Longest pause (seconds) of a throttled host
+        """
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self.max_retries = max(0, max_retries)
+        self.max_backoff = max_backoff
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._host_active: Dict[str, int] = {}
+        self._host_backoffs: Dict[str, Backoff] = {}
+
+        # Metrics
+        self.fetches = 0
+        self.pages = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.skipped = 0
+        self.not_modified = 0
+        self.bytes_fetched = 0
+        self.sitemap_urls = 0
+        self.sitemap_unchanged = 0
+        self.gone = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        """Long-lived client; keep-alive connections are reused across pages and crawls."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                headers={
+                    "User-Agent": CRAWLER_USER_AGENT,
+                    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5",
+                },
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=max(self.concurrency, self.per_host) * 4,
+                    max_keepalive_connections=max(self.concurrency, self.per_host) * 2,
+                ),
+                timeout=httpx.Timeout(self.timeout),
+                transport=self._transport,
+            )
+        return self._http
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            if len(self._host_limits) >= 1024:
+                # Forget hosts nobody is fetching from right now
+                self._host_limits = {
+                    h: s for h, s in self._host_limits.items() if h in self._host_active
+                }
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return limit
+
+    def _host_backoff(self, host: str) -> Backoff:
+        backoff = self._host_backoffs.get(host)
+        if backoff is None:
+            if len(self._host_backoffs) >= 1024:
+                # Forget hosts that are neither paused nor being fetched from
+                self._host_backoffs = {
+                    h: b
+                    for h, b in self._host_backoffs.items()
+                    if h in self._host_active or b.paused()
+                }
+            # No rate limit of its own (unless limit_host sets one): only the
+            # pause after throttling
+            backoff = self._host_backoffs[host] = Backoff(TokenBucket(0), self.max_backoff)
+        return backoff
+
+    def limit_host(self, url: str, rate: float):
+        """Cap the request rate of a host (e.g. to its robots.txt Crawl-delay)."""
+        backoff = self._host_backoff(urlsplit(url).netloc)
+        if backoff.base_rate <= 0 or rate < backoff.base_rate:
+            backoff.base_rate = rate
+            backoff.bucket.rate = (
+                rate if backoff.bucket.rate <= 0 else min(backoff.bucket.rate, rate)
+            )
+
+    async def aclose(self):
+        """Close pooled connections (called on application shutdown)."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _fetch(self, url: str, previous: Optional[Dict[str, Any]] = None) -> Optional[Fetched]:
+        """
+        GET a page, conditionally if `previous` (its stored metadata) has validators.
+
+        Returns:
+            The fetched page (html is None on a 304 and on a 404/410, see
+            status_code), or None for other error statuses and non-HTML or
+            oversized responses
+
+        Raises:
+            Throttled: On HTTP 429 and 5xx, after pausing the host (for every
+                crawl) for Retry-After or the host's next backoff step
+        """
+        host = urlsplit(url).netloc
+        limit = self._host_limit(host)
+        backoff = self._host_backoff(host)
+        self._host_active[host] = self._host_active.get(host, 0) + 1
+        try:
+            async with limit:
+                while backoff.wait_time() > 0:
+                    await asyncio.sleep(backoff.wait_time())
+                backoff.bucket.take()
+                try:
+                    fetched = await self._get(url, previous or {})
+                except Throttled as e:
+                    self.throttled += 1
+                    pause = backoff.on_throttle(e.retry_after)
+                    print(f"{e} from {host}: pausing it for {pause:.1f}s")
+                    raise
+                backoff.on_success()
+                return fetched
+        finally:
+            self._host_active[host] -= 1
+            if not self._host_active[host]:
+                del self._host_active[host]
+
+    async def _get(self, url: str, previous: Dict[str, Any]) -> Optional[Fetched]:
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("lastModified"):
+            headers["If-Modified-Since"] = previous["lastModified"]
+
+        self.fetches += 1
+        async with self._client().stream("GET", url, headers=headers) as response:
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+            if response.status_code == 304:
+                self.not_modified += 1
+                return Fetched(
+                    str(response.url),
+                    None,
+                    304,
+                    etag or previous.get("etag"),
+                    last_modified or previous.get("lastModified"),
+                )
+            if response.status_code == 429 or response.status_code >= 500:
+                # Overloaded or rate limiting us: let the caller back off
+                raise Throttled(
+                    response.status_code,
+                    parse_retry_after(response.headers.get("retry-after")),
+                )
+            if response.status_code in GONE_STATUSES:
+                self.gone += 1
+                return Fetched(str(response.url), None, response.status_code, None, None)
+            content_type = response.headers.get("content-type", "text/html").lower()
+            if response.status_code >= 400 or not (
+                "html" in content_type or "xml" in content_type
+            ):
+                self.skipped += 1
+                return None
+            declared = int(response.headers.get("content-length") or 0)
+            if declared > CRAWLER_MAX_PAGE_BYTES:
+                self.skipped += 1
+                return None
+
+            body = bytearray()
+            async for data in response.aiter_bytes():
+                body.extend(data)
+                if len(body) > CRAWLER_MAX_PAGE_BYTES:
+                    self.skipped += 1
+                    return None
+            self.bytes_fetched += len(body)
+            html = bytes(body).decode(response.encoding or "utf-8", errors="replace")
+            return Fetched(str(response.url), html, response.status_code, etag, last_modified)
+
+    async def discover(
+        self, url: str, max_urls: int
+    ) -> Tuple[RobotsRules, Dict[str, Optional[datetime]]]:
+        """
+        Read a site's robots.txt and sitemaps.
+
+        Uses the sitemaps robots.txt lists, or /sitemap.xml if it lists none.
+        Page URLs are normalized and kept if they are on the site and allowed
+        by robots.txt.
+
+        Args:
+            url: Any URL of the site
+            max_urls: Stop after this many page URLs
+
+        Returns:
+            The robots.txt rules, and the sitemap page URLs (in sitemap order)
+            with their lastmod, or None where the sitemap gives none
+        """
+        start_url = normalize_url(url)
+        if not start_url:
+            return RobotsRules(), {}
+        parts = urlsplit(start_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._client()
+        robots = await fetch_robots(client, origin, CRAWLER_USER_AGENT)
+
+        found: Dict[str, Optional[datetime]] = {}
+        entries = iter_sitemap_urls(
+            client,
+            robots.sitemaps or [f"{origin}/sitemap.xml"],
+            SITEMAP_MAX_FILES,
+            SITEMAP_MAX_BYTES,
+        )
+        async with aclosing(entries):
+            async for entry in entries:
+                page_url = normalize_url(entry.url)
+                if (
+                    page_url
+                    and page_url not in found
+                    and is_crawlable(page_url, start_url)
+                    and robots.allowed(page_url)
+                ):
+                    found[page_url] = entry.lastmod
+                    if len(found) >= max_urls:
+                        break
+        self.sitemap_urls += len(found)
+        if found:
+            print(f"Sitemaps of {origin}: {len(found)} URLs")
+        return robots, found
+
+    async def fetch_page(
+        self,
+        url: str,
+        base_url: str,
+        crawl_id: str = None,
+        previous: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fetch and convert a single page (same dict shape as a crawled page).
+
+        Args:
+            previous: Metadata stored for the page by an earlier fetch; makes
+                the request conditional (a 304 returns a not_modified page)
+
+        Returns:
+            The page; a page with gone=True on a 404/410; None on other failures
+
+        Raises:
+            Throttled: On HTTP 429 and 5xx (other failures return None)
+        """
+        page_url = normalize_url(url)
+        if not page_url:
+            return None
+        try:
+            fetched = await self._fetch(page_url, previous)
+        except httpx.HTTPError as e:
+            self.errors += 1
+            print(f"Fetch failed for {page_url}: {str(e)}")
+            return None
+        if fetched is None:
+            return None
+        if fetched.status_code in GONE_STATUSES:
+            return self._gone_page(page_url, base_url, crawl_id, fetched.status_code)
+        self.pages += 1
+        if fetched.html is None:
+            return self._unchanged_page(page_url, base_url, crawl_id, previous, fetched)
+        converted = await asyncio.to_thread(html_to_markdown, fetched.html, fetched.url)
+        return self._page(fetched.url, base_url, crawl_id, converted, fetched)
+
+    @staticmethod
+    def _page(
+        url: str,
+        base_url: str,
+        crawl_id: Optional[str],
+        converted: Dict[str, Any],
+        fetched: Fetched,
+        depth: Optional[int] = None,
+        lastmod: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        metadata = {
+            "title": converted["title"],
+            "description": converted["description"],
+            "statusCode": fetched.status_code,
+        }
+        # Validators for conditional re-fetches, depth to re-seed the frontier
+        if fetched.etag:
+            metadata["etag"] = fetched.etag
+        if fetched.last_modified:
+            metadata["lastModified"] = fetched.last_modified
+        if depth is not None:
+            metadata["depth"] = depth
+        if lastmod is not None:
+            metadata["sitemapLastmod"] = lastmod.isoformat()
+        return {
+            "page_id": str(uuid.uuid4()),
+            "url": url,
+            "base_url": base_url,
+            "markdown": converted["markdown"],
+            "crawl_id": crawl_id,
+            "metadata": metadata,
+        }
+
+    @staticmethod
+    def _unchanged_page(
+        url: str,
+        base_url: str,
+        crawl_id: Optional[str],
+        previous: Optional[Dict[str, Any]],
+        fetched: Optional[Fetched] = None,
+        lastmod: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Page dict for a 304, or for a page not requested because its sitemap
+        lastmod has not moved: no markdown, the stored metadata with fresh validators.
+        """
+        metadata = {**(previous or {}), "statusCode": 304}
+        if fetched is not None and fetched.etag:
+            metadata["etag"] = fetched.etag
+        if fetched is not None and fetched.last_modified:
+            metadata["lastModified"] = fetched.last_modified
+        if lastmod is not None:
+            metadata["sitemapLastmod"] = lastmod.isoformat()
+        return {
+            "page_id": str(uuid.uuid4()),
+            "url": url,
+            "base_url": base_url,
+            "markdown": "",
+            "crawl_id": crawl_id,
+            "metadata": metadata,
+            "not_modified": True,
+        }
+
+    @staticmethod
+    def _gone_page(
+        url: str, base_url: str, crawl_id: Optional[str], status_code: int
+    ) -> Dict[str, Any]:
+        """Page dict for a 404/410: the page no longer exists."""
+        return {
+            "page_id": str(uuid.uuid4()),
+            "url": url,
+            "base_url": base_url,
+            "markdown": "",
+            "crawl_id": crawl_id,
+            "metadata": {"statusCode": status_code},
+            "gone": True,
+        }
+
+    async def gone_pages(
+        self,
+        urls: List[str],
+        base_url: str,
+        crawl_id: str = None,
+        known: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Check which of some previously crawled pages no longer exist.
+
+        Used on refreshes by engines that do not report missing pages
+        themselves. Requests are conditional where `known` has validators;
+        throttled or failed requests do not count as gone.
+
+        Returns:
+            A gone page (see fetch_page) for each URL answering 404/410
+        """
+        known = known or {}
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def _check(url: str) -> Optional[Dict[str, Any]]:
+            page_url = normalize_url(url)
+            if not page_url:
+                return None
+            try:
+                async with limit:
+                    fetched = await self._fetch(page_url, known.get(url))
+            except (httpx.HTTPError, Throttled) as e:
+                print(f"Could not check {url}: {str(e)}")
+                return None
+            if fetched is None or fetched.status_code not in GONE_STATUSES:
+                return None
+            return self._gone_page(url, base_url, crawl_id, fetched.status_code)
+
+        checked = await asyncio.gather(*(_check(url) for url in urls))
+        return [page for page in checked if page]
+
+    async def _worker(
+        self,
+        frontier: CrawlFrontier,
+        results: asyncio.Queue,
+        base_url: str,
+        crawl_id: Optional[str],
+        known: Dict[str, Dict[str, Any]],
+        seeds: Dict[str, Optional[datetime]],
+    ):
+        while True:
+            depth, _, url = await frontier.queue.get()
+            try:
+                if frontier.full:
+                    continue
+                fetched = await self._fetch(url, known.get(url))
+                if fetched is None:
+                    continue
+
+                if fetched.status_code in GONE_STATUSES:
+                    # Only news to a re-crawl: the page was indexed before
+                    if url in known:
+                        results.put_nowait(
+                            self._gone_page(url, base_url, crawl_id, fetched.status_code)
+                        )
+                    continue
+
+                if fetched.html is None:
+                    # Unchanged since the last crawl. Its links were seeded
+                    # from the stored pages (a new link would have changed it)
+                    frontier.pages += 1
+                    self.pages += 1
+                    results.put_nowait(
+                        self._unchanged_page(
+                            url, base_url, crawl_id, known.get(url), fetched, seeds.get(url)
+                        )
+                    )
+                    continue
+
+                final_url = normalize_url(fetched.url) or url
+                if depth == 0:
+                    # The start page may redirect to another host (example.com -> example.org)
+                    frontier.host = _site_host(final_url)
+                if final_url != url:
+                    # Redirected onto a page another worker already has
+                    if final_url in frontier.seen:
+                        continue
+                    frontier.seen.add(final_url)
+
+                converted = await asyncio.to_thread(html_to_markdown, fetched.html, final_url)
+                if frontier.full:
+                    continue
+                frontier.pages += 1
+                self.pages += 1
+                for link in converted["links"]:
+                    frontier.add(link, depth + 1)
+                results.put_nowait(
+                    self._page(
+                        final_url, base_url, crawl_id, converted, fetched, depth, seeds.get(url)
+                    )
+                )
+            except Throttled as e:
+                # The host is paused; fetch the page again once it resumes
+                if frontier.retry(url, depth, self.max_retries):
+                    self.retries += 1
+                else:
+                    self.errors += 1
+                    print(f"Giving up on {url} after {self.max_retries} retries: {str(e)}")
+            except httpx.HTTPError as e:
+                self.errors += 1
+                print(f"Fetch failed for {url}: {str(e)}")
+            except Exception as e:
+                self.errors += 1
+                print(f"Crawl error on {url}: {str(e)}")
+            finally:
+                frontier.queue.task_done()
+
+    async def crawl(
+        self,
+        url: str,
+        max_depth: int = 3,
+        crawl_id: str = None,
+        base_url: str = None,
+        known: Optional[Dict[str, Dict[str, Any]]] = None,
+        discover: bool = SITEMAP_DISCOVERY,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Crawl a site breadth-first, yielding pages as they are converted.
+
+        Args:
+            url: Start URL (depth 0)
+            max_depth: Maximum link depth from the start URL
+            crawl_id: Unique crawl session ID
+            base_url: base_url of every page dict (defaults to the start URL's origin)
+            known: Stored metadata of the pages of a previous crawl, by URL.
+                They are queued up front at their recorded depth and fetched
+                conditionally; unchanged ones are yielded with not_modified=True
+                and missing ones (404/410) with gone=True
+            discover: Seed the frontier from robots.txt and sitemaps first. Known
+                pages whose sitemap lastmod is no later than the stored
+                sitemapLastmod are yielded as unchanged without a request
+
+        Yields:
+            Dicts containing page_id, url, markdown, base_url, crawl_id, and metadata
+        """
+        start_url = normalize_url(url)
+        if not start_url:
+            return
+        if base_url is None:
+            parts = urlsplit(start_url)
+            base_url = f"{parts.scheme}://{parts.netloc}"
+
+        known = {
+            normalized: metadata or {}
+            for normalized, metadata in (
+                (normalize_url(page_url), metadata) for page_url, metadata in (known or {}).items()
+            )
+            if normalized
+        }
+        # A re-crawl must be able to revisit every known page
+        frontier = CrawlFrontier(start_url, max_depth, max(self.max_pages, len(known)))
+        results: asyncio.Queue = asyncio.Queue()
+        done = object()
+        started = time.perf_counter()
+
+        seeds: Dict[str, Optional[datetime]] = {}
+        if discover:
+            robots, seeds = await self.discover(start_url, frontier.max_pages)
+            frontier.allowed = robots.allowed
+            if robots.crawl_delay:
+                self.limit_host(start_url, 1 / robots.crawl_delay)
+        for page_url, metadata in known.items():
+            if _unchanged_since(seeds.get(page_url), metadata.get("sitemapLastmod")):
+                frontier.seen.add(page_url)
+                frontier.pages += 1
+                self.pages += 1
+                self.sitemap_unchanged += 1
+                results.put_nowait(
+                    self._unchanged_page(page_url, base_url, crawl_id, metadata)
+                )
+                continue
+            depth = metadata.get("depth")
+            frontier.add(page_url, depth if isinstance(depth, int) else max_depth)
+        for page_url in seeds:
+            frontier.add(page_url, 1)
+
+        async def _until_drained():
+            await frontier.queue.join()
+            results.put_nowait(done)
+
+        tasks = [
+            asyncio.create_task(
+                self._worker(frontier, results, base_url, crawl_id, known, seeds)
+            )
+            for _ in range(self.concurrency)
+        ]
+        tasks.append(asyncio.create_task(_until_drained()))
+        try:
+            while True:
+                page = await results.get()
+                if page is done:
+                    break
+                yield page
+        finally:
+            # Also runs when the consumer stops early: no fetches outlive the crawl
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            elapsed = time.perf_counter() - started
+            print(
+                f"HTTP crawl of {start_url}: {frontier.pages} pages, "
+                f"{len(frontier.seen)} URLs discovered in {elapsed:.1f}s"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fetches": self.fetches,
+            "pages": self.pages,
+            "errors": self.errors,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "skipped": self.skipped,
+            "not_modified": self.not_modified,
+            "bytes_fetched": self.bytes_fetched,
+            "sitemap_urls": self.sitemap_urls,
+            "sitemap_unchanged": self.sitemap_unchanged,
+            "gone": self.gone,
+            "concurrency": self.concurrency,
+            "per_host_concurrency": self.per_host,
+        }
@@ -272,6 +272,89 @@ class DatabaseService:
 
         return result.data[0]["id"]
 
+    def delete_pages(self, crawl_id: str, urls: List[str]):
+        """
+        Delete page records of a crawl (pages that disappeared on refresh).
+
+        Args:
+            crawl_id: The crawl session ID
+            urls: URLs of the pages to delete
+        """
+        for i in range(0, len(urls), 100):
+            self.supabase.table("pages").delete().eq("crawl_id", crawl_id).in_(
+                "url", urls[i : i + 100]
+            ).execute()
+
+    def update_crawl_status(
+        self,
+        crawl_id: str,
+        status: Optional[str] = None,
+        current_depth: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        total_links: Optional[int] = None,
+    ):
+        """Update the deep scraping progress columns of a crawl (None = unchanged)."""
+        data = {}
+        if status is not None:
+            data["status"] = status
+        if current_depth is not None:
+            data["current_depth"] = current_depth
+        if max_depth is not None:
+            data["max_depth"] = max_depth
+        if total_links is not None:
+            data["total_links_found"] = total_links
+        if data:
+            self.supabase.table("crawls").update(data).eq("id", crawl_id).execute()
+
+    def add_pending_page(
+        self,
+        crawl_id: str,
+        url: str,
+        title: str = "",
+        depth: int = 1,
+        discovered_from_page_id: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Record a discovered page that still has to be scraped.
+
+        Its status ("pending") and depth live in the page metadata.
+
+        Returns:
+            The new page record, or None if the crawl already has this URL
+        """
+        data = {
+            "crawl_id": crawl_id,
+            "url": url,
+            "title": title or url,
+            "parent_id": discovered_from_page_id,
+            "metadata": {"status": "pending", "depth": depth},
+        }
+        result = (
+            self.supabase.table("pages")
+            .upsert(data, on_conflict="crawl_id,url", ignore_duplicates=True)
+            .execute()
+        )
+        return result.data[0] if result.data else None
+
+    def update_page_status(
+        self, page_id: str, status: str, fields: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Set the scraping status of a page, keeping the rest of its metadata.
+
+        Args:
+            page_id: The page ID
+            status: "pending", "scraped", "indexed" or "failed"
+            fields: Other columns to update (e.g. title)
+        """
+        result = (
+            self.supabase.table("pages").select("metadata").eq("id", page_id).execute()
+        )
+        metadata = (result.data[0].get("metadata") if result.data else None) or {}
+        self.supabase.table("pages").update(
+            {**(fields or {}), "metadata": {**metadata, "status": status}}
+        ).eq("id", page_id).execute()
+
     def get_crawl_tree(self, crawl_id: str) -> List[Dict[str, Any]]:
         """
         Get all pages for a crawl as a flat list.
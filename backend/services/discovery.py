@@ -0,0 +1,283 @@
+"""
+URL discovery from robots.txt and XML sitemaps.
+
+Large documentation sites list every page in their sitemaps, usually as a
+sitemap index pointing at nested (often gzipped) sitemaps. Reading them
+before crawling finds pages that link-following misses and saves requests
+on navigation links.
+
+Sitemaps are parsed incrementally while they download (and decompress), so
+a 50 MB sitemap is never held in memory, and each URL comes with its
+<lastmod> so refreshes can skip pages that have not changed since they were
+last fetched.
+"""
+
+import re
+import zlib
+from collections import deque
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from xml.etree import ElementTree
+import httpx
+
+# robots.txt files are read up to this size (RFC 9309 asks for at least 500 KiB)
+_ROBOTS_MAX_BYTES = 512 * 1024
+_GZIP_MAGIC = b"\x1f\x8b"
+# Product token of a User-Agent string ("WebScraperRAGBot" in "Mozilla/5.0 (compatible; WebScraperRAGBot/1.0)")
+_PRODUCT_TOKEN = re.compile(r"([A-Za-z][\w-]*)/[\w.]+")
+
+
+# ============== robots.txt ==============
+
+
+def _agent_token(user_agent: str) -> str:
+    tokens = [t for t in _PRODUCT_TOKEN.findall(user_agent) if t.lower() != "mozilla"]
+    return (tokens[-1] if tokens else user_agent).lower()
+
+
+def _rule_pattern(path: str) -> re.Pattern:
+    """robots.txt path pattern as a regex: `*` matches anything, a trailing `$` anchors."""
+    anchored = path.endswith("$")
+    body = ".*".join(re.escape(part) for part in path.rstrip("$").split("*"))
+    return re.compile(body + ("$" if anchored else ""))
+
+
+class RobotsRules:
+    """The robots.txt rules that apply to our user agent, plus its Sitemap lines."""
+
+    def __init__(
+        self,
+        rules: Optional[List[Tuple[bool, str]]] = None,
+        crawl_delay: Optional[float] = None,
+        sitemaps: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            rules: (allow, path pattern) pairs
+            crawl_delay: Crawl-delay in seconds, if the group sets one
+            sitemaps: Sitemap URLs listed in the file
+        """
+        self.rules = [
+            (allow, len(path), _rule_pattern(path)) for allow, path in rules or [] if path
+        ]
+        self.crawl_delay = crawl_delay
+        self.sitemaps = sitemaps or []
+
+    @classmethod
+    def parse(cls, text: str, user_agent: str) -> "RobotsRules":
+        """
+        Parse a robots.txt file.
+
+        Uses the groups naming our product token, or the `*` group if none
+        does. Within them the longest matching path wins, and Allow wins ties.
+        User-agent values are matched exactly, case-insensitively (RFC 9309),
+        ignoring a version suffix; empty values are ignored.
+        """
+        token = _agent_token(user_agent)
+        groups: List[Tuple[List[str], List[Tuple[str, str]]]] = []
+        sitemaps = []
+        agents: List[str] = []
+        lines: List[Tuple[str, str]] = []
+        for raw in text.splitlines():
+            line = raw.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            field, value = (part.strip() for part in line.split(":", 1))
+            field = field.lower()
+            if field == "sitemap":
+                if value:
+                    sitemaps.append(value)
+            elif field == "user-agent":
+                agent = value.split("/", 1)[0].strip().lower()  # "Bot/1.0" names Bot
+                if not agent:
+                    continue
+                if lines:  # a user-agent line after rules starts a new group
+                    groups.append((agents, lines))
+                    agents, lines = [], []
+                agents.append(agent)
+            elif agents:
+                lines.append((field, value))
+        if agents:
+            groups.append((agents, lines))
+
+        matching = [lines for agents, lines in groups if token in agents]
+        if not matching:
+            matching = [lines for agents, lines in groups if "*" in agents]
+
+        rules = []
+        crawl_delay = None
+        for group in matching:
+            for field, value in group:
+                if field in ("allow", "disallow"):
+                    rules.append((field == "allow", value))
+                elif field == "crawl-delay":
+                    try:
+                        crawl_delay = max(crawl_delay or 0.0, float(value))
+                    except ValueError:
+                        pass
+        return cls(rules, crawl_delay, sitemaps)
+
+    def allowed(self, url: str) -> bool:
+        """Whether the rules let us fetch `url`."""
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        best = None  # (length, allow) of the longest match so far
+        for allow, length, pattern in self.rules:
+            if pattern.match(path) and (best is None or (length, allow) > best):
+                best = (length, allow)
+        return best is None or best[1]
+
+
+async def fetch_robots(client: httpx.AsyncClient, origin: str, user_agent: str) -> RobotsRules:
+    """
+    Fetch and parse `origin`/robots.txt.
+
+    A missing or unreadable file allows everything (no rules, no sitemaps).
+    """
+    try:
+        async with client.stream("GET", urljoin(origin, "/robots.txt")) as response:
+            if response.status_code >= 400:
+                return RobotsRules()
+            body = bytearray()
+            async for data in response.aiter_bytes():
+                body.extend(data)
+                if len(body) >= _ROBOTS_MAX_BYTES:
+                    break
+    except httpx.HTTPError as e:
+        print(f"Could not read robots.txt of {origin}: {str(e)}")
+        return RobotsRules()
+    text = bytes(body[:_ROBOTS_MAX_BYTES]).decode("utf-8", errors="replace")
+    return RobotsRules.parse(text, user_agent)
+
+
+# ============== Sitemaps ==============
+
+
+class SitemapEntry(NamedTuple):
+    url: str  # <loc> as written in the sitemap
+    lastmod: Optional[datetime]  # timezone-aware, None if missing or unparseable
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a W3C datetime (2024, 2024-05, 2024-05-01 or full ISO 8601) as UTC."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    for fmt in (None, "%Y-%m", "%Y"):
+        try:
+            parsed = datetime.fromisoformat(value) if fmt is None else datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc)
+    return None
+
+
+def _split_tag(tag: str) -> Tuple[str, str]:
+    """(namespace, local name) of an ElementTree tag like {namespace}loc."""
+    if tag.startswith("{"):
+        namespace, _, name = tag[1:].partition("}")
+        return namespace, name
+    return "", tag
+
+
+async def iter_sitemap(
+    client: httpx.AsyncClient, url: str, max_bytes: int
+) -> AsyncIterator[Tuple[str, str, Optional[datetime]]]:
+    """
+    Stream one sitemap, yielding entries as soon as their element closes.
+
+    Gzipped files (sitemap.xml.gz served as a file rather than with a
+    Content-Encoding) are decompressed on the fly. Parsing stops after
+    `max_bytes` of XML, or at the first malformed byte; entries read by
+    then are kept.
+
+    Yields:
+        ("url", loc, lastmod) for pages and ("sitemap", loc, lastmod) for the
+        nested sitemaps of a sitemap index
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = None
+    namespace = ""
+    loc = lastmod = None
+    decompressor = None
+    size = 0
+    try:
+        async with client.stream("GET", url) as response:
+            if response.status_code >= 400:
+                if response.status_code != 404:
+                    print(f"Sitemap {url} returned HTTP {response.status_code}")
+                return
+            async for data in response.aiter_bytes():
+                if size == 0 and decompressor is None and data.startswith(_GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if decompressor is not None:
+                    # Bounded output: a gzip bomb stops at max_bytes
+                    data = decompressor.decompress(data, max_bytes - size + 1)
+                truncated = size + len(data) > max_bytes
+                if truncated:
+                    data = data[: max_bytes - size]
+                size += len(data)
+                parser.feed(data)
+                for event, element in parser.read_events():
+                    if event == "start":
+                        if root is None:
+                            root = element
+                            namespace = _split_tag(root.tag)[0]
+                        continue
+                    tag_namespace, tag = _split_tag(element.tag)
+                    if tag_namespace != namespace:
+                        continue  # extensions (image:loc, news:...) are not pages
+                    if tag == "loc":
+                        loc = (element.text or "").strip()
+                    elif tag == "lastmod":
+                        lastmod = parse_lastmod(element.text)
+                    elif tag in ("url", "sitemap"):
+                        if loc:
+                            yield tag, loc, lastmod
+                        loc = lastmod = None
+                        root.clear()  # finished entries are not kept in memory
+                if truncated:
+                    print(f"Sitemap {url} is larger than {max_bytes} bytes; truncated")
+                    return
+    except ElementTree.ParseError as e:
+        print(f"Malformed sitemap {url}: {str(e)}")
+    except (httpx.HTTPError, zlib.error) as e:
+        print(f"Could not read sitemap {url}: {str(e)}")
+
+
+async def iter_sitemap_urls(
+    client: httpx.AsyncClient,
+    sitemaps: List[str],
+    max_sitemaps: int,
+    max_bytes: int,
+) -> AsyncIterator[SitemapEntry]:
+    """
+    Walk sitemaps and the sitemap indexes nested in them, yielding page URLs.
+
+    Args:
+        sitemaps: Sitemap URLs to start from (from robots.txt, or /sitemap.xml)
+        max_sitemaps: Sitemap files read at most, nested ones included
+        max_bytes: Uncompressed bytes read per sitemap
+    """
+    queue = deque(sitemaps)
+    seen = set(sitemaps)
+    read = 0
+    while queue and read < max_sitemaps:
+        sitemap_url = queue.popleft()
+        read += 1
+        entries = iter_sitemap(client, sitemap_url, max_bytes)
+        async with aclosing(entries):  # closes the download if the caller stops early
+            async for kind, loc, lastmod in entries:
+                if kind == "url":
+                    yield SitemapEntry(loc, lastmod)
+                    continue
+                nested = urljoin(sitemap_url, loc)
+                if nested not in seen:
+                    seen.add(nested)
+                    queue.append(nested)
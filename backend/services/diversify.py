@@ -0,0 +1,169 @@
+"""
+Post-retrieval diversification of context chunks.
+
+Crawled sites repeat headers, footers and navigation text across pages, so a
+search often returns several near-identical chunks. Before the prompt is
+assembled, near-duplicates are dropped (word-shingle Jaccard similarity) and
+the remaining chunks are re-ranked with maximal marginal relevance (MMR)
+down to a chunk budget.
+"""
+
+import re
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+from config import (
+    DIVERSIFY_ENABLED,
+    MMR_LAMBDA,
+    CONTEXT_CHUNK_BUDGET,
+    NEAR_DUPLICATE_THRESHOLD,
+    SHINGLE_SIZE,
+)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> FrozenSet[int]:
+    """Hashed word n-grams of a text (the whole text if shorter than `size`)."""
+    words = [w.lower() for w in _WORD_RE.findall(text or "")]
+    if len(words) <= size:
+        return frozenset([hash(tuple(words))]) if words else frozenset()
+    return frozenset(hash(tuple(words[i : i + size])) for i in range(len(words) - size + 1))
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class Diversifier:
+    """Near-duplicate suppression followed by MMR selection."""
+
+    def __init__(
+        self,
+        mmr_lambda: float = MMR_LAMBDA,
+        budget: int = CONTEXT_CHUNK_BUDGET,
+        duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        enabled: bool = DIVERSIFY_ENABLED,
+    ):
+        """
+        Args:
+            mmr_lambda: Relevance vs. diversity trade-off (1.0 = relevance only)
+            budget: Chunks to keep (0 = the caller's limit)
+            duplicate_threshold: Shingle Jaccard similarity at which a chunk is a duplicate
+            enabled: False passes results through unchanged
+        """
+        self.mmr_lambda = mmr_lambda
+        self.budget = budget
+        self.duplicate_threshold = duplicate_threshold
+        self.enabled = enabled
+
+    def diversify(
+        self, docs: List[Dict[str, Any]], limit: int
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Select a diverse subset of retrieved chunks.
+
+        Args:
+            docs: Retrieved chunks, best first, with "score" and "markdown"
+                (and "vector" when available, used for MMR similarity)
+            limit: Chunk budget when no CONTEXT_CHUNK_BUDGET is configured
+
+        Returns:
+            Tuple of (selected chunks without vectors, stats)
+        """
+        start = time.perf_counter()
+        budget = self.budget or limit
+
+        if not self.enabled or not docs:
+            selected = docs[:budget] if self.enabled else docs
+            return [self._strip(d) for d in selected], {"enabled": self.enabled}
+
+        doc_shingles = [shingles(d.get("markdown", "")) for d in docs]
+
+        # 1. Near-duplicate suppression: keep the best-ranked copy
+        kept: List[int] = []
+        for i in range(len(docs)):
+            if all(
+                jaccard(doc_shingles[i], doc_shingles[j]) < self.duplicate_threshold
+                for j in kept
+            ):
+                kept.append(i)
+        duplicates = len(docs) - len(kept)
+
+        # 2. MMR over the survivors
+        selected = self._mmr([docs[i] for i in kept], [doc_shingles[i] for i in kept], budget)
+
+        stats = {
+            "enabled": True,
+            "candidates": len(docs),
+            "duplicates_removed": duplicates,
+            "selected": len(selected),
+            "lambda": self.mmr_lambda,
+            "budget": budget,
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        return [self._strip(d) for d in selected], stats
+
+    def _mmr(
+        self,
+        docs: List[Dict[str, Any]],
+        doc_shingles: List[FrozenSet[int]],
+        budget: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Greedy MMR: pick argmax  lambda * rel(d) - (1 - lambda) * max sim(d, selected).
+
+        Relevance is the retrieval score scaled to 0-1; similarity is the cosine
+        of the stored vectors when both chunks have one, shingle Jaccard otherwise.
+        """
+        if len(docs) <= 1:
+            return docs[:budget]
+
+        scores = np.asarray([float(d.get("score", 0.0)) for d in docs], dtype=np.float32)
+        span = float(scores.max() - scores.min())
+        relevance = (scores - scores.min()) / span if span > 0 else np.ones_like(scores)
+
+        similarity = self._similarity_matrix(docs, doc_shingles)
+
+        selected = [0]  # the most relevant chunk always goes first
+        remaining = list(range(1, len(docs)))
+        while remaining and len(selected) < budget:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            mmr = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = remaining[int(np.argmax(mmr))]
+            selected.append(best)
+            remaining.remove(best)
+        return [docs[i] for i in selected]
+
+    @staticmethod
+    def _similarity_matrix(
+        docs: List[Dict[str, Any]], doc_shingles: List[FrozenSet[int]]
+    ) -> np.ndarray:
+        n = len(docs)
+        similarity = np.zeros((n, n), dtype=np.float32)
+
+        vectors: List[Optional[np.ndarray]] = [d.get("vector") for d in docs]
+        with_vector = [i for i, v in enumerate(vectors) if v is not None]
+        if with_vector:
+            matrix = np.stack([vectors[i] for i in with_vector]).astype(np.float32)
+            matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+            similarity[np.ix_(with_vector, with_vector)] = matrix @ matrix.T
+
+        # Chunks without a vector (e.g. BM25-only hits) fall back to shingle overlap
+        has_vector = set(with_vector)
+        for i in range(n):
+            for j in range(i + 1, n):
+                if i not in has_vector or j not in has_vector:
+                    similarity[i, j] = similarity[j, i] = jaccard(
+                        doc_shingles[i], doc_shingles[j]
+                    )
+        return similarity
+
+    @staticmethod
+    def _strip(doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop the vector; it isn't needed past this stage."""
+        if "vector" not in doc:
+            return doc
+        return {k: v for k, v in doc.items() if k != "vector"}
@@ -0,0 +1,226 @@
+"""
+Pluggable embedding backends for EmbeddingService.
+
+- "api":   Hugging Face Inference API (remote, rate limited)
+- "local": in-process CPU inference with ONNX Runtime (no network after the
+           first model download, works offline from the Hugging Face cache)
+"""
+
+import os
+from typing import List, Optional
+import numpy as np
+from config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_NUM_THREADS,
+    EMBEDDING_LOCAL_MODEL_PATH,
+    HUGGINGFACE_API_KEY,
+)
+
+
+class EmbeddingBackend:
+    """
+    Base class for embedding backends.
+
+    `embed` is blocking and is always called from a worker thread by
+    EmbeddingService, so implementations don't need to be async.
+    """
+
+    name = "base"
+    # Remote backends get retries with backoff; local failures are deterministic
+    remote = False
+    # Largest number of texts sent to `embed` in one call
+    max_batch_size = 32
+    # Local tokenizer.json used by the backend, if any (reused for token counting)
+    tokenizer_file = None
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def describe(self) -> str:
+        return f"{self.name} ({self.model_name})"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: List of text strings to embed
+
+        Returns:
+            float32 array of shape (len(texts), dim), not normalized
+        """
+        raise NotImplementedError
+
+
+class HuggingFaceAPIBackend(EmbeddingBackend):
+    """Embeddings from the Hugging Face Inference API (router endpoint)."""
+
+    name = "api"
+    remote = True
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from huggingface_hub import InferenceClient
+
+        # Use huggingface_hub InferenceClient for better model routing
+        self.client = InferenceClient(model=model_name, token=HUGGINGFACE_API_KEY)
+
+    def describe(self) -> str:
+        return f"Hugging Face Inference API: {self.model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        # A single string is sent as-is; some models reject one-item lists
+        payload = texts[0] if len(texts) == 1 else texts
+        result = np.asarray(self.client.feature_extraction(payload), dtype=np.float32)
+
+        # Handle the different response formats the router returns:
+        #   (dim,)            single pooled vector
+        #   (n, dim)          pooled vectors
+        #   (n, tokens, dim)  token embeddings -> mean pool
+        if result.ndim == 1:
+            result = result.reshape(1, -1)
+        elif result.ndim == 3:
+            result = result.mean(axis=1)
+
+        if result.shape[0] != len(texts):
+            raise ValueError(
+                f"Embedding API returned {result.shape[0]} vectors for {len(texts)} texts"
+            )
+        return result
+
+
+class ONNXEmbeddingBackend(EmbeddingBackend):
+    """
+    In-process CPU embeddings with ONNX Runtime.
+
+    Loads the ONNX export that ships with sentence-transformers models
+    (e.g. sentence-transformers/all-MiniLM-L6-v2) and reproduces the
+    sentence-transformers mean pooling.
+    """
+
+    name = "local"
+    # MiniLM was trained with 256-token inputs (sentence-transformers default)
+    max_seq_length = 256
+
+    def __init__(
+        self,
+        model_name: str,
+        num_threads: int = 0,
+        model_path: Optional[str] = None,
+    ):
+        super().__init__(model_name)
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=local requires onnxruntime and tokenizers. "
+                "Install them with: pip install onnxruntime tokenizers"
+            ) from e
+
+        model_file, tokenizer_file = self._resolve_model_files(model_name, model_path)
+
+        self.tokenizer_file = tokenizer_file
+        self.tokenizer = Tokenizer.from_file(tokenizer_file)
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding()
+
+        # 0 means "use every core"
+        self.num_threads = num_threads if num_threads > 0 else (os.cpu_count() or 1)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_file, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def describe(self) -> str:
+        return f"local ONNX Runtime: {self.model_name} ({self.num_threads} threads)"
+
+    @staticmethod
+    def _resolve_model_files(model_name: str, model_path: Optional[str]):
+        """Find model.onnx and tokenizer.json locally or in the Hugging Face cache."""
+        if model_path:
+            candidates = [
+                os.path.join(model_path, "model.onnx"),
+                os.path.join(model_path, "onnx", "model.onnx"),
+            ]
+            model_file = next((p for p in candidates if os.path.exists(p)), None)
+            tokenizer_file = os.path.join(model_path, "tokenizer.json")
+            if model_file is None or not os.path.exists(tokenizer_file):
+                raise FileNotFoundError(
+                    f"EMBEDDING_LOCAL_MODEL_PATH={model_path} must contain "
+                    f"model.onnx (or onnx/model.onnx) and tokenizer.json"
+                )
+            return model_file, tokenizer_file
+
+        from huggingface_hub import hf_hub_download
+
+        # Downloads once, then served from the local cache (HF_HUB_OFFLINE=1 works)
+        model_file = hf_hub_download(
+            model_name, "onnx/model.onnx", token=HUGGINGFACE_API_KEY
+        )
+        tokenizer_file = hf_hub_download(
+            model_name, "tokenizer.json", token=HUGGINGFACE_API_KEY
+        )
+        return model_file, tokenizer_file
+
+    def output_dimension(self) -> Optional[int]:
+        """Embedding size declared by the ONNX graph (None if dynamic)."""
+        dim = self.session.get_outputs()[0].shape[-1]
+        return dim if isinstance(dim, int) else None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array(
+                [e.type_ids for e in encodings], dtype=np.int64
+            )
+
+        # (batch, tokens, dim) token embeddings
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / counts).astype(np.float32)
+
+
+def create_embedding_backend(
+    backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL_NAME
+) -> EmbeddingBackend:
+    """
+    Create the embedding backend selected by EMBEDDING_BACKEND.
+
+    Raises:
+        ValueError: Unknown backend name or model dimension != EMBEDDING_DIMENSION
+    """
+    if backend == "api":
+        return HuggingFaceAPIBackend(model_name)
+
+    if backend == "local":
+        instance = ONNXEmbeddingBackend(
+            model_name,
+            num_threads=EMBEDDING_NUM_THREADS,
+            model_path=EMBEDDING_LOCAL_MODEL_PATH,
+        )
+        dim = instance.output_dimension()
+        if dim is None:
+            dim = instance.embed(["dimension check"]).shape[1]
+        if dim != EMBEDDING_DIMENSION:
+            raise ValueError(
+                f"Local model {model_name} produces {dim}-dim embeddings but "
+                f"EMBEDDING_DIMENSION={EMBEDDING_DIMENSION}"
+            )
+        return instance
+
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected 'api' or 'local')")
@@ -0,0 +1,173 @@
+"""
+Token-aware batching for embedding requests.
+
+Texts are measured in model tokens (with the model's own tokenizer when it is
+available locally, a fast regex estimate otherwise), truncated at a token
+boundary to the model's input limit, and packed into batches that fit a
+per-batch token budget.
+"""
+
+import math
+import os
+import re
+from typing import List, Optional, Tuple
+
+# Input limits (in tokens) for models we know about; others fall back to 512
+MODEL_MAX_TOKENS = {
+    "sentence-transformers/all-MiniLM-L6-v2": 256,
+    "sentence-transformers/all-MiniLM-L12-v2": 256,
+    "sentence-transformers/all-mpnet-base-v2": 384,
+    "BAAI/bge-small-en-v1.5": 512,
+    "BAAI/bge-base-en-v1.5": 512,
+    "BAAI/bge-m3": 8192,
+}
+DEFAULT_MAX_TOKENS = 512
+
+# Words and single punctuation marks, roughly how WordPiece/BPE pre-tokenize
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class TokenCounter:
+    """Counts and truncates text in model tokens."""
+
+    def __init__(self, model_name: str, tokenizer_file: Optional[str] = None):
+        """
+        Args:
+            model_name: Hugging Face model name (used to find a cached tokenizer)
+            tokenizer_file: Explicit tokenizer.json path (e.g. from the local backend)
+        """
+        self.tokenizer = self._load_tokenizer(model_name, tokenizer_file)
+        # [CLS]/[SEP] style tokens the model adds around every input
+        self.special_tokens = (
+            self.tokenizer.num_special_tokens_to_add(False) if self.tokenizer else 2
+        )
+
+    @staticmethod
+    def _load_tokenizer(model_name: str, tokenizer_file: Optional[str]):
+        """Load the model tokenizer if it is available locally (never downloads)."""
+        try:
+            from tokenizers import Tokenizer
+        except ImportError:
+            return None
+
+        try:
+            if tokenizer_file is None:
+                from huggingface_hub import hf_hub_download
+
+                tokenizer_file = hf_hub_download(
+                    model_name, "tokenizer.json", local_files_only=True
+                )
+            if not os.path.exists(tokenizer_file):
+                return None
+            tokenizer = Tokenizer.from_file(tokenizer_file)
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            return tokenizer
+        except Exception:
+            return None
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    @staticmethod
+    def _estimate_piece(piece: str) -> int:
+        # Long words and numbers split into several sub-word tokens
+        return math.ceil(len(piece) / 6) if len(piece) > 1 else 1
+
+    def count_and_truncate(
+        self, texts: List[str], max_tokens: int
+    ) -> Tuple[List[str], List[int]]:
+        """
+        Truncate texts to `max_tokens` (including special tokens) at a token boundary.
+
+        Args:
+            texts: Texts to measure
+            max_tokens: Model input limit in tokens
+
+        Returns:
+            Tuple of (possibly truncated texts, token count of each returned text)
+        """
+        budget = max(1, max_tokens - self.special_tokens)
+        out_texts = []
+        counts = []
+
+        if self.tokenizer is not None:
+            encodings = self.tokenizer.encode_batch(texts, add_special_tokens=False)
+            for text, encoding in zip(texts, encodings):
+                n = len(encoding.ids)
+                if n > budget:
+                    # Cut right after the last token that fits
+                    text = text[: encoding.offsets[budget - 1][1]]
+                    n = budget
+                out_texts.append(text)
+                counts.append(n + self.special_tokens)
+            return out_texts, counts
+
+        for text in texts:
+            n = 0
+            cut = None
+            for match in _PIECE_RE.finditer(text):
+                cost = self._estimate_piece(match.group())
+                if n + cost > budget:
+                    cut = match.start()
+                    break
+                n += cost
+            if cut is not None:
+                text = text[:cut].rstrip()
+            out_texts.append(text)
+            counts.append(n + self.special_tokens)
+        return out_texts, counts
+
+
+class TokenBudgetBatcher:
+    """Packs texts into batches bounded by a token budget and a max batch size."""
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        max_tokens_per_text: int,
+        max_tokens_per_batch: int,
+        max_batch_size: int,
+    ):
+        self.counter = counter
+        self.max_tokens_per_text = max_tokens_per_text
+        # A batch must always fit at least one full-length text
+        self.max_tokens_per_batch = max(max_tokens_per_batch, max_tokens_per_text)
+        self.max_batch_size = max(1, max_batch_size)
+
+    def plan(self, texts: List[str]) -> Tuple[List[str], List[List[int]]]:
+        """
+        Truncate texts and group them into batches.
+
+        Texts are sorted by length before packing so each batch holds texts of
+        similar size (less padding for local inference); callers scatter the
+        results back with the returned indices.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Tuple of (truncated texts in input order, list of index batches)
+        """
+        truncated, counts = self.counter.count_and_truncate(
+            texts, self.max_tokens_per_text
+        )
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for idx in sorted(range(len(texts)), key=lambda i: counts[i]):
+            if current and (
+                current_tokens + counts[idx] > self.max_tokens_per_batch
+                or len(current) >= self.max_batch_size
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(idx)
+            current_tokens += counts[idx]
+        if current:
+            batches.append(current)
+
+        return truncated, batches
@@ -0,0 +1,161 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Embeddings are keyed by sha256(model name + normalized chunk text) and stored
+as float32 blobs in SQLite, so re-scrapes and refreshes only embed chunks
+whose text actually changed.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with LRU eviction and hit/miss counters."""
+
+    def __init__(self, path: str, model_name: str, max_entries: int = 200000):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file (created if missing)
+            model_name: Embedding model name, part of every key
+            max_entries: Maximum number of cached vectors before eviction
+        """
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Shared across worker threads; every access goes through self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets several gunicorn workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        """Content hash of (model, normalized text)."""
+        normalized = _WHITESPACE_RE.sub(" ", text).strip()
+        return hashlib.sha256(
+            f"{self.model_name}\0{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Look up cached embeddings.
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Mapping of input index -> float32 vector for every cache hit
+        """
+        if not texts:
+            return {}
+
+        keys = [self._key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique_keys = list(set(keys))
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+        results = {idx: found[key] for idx, key in enumerate(keys) if key in found}
+        self.hits += len(results)
+        self.misses += len(texts) - len(results)
+        return results
+
+    def put_many(self, texts: List[str], vectors) -> None:
+        """
+        Store embeddings, evicting the least recently used entries if full.
+
+        Args:
+            texts: Texts that were embedded
+            vectors: Matching embedding vectors
+        """
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (self._key(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._entries += self._conn.total_changes - before
+
+            if self._entries > self.max_entries:
+                # Evict down to 90% so we don't evict on every insert
+                excess = self._entries - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+                self._entries -= excess
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Hit/miss counters for monitoring."""
+        total = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else None,
+        }
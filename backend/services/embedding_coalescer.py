@@ -0,0 +1,120 @@
+"""
+Micro-batching for single-query embeddings.
+
+Concurrent /api/query and /api/widget/query requests each need one query
+embedding. The coalescer collects queries that arrive within a short window
+into a single batched backend call and fans the vectors back to the callers.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+import numpy as np
+
+# Upper bounds of the batch-size histogram buckets
+_HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class QueryEmbeddingCoalescer:
+    """Coalesces concurrent single-text embedding requests into batches."""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        """
+        Args:
+            embed_fn: Async function embedding a list of texts into an (n, dim) array
+            max_batch: Flush as soon as this many queries are waiting
+            max_wait_ms: Flush at most this long after the first query arrived
+        """
+        self._embed_fn = embed_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.batches = 0
+        self.queries = 0
+        self.max_batch_seen = 0
+        self.histogram: Dict[str, int] = {self._bucket(b): 0 for b in _HISTOGRAM_BUCKETS}
+        self.histogram[f">{_HISTOGRAM_BUCKETS[-1]}"] = 0
+
+    @staticmethod
+    def _bucket(size: int) -> str:
+        for upper in _HISTOGRAM_BUCKETS:
+            if size <= upper:
+                return f"<={upper}"
+        return f">{_HISTOGRAM_BUCKETS[-1]}"
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a single text as part of the next batch.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            1-D embedding vector
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send everything that is waiting as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        size = len(batch)
+        self.batches += 1
+        self.queries += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.histogram[self._bucket(size)] += 1
+
+        task = asyncio.ensure_future(self._run(batch))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            embeddings = await self._embed_fn([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            # Callers may have been cancelled (e.g. client disconnected)
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size distribution and totals."""
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": (self.queries / self.batches) if self.batches else None,
+            "max_batch_size_seen": self.max_batch_seen,
+            "batch_size_histogram": dict(self.histogram),
+            "pending": len(self._pending),
+        }
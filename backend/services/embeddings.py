@@ -1,188 +1,287 @@
 import asyncio
-import time
 import random
-from typing import List
-from huggingface_hub import InferenceClient
-from config import HUGGINGFACE_API_KEY, EMBEDDING_MODEL_NAME
+import re
+from typing import Any, Dict, List, Optional
+import numpy as np
+from services.embedding_backends import create_embedding_backend
+from services.embedding_cache import EmbeddingCache
+from services.cache import LRUCache
+from services.embedding_batching import (
+    TokenCounter,
+    TokenBudgetBatcher,
+    MODEL_MAX_TOKENS,
+    DEFAULT_MAX_TOKENS,
+)
+from services.embedding_coalescer import QueryEmbeddingCoalescer
+from services.rate_limit import AdaptiveConcurrencyLimiter
+from config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_TOKENS_PER_TEXT,
+    EMBEDDING_MAX_TOKENS_PER_BATCH,
+    QUERY_EMBEDDING_MAX_BATCH,
+    QUERY_EMBEDDING_MAX_WAIT_MS,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """Check whether an embedding API error is an HTTP 429."""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "too many requests" in message
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header from an API error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
 
 
 class EmbeddingService:
     def __init__(self):
-        # Use huggingface_hub InferenceClient for better model routing
-        self.client = InferenceClient(
-            model=EMBEDDING_MODEL_NAME, token=HUGGINGFACE_API_KEY
-        )
-        # Retry configuration
-        self.max_retries = 3
+        # Backend is selected by EMBEDDING_BACKEND ("api" or "local")
+        self.backend = create_embedding_backend()
+        # Retry configuration (only used for remote backends)
+        self.max_retries = 3 if self.backend.remote else 1
         self.base_delay = 1.0  # seconds
         self.max_delay = 10.0  # seconds
-        print(f"Using Hugging Face Inference API: {EMBEDDING_MODEL_NAME}")
+        # In-flight batch limit; tightened automatically on HTTP 429.
+        # Local inference already uses every core, so batches run one at a time.
+        self.limiter = AdaptiveConcurrencyLimiter(
+            EMBEDDING_MAX_CONCURRENCY if self.backend.remote else 1
+        )
+        print(f"Using embedding backend: {self.backend.describe()}")
+
+        # Pack batches by token count instead of a fixed number of texts
+        token_counter = TokenCounter(
+            EMBEDDING_MODEL_NAME, tokenizer_file=self.backend.tokenizer_file
+        )
+        self.batcher = TokenBudgetBatcher(
+            token_counter,
+            max_tokens_per_text=EMBEDDING_MAX_TOKENS_PER_TEXT
+            or MODEL_MAX_TOKENS.get(EMBEDDING_MODEL_NAME, DEFAULT_MAX_TOKENS),
+            max_tokens_per_batch=EMBEDDING_MAX_TOKENS_PER_BATCH,
+            max_batch_size=self.backend.max_batch_size,
+        )
+        print(
+            f"Embedding batcher: {self.batcher.max_tokens_per_text} tokens/text, "
+            f"{self.batcher.max_tokens_per_batch} tokens/batch "
+            f"({'tokenizer' if token_counter.exact else 'estimated'} counts)"
+        )
+
+        # Concurrent single-query requests are coalesced into one batched call
+        self.query_coalescer = QueryEmbeddingCoalescer(
+            self.generate_embeddings,
+            max_batch=QUERY_EMBEDDING_MAX_BATCH,
+            max_wait_ms=QUERY_EMBEDDING_MAX_WAIT_MS,
+        )
+
+        # Repeated questions ("pricing?") are served from memory; identical
+        # queries in flight at the same time share one backend call
+        self.query_cache = LRUCache(
+            maxsize=QUERY_EMBEDDING_CACHE_SIZE, ttl=QUERY_EMBEDDING_CACHE_TTL
+        )
+
+        # Persistent cache in front of the backend (optional)
+        self.cache = None
+        if EMBEDDING_CACHE_ENABLED:
+            try:
+                self.cache = EmbeddingCache(
+                    EMBEDDING_CACHE_PATH,
+                    model_name=EMBEDDING_MODEL_NAME,
+                    max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+                )
+                print(f"Embedding cache enabled: {EMBEDDING_CACHE_PATH}")
+            except Exception as e:
+                print(f"Warning: Could not open embedding cache: {str(e)}")
+
+    async def _retry_with_backoff(self, func, *args, **kwargs):
+        """
+        Run a blocking backend call in a worker thread with exponential backoff.
 
-    def _retry_with_backoff(self, func, *args, **kwargs):
-        """Execute function with exponential backoff retry logic."""
+        Waiting between attempts uses asyncio.sleep, so no thread is held
+        during backoff. Each attempt occupies one slot of the concurrency limiter.
+        """
         last_exception = None
         for attempt in range(self.max_retries):
             try:
-                return func(*args, **kwargs)
+                async with self.limiter:
+                    result = await asyncio.to_thread(func, *args, **kwargs)
+                self.limiter.on_success()
+                return result
             except Exception as e:
                 last_exception = e
+                rate_limited = _is_rate_limited(e)
+                if rate_limited:
+                    self.limiter.on_throttle()
                 if attempt < self.max_retries - 1:
-                    # Exponential backoff with jitter
+                    # Exponential backoff with jitter (honor Retry-After on 429)
                     delay = min(
                         self.base_delay * (2**attempt) + random.uniform(0, 1),
                         self.max_delay,
                     )
+                    retry_after = _retry_after_seconds(e) if rate_limited else None
+                    if retry_after is not None:
+                        delay = min(max(delay, retry_after), self.max_delay)
                     print(
                         f"Embedding API attempt {attempt + 1} failed: {str(e)}. Retrying in {delay:.1f}s..."
                     )
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
         raise last_exception
 
-    async def _call_api(self, texts: List[str]) -> List[List[float]]:
+    async def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        """Embed one batch, falling back to one-by-one calls if the batch fails."""
+        try:
+            return await self._retry_with_backoff(self.backend.embed, batch)
+        except Exception:
+            if len(batch) == 1:
+                raise
+            # If batch fails after retries, process individually with retry
+            results = await asyncio.gather(
+                *[self._retry_with_backoff(self.backend.embed, [t]) for t in batch]
+            )
+            return np.vstack(results)
+
+    async def _call_api(self, texts: List[str]) -> np.ndarray:
         """
-        Call Hugging Face Inference API to generate embeddings using InferenceClient.
-        Optimized with batching and retry logic for better performance and reliability.
+        Generate embeddings with the configured backend.
+        Texts are packed into token-budgeted batches that are sent concurrently with retries.
 
         Args:
             texts: List of text strings to embed
 
         Returns:
-            List of embedding vectors
+            float32 array of shape (len(texts), dim), not normalized
         """
-        # Truncate texts to prevent token limit issues (512 tokens for MiniLM)
-        # Approximate: 4 chars per token, so ~2000 chars max
-        max_chars = 2000
-        truncated_texts = [t[:max_chars] if len(t) > max_chars else t for t in texts]
-
-        # Use InferenceClient which handles routing correctly
-        def _embed():
-            # InferenceClient.feature_extraction handles the API call correctly
-            # It automatically routes to the right endpoint
-            if len(truncated_texts) == 1:
-                # Single text with retry
-                result = self._retry_with_backoff(
-                    self.client.feature_extraction, truncated_texts[0]
-                )
-                return (
-                    [result]
-                    if isinstance(result, list)
-                    and len(result) > 0
-                    and isinstance(result[0], (int, float))
-                    else [result]
-                )
-            else:
-                # Multiple texts - process in optimized batches to reduce API calls
-                # Dynamic batch size based on total text length
-                total_chars = sum(len(t) for t in truncated_texts)
-                batch_size = 16 if total_chars > 20000 else 32
-                embeddings = []
-
-                for i in range(0, len(truncated_texts), batch_size):
-                    batch = truncated_texts[i : i + batch_size]
-
-                    if len(batch) == 1:
-                        result = self._retry_with_backoff(
-                            self.client.feature_extraction, batch[0]
-                        )
-                        if isinstance(result, list) and len(result) > 0:
-                            if isinstance(result[0], (int, float)):
-                                embeddings.append(result)
-                            elif isinstance(result[0], list):
-                                embeddings.append(result[0])
-                        else:
-                            embeddings.append(result)
-                    else:
-                        # Try batch processing first with retry
-                        try:
-                            batch_results = self._retry_with_backoff(
-                                self.client.feature_extraction, batch
-                            )
-                            # Handle different response formats
-                            if isinstance(batch_results, list):
-                                for result in batch_results:
-                                    if isinstance(result, list) and len(result) > 0:
-                                        if isinstance(result[0], (int, float)):
-                                            embeddings.append(result)
-                                        elif isinstance(result[0], list):
-                                            embeddings.append(result[0])
-                                    else:
-                                        embeddings.append(result)
-                            else:
-                                # Fallback: process individually with retry
-                                for text in batch:
-                                    result = self._retry_with_backoff(
-                                        self.client.feature_extraction, text
-                                    )
-                                    if isinstance(result, list) and len(result) > 0:
-                                        if isinstance(result[0], (int, float)):
-                                            embeddings.append(result)
-                                        elif isinstance(result[0], list):
-                                            embeddings.append(result[0])
-                                    else:
-                                        embeddings.append(result)
-                        except Exception:
-                            # If batch fails after retries, process individually with retry
-                            for text in batch:
-                                result = self._retry_with_backoff(
-                                    self.client.feature_extraction, text
-                                )
-                                if isinstance(result, list) and len(result) > 0:
-                                    if isinstance(result[0], (int, float)):
-                                        embeddings.append(result)
-                                    elif isinstance(result[0], list):
-                                        embeddings.append(result[0])
-                                else:
-                                    embeddings.append(result)
-
-                return embeddings
-
-        # Run in thread pool to avoid blocking
-        embeddings = await asyncio.to_thread(_embed)
+        # Truncate at token boundaries and pack batches by token budget
+        truncated_texts, batches = await asyncio.to_thread(self.batcher.plan, texts)
+
+        # Dispatch all batches concurrently; the limiter bounds how many are in flight
+        tasks = [
+            asyncio.create_task(
+                self._embed_batch([truncated_texts[i] for i in indices])
+            )
+            for indices in batches
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        # Scatter batch results back into input order
+        embeddings = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        for indices, part in zip(batches, parts):
+            embeddings[indices] = part
         return embeddings
 
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """
-        Generate embeddings for a list of texts using Hugging Face Inference API.
+        Generate embeddings for a list of texts using the configured backend.
 
         Args:
             texts: List of text strings to embed
 
         Returns:
-            List of embedding vectors
+            Contiguous float32 array of shape (len(texts), EMBEDDING_DIMENSION),
+            L2-normalized row by row
         """
         try:
-            # Normalize embeddings after getting them from API
-            embeddings = await self._call_api(texts)
-
-            # Normalize embeddings for better cosine similarity
-            normalized_embeddings = []
-            for emb in embeddings:
-                import math
-
-                norm = math.sqrt(sum(x * x for x in emb))
-                if norm > 0:
-                    normalized = [x / norm for x in emb]
-                else:
-                    normalized = emb
-                normalized_embeddings.append(normalized)
-
-            return normalized_embeddings
+            if not texts:
+                return np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
+
+            # Serve unchanged chunks from the persistent cache
+            cached = {}
+            if self.cache is not None:
+                try:
+                    cached = await asyncio.to_thread(self.cache.get_many, texts)
+                except Exception as cache_error:
+                    print(f"Warning: Embedding cache lookup failed: {str(cache_error)}")
+
+            missing = [i for i in range(len(texts)) if i not in cached]
+            missing_texts = [texts[i] for i in missing]
+
+            normalized_embeddings = None
+            if missing_texts:
+                embeddings = await self._call_api(missing_texts)
+                normalized_embeddings = self._normalize(embeddings)
+
+                if self.cache is not None:
+                    try:
+                        await asyncio.to_thread(
+                            self.cache.put_many, missing_texts, normalized_embeddings
+                        )
+                    except Exception as cache_error:
+                        print(f"Warning: Embedding cache write failed: {str(cache_error)}")
+
+            if not cached:
+                return normalized_embeddings
+
+            # Merge cache hits and fresh embeddings back into input order
+            hit_indices = list(cached.keys())
+            dim = len(cached[hit_indices[0]])
+            result = np.empty((len(texts), dim), dtype=np.float32)
+            result[hit_indices] = np.stack([cached[i] for i in hit_indices])
+            if missing:
+                result[missing] = normalized_embeddings
+            return result
         except Exception as e:
             raise Exception(f"Embedding generation failed: {str(e)}")
 
-    async def generate_query_embedding(self, query: str) -> List[float]:
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        """L2-normalize every row (zero vectors are left as-is) for cosine similarity."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
+
+    async def generate_query_embedding(self, query: str) -> np.ndarray:
         """
-        Generate embedding for a single query using Hugging Face Inference API.
+        Generate embedding for a single query using the configured backend.
 
         Args:
             query: Query string to embed
 
         Returns:
-            Embedding vector
+            1-D float32 embedding vector
         """
         try:
-            # Use the same method but for a single text
-            embeddings = await self.generate_embeddings([query])
-            return embeddings[0]
+            # Case/whitespace-insensitive key; the first caller's text is embedded
+            key = (EMBEDDING_MODEL_NAME, _WHITESPACE_RE.sub(" ", query).strip().casefold())
+
+            async def _embed_query() -> np.ndarray:
+                # Batched together with other queries arriving in the same window
+                embedding = await self.query_coalescer.embed(query)
+                # Shared between callers, so make sure nobody mutates it
+                embedding.setflags(write=False)
+                return embedding
+
+            return await self.query_cache.get_or_compute(key, _embed_query)
         except Exception as e:
             raise Exception(f"Query embedding generation failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics for the embedding pipeline."""
+        return {
+            "backend": self.backend.describe(),
+            "concurrency": self.limiter.stats(),
+            "query_batching": self.query_coalescer.stats(),
+            "query_cache": self.query_cache.stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
@@ -0,0 +1,526 @@
+"""
+Hybrid lexical + dense retrieval.
+
+Dense MiniLM embeddings blur exact tokens (product names, error codes, API
+identifiers), so hybrid mode also ranks chunks with BM25 over an in-process
+inverted index and merges both rankings with reciprocal-rank fusion (RRF).
+
+The BM25 index of a crawl (or widget site) is built from the chunks already
+stored in Qdrant on the first hybrid query and kept in an LRU cache bounded
+by the total number of chunks indexed. When the crawl's write version
+changes, the cached index keeps answering while a new one is built in the
+background, at most once per LEXICAL_INDEX_REBUILD_INTERVAL, so a crawl that
+is still being ingested is not re-read on every query. An expired index
+(LEXICAL_INDEX_TTL) is rebuilt before answering.
+
+Whole retrievals are cached as well, keyed by the tenant, its write version
+and the normalized query, so a popular question asked in many chats runs
+embedding + search once per crawl version.
+"""
+
+import asyncio
+import math
+import re
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from config import (
+    COLLECTION_NAME,
+    WIDGET_COLLECTION_NAME,
+    RETRIEVAL_MODE,
+    HYBRID_RRF_K,
+    LEXICAL_INDEX_CACHE_SIZE,
+    LEXICAL_INDEX_TTL,
+    LEXICAL_INDEX_MAX_DOCS,
+    LEXICAL_INDEX_REBUILD_INTERVAL,
+    SEARCH_RESULT_CACHE_SIZE,
+    SEARCH_RESULT_CACHE_TTL,
+)
+from services.cache import LRUCache
+from services.diversify import Diversifier
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+# Identifiers stay whole ("ERR_CONN_RESET", "v2.1.0", "api/v1/users")...
+_TOKEN_RE = re.compile(r"\w+(?:[.\-:/]\w+)*", re.UNICODE)
+# ...and are also indexed by their parts (snake_case, dotted, camelCase)
+_PART_SPLIT_RE = re.compile(r"[_.\-:/]+|(?<=[a-z0-9])(?=[A-Z])")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: case-folded, whitespace collapsed."""
+    return " ".join((query or "").split()).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms: whole identifiers plus their sub-parts."""
+    terms = []
+    for match in _TOKEN_RE.finditer(text or ""):
+        token = match.group()
+        terms.append(token.lower())
+        parts = [p for p in _PART_SPLIT_RE.split(token) if p]
+        if len(parts) > 1:
+            terms.extend(p.lower() for p in parts)
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of chunk payloads."""
+
+    def __init__(
+        self,
+        docs: List[Dict[str, Any]],
+        text_fields: Tuple[str, ...] = ("title", "markdown"),
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        """
+        Args:
+            docs: Chunk payloads (kept to build results from)
+            text_fields: Payload fields that are indexed
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+        # Write version of the tenant the docs were read at (set by the builder)
+        self.version: Optional[int] = None
+        self.built_at = time.monotonic()
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for doc_id, doc in enumerate(docs):
+            terms = tokenize(" ".join(str(doc.get(f) or "") for f in text_fields))
+            lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if len(docs) else 0.0
+
+        n = len(docs)
+        # term -> (doc ids, term frequencies, idf)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, entries in postings.items():
+            ids = np.fromiter((e[0] for e in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((e[1] for e in entries), dtype=np.float32, count=len(entries))
+            idf = math.log(1.0 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings[term] = (ids, tfs, idf)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Rank documents for a query.
+
+        Returns:
+            (doc index, BM25 score) pairs, best first; only documents sharing a term
+        """
+        if not self.docs:
+            return []
+
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            ids, tfs, idf = entry
+            norm = tfs + self.k1 * (
+                1.0 - self.b + self.b * self.doc_lengths[ids] / (self.avg_length or 1.0)
+            )
+            scores[ids] += idf * tfs * (self.k1 + 1.0) / norm
+
+        matched = np.flatnonzero(scores)
+        if matched.size == 0:
+            return []
+        if matched.size > limit:
+            top = np.argpartition(-scores[matched], limit - 1)[:limit]
+            matched = matched[top]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in order]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """
+    Fuse rankings of document keys: score(d) = sum over rankings of 1 / (k + rank).
+
+    Returns:
+        Fused score per key
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class HybridRetriever:
+    """Dense, lexical (BM25) or hybrid (RRF) retrieval for crawls and widget sites."""
+
+    def __init__(self, vector_store, embedding_service):
+        self.vector_store = vector_store
+        self.embedding_service = embedding_service
+        self.indexes = LRUCache(
+            maxsize=LEXICAL_INDEX_CACHE_SIZE,
+            ttl=LEXICAL_INDEX_TTL,
+            max_weight=LEXICAL_INDEX_MAX_DOCS,
+            weigh=len,
+        )
+        # Background rebuilds of stale indexes, by index key
+        self._rebuilds: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self.stale_lexical_searches = 0
+        self.rrf_k = HYBRID_RRF_K
+        self.diversifier = Diversifier()
+        # (collection, tenant, write version, query, limit, ...) -> (results, stats)
+        self.results: Optional[LRUCache] = (
+            LRUCache(maxsize=SEARCH_RESULT_CACHE_SIZE, ttl=SEARCH_RESULT_CACHE_TTL)
+            if SEARCH_RESULT_CACHE_SIZE > 0
+            else None
+        )
+        # Retrievals answered from the cache (including joined in-flight ones) vs. computed
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # ============== Lexical index ==============
+
+    async def lexical_index(
+        self, collection_name: str, filter_key: str, filter_value: str
+    ) -> BM25Index:
+        """
+        BM25 index of every chunk matching the filter (built on first use).
+
+        An index older than the tenant's latest write is returned as it is
+        and rebuilt in the background (see _schedule_rebuild); check
+        `index.version` to tell.
+        """
+        key = (collection_name, filter_key, filter_value)
+        index = self.indexes.get(key)
+        if index is not None:
+            if index.version != self.vector_store._tenant_version(collection_name, filter_value):
+                self._schedule_rebuild(key, index)
+            return index
+        return await self.indexes.get_or_compute(key, lambda: self._build_index(*key))
+
+    def _schedule_rebuild(self, key: Tuple[str, str, str], stale: BM25Index):
+        """Rebuild a stale index in the background, debounced by LEXICAL_INDEX_REBUILD_INTERVAL."""
+        if key in self._rebuilds:
+            return
+        if time.monotonic() - stale.built_at < LEXICAL_INDEX_REBUILD_INTERVAL:
+            return  # still being written; a later query rebuilds it
+
+        async def rebuild():
+            index = await self._build_index(*key)
+            if self.indexes.get(key) is stale:  # not dropped or replaced meanwhile
+                self.indexes.set(key, index)
+
+        task = asyncio.create_task(rebuild())
+        self._rebuilds[key] = task
+
+        def _done(finished: asyncio.Task):
+            self._rebuilds.pop(key, None)
+            if not finished.cancelled() and finished.exception() is not None:
+                print(f"BM25 index rebuild failed for {key[1]}={key[2]}: {str(finished.exception())}")
+
+        task.add_done_callback(_done)
+
+    async def _build_index(
+        self, collection_name: str, filter_key: str, filter_value: str
+    ) -> BM25Index:
+        # Read before scrolling: writes landing during the build make it stale
+        version = self.vector_store._tenant_version(collection_name, filter_value)
+        docs: List[Dict[str, Any]] = []
+        async for page in self.vector_store.iter_chunks(
+            filter_key, filter_value, collection_name=collection_name, page_size=1024
+        ):
+            docs.extend(page)
+        start = time.perf_counter()
+        index = await asyncio.to_thread(BM25Index, docs)
+        index.version = version
+        print(
+            f"Built BM25 index for {filter_key}={filter_value}: {len(docs)} chunks, "
+            f"{len(index.postings)} terms in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+        return index
+
+    # ============== Retrieval ==============
+
+    async def search_crawl(
+        self,
+        query: str,
+        crawl_id: str,
+        limit: int,
+        mode: Optional[str] = None,
+        budget: Optional[int] = None,
+        score_threshold: float = 0.3,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Retrieve chunks of a crawl.
+
+        Args:
+            query: User query
+            crawl_id: Crawl to search
+            limit: Candidates to retrieve
+            mode: "dense", "lexical" or "hybrid" (None = RETRIEVAL_MODE)
+            budget: Chunks to keep after diversification (None = limit)
+            score_threshold: Minimum dense similarity score (not applied to
+                BM25 hits; in "lexical" mode scores are scaled to the top hit)
+
+        Returns:
+            Tuple of (results in search_similar format, retrieval stats with per-stage latency)
+        """
+
+        async def dense_search(embedding):
+            return await self.vector_store.search_similar(
+                query_embedding=embedding,
+                crawl_id=crawl_id,
+                limit=limit,
+                score_threshold=score_threshold,
+                with_vectors=self.diversifier.enabled,
+            )
+
+        return await self._retrieve(
+            query,
+            limit,
+            budget,
+            mode,
+            dense_search,
+            COLLECTION_NAME,
+            "crawl_id",
+            crawl_id,
+            self.vector_store.crawl_result,
+            score_threshold,
+        )
+
+    async def search_widget(
+        self,
+        query: str,
+        site_id: str,
+        limit: int,
+        mode: Optional[str] = None,
+        budget: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Retrieve chunks of a widget site (see search_crawl)."""
+
+        async def dense_search(embedding):
+            return await self.vector_store.widget_search_similar(
+                query_embedding=embedding,
+                site_id=site_id,
+                limit=limit,
+                with_vectors=self.diversifier.enabled,
+            )
+
+        return await self._retrieve(
+            query,
+            limit,
+            budget,
+            mode,
+            dense_search,
+            WIDGET_COLLECTION_NAME,
+            "site_id",
+            site_id,
+            self.vector_store.widget_result,
+        )
+
+    async def _retrieve(
+        self,
+        query: str,
+        limit: int,
+        budget: Optional[int],
+        mode: Optional[str],
+        dense_search: Callable[[Any], Awaitable[List[Dict[str, Any]]]],
+        collection_name: str,
+        filter_key: str,
+        filter_value: str,
+        to_result: Callable[[Dict[str, Any], float], Dict[str, Any]],
+        score_threshold: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        mode = mode or RETRIEVAL_MODE
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}' (expected one of {RETRIEVAL_MODES})")
+
+        def run():
+            return self._run_retrieval(
+                query,
+                limit,
+                budget,
+                mode,
+                dense_search,
+                collection_name,
+                filter_key,
+                filter_value,
+                to_result,
+            )
+
+        if self.results is None:
+            return await run()
+
+        start = time.perf_counter()
+        key = (
+            collection_name,
+            filter_value,
+            self.vector_store._tenant_version(collection_name, filter_value),
+            normalize_query(query),
+            mode,
+            limit,
+            budget,
+            score_threshold,
+        )
+        computed = False
+
+        async def compute():
+            nonlocal computed
+            computed = True
+            return await run()
+
+        # Concurrent identical queries share one retrieval
+        results, stats = await self.results.get_or_compute(key, compute)
+        if computed:
+            self.cache_misses += 1
+            if stats.get("lexical_stale"):
+                # Answered by an index missing the latest writes: not for reuse
+                self.results.pop(key)
+            return list(results), {**stats, "cache": "miss"}
+        self.cache_hits += 1
+        return list(results), {
+            **stats,
+            "cache": "hit",
+            "timings_ms": {"total": round((time.perf_counter() - start) * 1000, 2)},
+        }
+
+    async def _run_retrieval(
+        self,
+        query: str,
+        limit: int,
+        budget: Optional[int],
+        mode: str,
+        dense_search: Callable[[Any], Awaitable[List[Dict[str, Any]]]],
+        collection_name: str,
+        filter_key: str,
+        filter_value: str,
+        to_result: Callable[[Dict[str, Any], float], Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        timings: Dict[str, float] = {}
+        total_start = time.perf_counter()
+
+        async def dense_branch() -> List[Dict[str, Any]]:
+            start = time.perf_counter()
+            embedding = await self.embedding_service.generate_query_embedding(query)
+            timings["embed"] = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            results = await dense_search(embedding)
+            timings["dense"] = (time.perf_counter() - start) * 1000
+            return results
+
+        lexical_stale = False
+
+        async def lexical_branch() -> List[Dict[str, Any]]:
+            nonlocal lexical_stale
+            start = time.perf_counter()
+            index = await self.lexical_index(collection_name, filter_key, filter_value)
+            if index.version != self.vector_store._tenant_version(collection_name, filter_value):
+                lexical_stale = True
+                self.stale_lexical_searches += 1
+            hits = index.search(query, limit)
+            timings["lexical"] = (time.perf_counter() - start) * 1000
+            return [to_result(index.docs[i], score) for i, score in hits]
+
+        dense_results: List[Dict[str, Any]] = []
+        lexical_results: List[Dict[str, Any]] = []
+        if mode == "dense":
+            dense_results = await dense_branch()
+            results = dense_results
+        elif mode == "lexical":
+            lexical_results = await lexical_branch()
+            results = self._scale_lexical(lexical_results)
+        else:
+            # The lexical index lookup doesn't need the query embedding
+            dense_results, lexical_results = await asyncio.gather(
+                dense_branch(), lexical_branch()
+            )
+            start = time.perf_counter()
+            results = self._fuse(dense_results, lexical_results, limit)
+            timings["fusion"] = (time.perf_counter() - start) * 1000
+
+        # Drop near-duplicate chunks and pick a diverse subset for the prompt
+        start = time.perf_counter()
+        results, diversity = self.diversifier.diversify(results, budget or limit)
+        timings["diversify"] = (time.perf_counter() - start) * 1000
+
+        timings["total"] = (time.perf_counter() - total_start) * 1000
+        stats = {
+            "mode": mode,
+            "timings_ms": {stage: round(ms, 2) for stage, ms in timings.items()},
+            "candidates": {"dense": len(dense_results), "lexical": len(lexical_results)},
+            "diversity": diversity,
+        }
+        if lexical_stale:
+            stats["lexical_stale"] = True
+        return results, stats
+
+    @staticmethod
+    def _scale_lexical(lexical_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Scale BM25 scores to 0-1 (relative to the top hit) for lexical-only results.
+
+        Raw BM25 scores are unbounded, so callers and the diversifier that
+        expect a similarity in `score` get the scaled one; the raw score is
+        kept as lexical_score. No similarity threshold applies to them.
+        """
+        top = max((doc["score"] for doc in lexical_results), default=0.0)
+        return [
+            {**doc, "lexical_score": doc["score"], "score": doc["score"] / top if top > 0 else 0.0}
+            for doc in lexical_results
+        ]
+
+    def _fuse(
+        self,
+        dense_results: List[Dict[str, Any]],
+        lexical_results: List[Dict[str, Any]],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Merge both rankings with RRF; `score` becomes the fused score scaled to 0-1."""
+        fused = reciprocal_rank_fusion(
+            [
+                [doc["page_id"] for doc in dense_results],
+                [doc["page_id"] for doc in lexical_results],
+            ],
+            k=self.rrf_k,
+        )
+
+        docs: Dict[str, Dict[str, Any]] = {}
+        for doc in lexical_results:
+            docs[doc["page_id"]] = {**doc, "lexical_score": doc["score"]}
+        for doc in dense_results:
+            lexical_score = docs.get(doc["page_id"], {}).get("lexical_score")
+            docs[doc["page_id"]] = {
+                **doc,
+                "dense_score": doc["score"],
+                "lexical_score": lexical_score,
+            }
+
+        # Best possible fused score: ranked first by both retrievers
+        max_score = 2.0 / (self.rrf_k + 1)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [{**docs[key], "score": score / max_score} for key, score in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        """Result cache and lexical index cache metrics."""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "result_cache": {
+                **self.results.stats(),
+                "retrieval_hits": self.cache_hits,
+                "retrieval_misses": self.cache_misses,
+                "retrieval_hit_rate": (self.cache_hits / total) if total else None,
+            }
+            if self.results is not None
+            else None,
+            "lexical_indexes": {
+                **self.indexes.stats(),
+                "rebuilding": len(self._rebuilds),
+                "stale_searches": self.stale_lexical_searches,
+            },
+        }
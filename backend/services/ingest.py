@@ -0,0 +1,182 @@
+"""
+Streaming ingest of crawled pages: chunk, embed and store while crawling.
+
+Pages are added as the scraper yields them. Their chunks queue up and are
+embedded in batches in the background, so the first pages of a crawl are
+searchable long before the last ones are scraped.
+
+Each page is tracked until all of its chunks are stored: `on_page_stored`
+runs for pages whose chunks all made it, and pages with a chunk that failed
+to chunk, embed or store end up in `failed_pages`.
+"""
+
+import asyncio
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Set
+from config import INGEST_BATCH_CHUNKS, INGEST_MAX_INFLIGHT_BATCHES
+
+
+class PageIngestor:
+    """Chunks, embeds and stores the pages of one crawl as they arrive."""
+
+    def __init__(
+        self,
+        crawl_id: str,
+        chunking_service,
+        embedding_service,
+        vector_store,
+        batch_chunks: int = INGEST_BATCH_CHUNKS,
+        max_inflight: int = INGEST_MAX_INFLIGHT_BATCHES,
+        on_page_stored: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """
+        Args:
+            crawl_id: Crawl the pages belong to
+            batch_chunks: Chunks embedded per batch
+            max_inflight: Batches embedding at the same time
+            on_page_stored: Called with a page's data once all its chunks are stored
+        """
+        self.crawl_id = crawl_id
+        self.chunking_service = chunking_service
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.batch_chunks = max(1, batch_chunks)
+        self.max_inflight = max(1, max_inflight)
+        self.on_page_stored = on_page_stored
+
+        self._pending: List[Dict[str, Any]] = []
+        self._tasks: Set[asyncio.Task] = set()
+        # page_id -> [page_data, chunks not stored yet]
+        self._unstored: Dict[str, List[Any]] = {}
+
+        # url -> page_data of pages that lost a chunk; their index entry is
+        # incomplete (or missing) and should not be taken as up to date
+        self.failed_pages: Dict[str, Dict[str, Any]] = {}
+
+        self.pages = 0
+        self.chunks_queued = 0
+        self.chunks_stored = 0
+        self.chunks_failed = 0
+
+    def add_page(self, page_data: Dict[str, Any]) -> int:
+        """
+        Chunk a page and queue its chunks for embedding.
+
+        Returns:
+            Number of chunks queued
+        """
+        self.pages += 1
+        markdown = page_data.get("markdown", "")
+        if not markdown or not markdown.strip():
+            self._page_stored(page_data)
+            return 0
+        try:
+            chunks = self.chunking_service.chunk_markdown(markdown)
+        except Exception as e:
+            print(f"Warning: Failed to chunk {page_data['url']}: {str(e)}")
+            self.failed_pages[page_data["url"]] = page_data
+            return 0
+        if not chunks:
+            self._page_stored(page_data)
+            return 0
+
+        self._unstored[page_data["page_id"]] = [page_data, len(chunks)]
+
+        for idx, chunk in enumerate(chunks):
+            self._pending.append(
+                {
+                    "page_id": f"{page_data['page_id']}_chunk_{idx}",
+                    "url": page_data["url"],
+                    "markdown": chunk["text"],
+                    "metadata": {
+                        **page_data.get("metadata", {}),
+                        "chunk_index": chunk["chunk_index"],
+                        "total_chunks": chunk["total_chunks"],
+                        "original_page_id": page_data["page_id"],
+                    },
+                    "crawl_id": self.crawl_id,
+                    "base_url": page_data.get("base_url"),
+                }
+            )
+        self.chunks_queued += len(chunks)
+        self._start_batches()
+        return len(chunks)
+
+    def _start_batches(self):
+        # A batch starts right away when a slot is free; otherwise chunks keep
+        # queueing and go out together when a running batch finishes
+        while self._pending and len(self._tasks) < self.max_inflight:
+            batch = self._pending[: self.batch_chunks]
+            self._pending = self._pending[self.batch_chunks :]
+            task = asyncio.create_task(self._embed_and_store(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._on_batch_done)
+
+    def _on_batch_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._start_batches()
+
+    async def _embed_and_store(self, batch: List[Dict[str, Any]]):
+        try:
+            embeddings = await self.embedding_service.generate_embeddings(
+                [item["markdown"] for item in batch]
+            )
+            # Not waited on individually; finish() flushes once at the end
+            await self.vector_store.store_embeddings_batch(
+                [
+                    {**item, "embedding": embedding}
+                    for item, embedding in zip(batch, embeddings)
+                ],
+                wait=False,
+            )
+            self.chunks_stored += len(batch)
+        except Exception as e:
+            self.chunks_failed += len(batch)
+            print(f"Warning: Failed to generate/store embeddings: {str(e)}")
+            traceback.print_exc()
+            for item in batch:
+                entry = self._unstored.pop(item["metadata"]["original_page_id"], None)
+                if entry:
+                    self.failed_pages[item["url"]] = entry[0]
+            return
+        for item in batch:
+            entry = self._unstored.get(item["metadata"]["original_page_id"])
+            if entry:  # None once the page failed in another batch
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._unstored[item["metadata"]["original_page_id"]]
+                    self._page_stored(entry[0])
+
+    def _page_stored(self, page_data: Dict[str, Any]):
+        if self.on_page_stored is None:
+            return
+        try:
+            self.on_page_stored(page_data)
+        except Exception as e:
+            print(f"Warning: Failed to record {page_data['url']}: {str(e)}")
+            self.failed_pages[page_data["url"]] = page_data
+
+    @property
+    def failed_page_ids(self) -> List[str]:
+        """Page ids of the failed pages (their chunks' original_page_id)."""
+        return [page_data["page_id"] for page_data in self.failed_pages.values()]
+
+    async def finish(self) -> int:
+        """
+        Wait for every queued chunk, then flush the writes.
+
+        Returns:
+            Number of chunks stored
+        """
+        while self._pending or self._tasks:
+            self._start_batches()
+            await asyncio.gather(*list(self._tasks))
+        await self.vector_store.flush_writes()
+        return self.chunks_stored
+
+    async def cancel(self):
+        """Stop embedding (the client went away); queued chunks are dropped."""
+        self._pending = []
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -0,0 +1,237 @@
+"""
+In-process brute-force vector index.
+
+Each tenant (a crawl in the main collection, a site in the widget collection)
+gets a snapshot on disk: an L2-normalized float32 matrix (memory-mapped when
+loaded) plus its payloads. A search is one matrix-vector product and an
+argpartition, which for a few thousand chunks is faster than a network hop
+to Qdrant. Snapshots also keep tenants searchable while Qdrant is down.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
+from config import (
+    EMBEDDING_DIMENSION,
+    EMBEDDING_MODEL_NAME,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_MAX_TENANTS,
+)
+from services.cache import LRUCache
+
+
+class ScoredChunk(NamedTuple):
+    """A search hit, from Qdrant or a local snapshot."""
+
+    id: Any
+    score: float
+    payload: Dict[str, Any]
+    vector: Optional[Any] = None
+
+
+class TenantSnapshot:
+    """Vectors and payloads of one tenant, searched with NumPy."""
+
+    def __init__(
+        self,
+        directory: str,
+        meta: Dict[str, Any],
+        ids: Optional[List[Any]] = None,
+        payloads: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """
+        Open a snapshot.
+
+        Payloads are read here rather than on the first search: a newer build
+        deletes this build's files, and only the memory-mapped vectors stay
+        readable once their file is gone.
+
+        Args:
+            directory: Tenant directory
+            meta: Contents of its meta.json
+            ids / payloads: Already in memory (just written); read from disk otherwise
+        """
+        self.directory = directory
+        self.meta = meta
+        self.count = meta["count"]
+        # Lazily paged in by the OS; nothing is read until the first search
+        self.vectors = np.load(os.path.join(directory, meta["vectors_file"]), mmap_mode="r")
+        if payloads is None:
+            with open(os.path.join(directory, meta["payloads_file"])) as f:
+                data = json.load(f)
+            ids, payloads = data["ids"], data["payloads"]
+        self._ids: List[Any] = ids
+        self._payloads: List[Dict[str, Any]] = payloads
+        # Write version of the tenant this snapshot matches (None = not validated yet)
+        self.version: Optional[int] = None
+        self.validated_at = 0.0
+
+    def search(
+        self,
+        query_vector: Any,
+        limit: int,
+        with_vectors: bool = False,
+        score_threshold: Optional[float] = None,
+    ) -> List[ScoredChunk]:
+        """
+        Exact cosine search.
+
+        Returns:
+            Hits with a score of at least score_threshold, best first
+        """
+        if self.count == 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(query))
+        if norm > 0:
+            query = query / norm
+
+        scores = self.vectors @ query
+        k = min(limit, self.count)
+        if k < self.count:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(self.count)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if score_threshold is not None:
+            top = top[scores[top] >= score_threshold]
+
+        return [
+            ScoredChunk(
+                self._ids[i],
+                float(scores[i]),
+                self._payloads[i],
+                np.asarray(self.vectors[i]) if with_vectors else None,
+            )
+            for i in top
+        ]
+
+
+class LocalVectorIndex:
+    """Per-tenant snapshots on disk, loaded lazily and kept in an LRU cache."""
+
+    def __init__(self, root: str = LOCAL_INDEX_DIR, max_loaded: int = LOCAL_INDEX_MAX_TENANTS):
+        """
+        Args:
+            root: Directory holding the snapshots
+            max_loaded: Snapshots kept open in memory
+        """
+        self.root = root
+        self.snapshots = LRUCache(maxsize=max_loaded)
+
+        # Metrics
+        self.local_searches = 0
+        self.fallback_searches = 0
+        self.builds = 0
+
+    def _tenant_dir(self, collection: str, tenant: str) -> str:
+        digest = hashlib.sha1(tenant.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, collection, digest)
+
+    def get(self, collection: str, tenant: str) -> Optional[TenantSnapshot]:
+        """Snapshot of a tenant (opened from disk on first use), or None."""
+        key = (collection, tenant)
+        snapshot = self.snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+
+        directory = self._tenant_dir(collection, tenant)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if (
+                meta.get("tenant") != tenant
+                or meta.get("dimension") != EMBEDDING_DIMENSION
+                or meta.get("model") != EMBEDDING_MODEL_NAME
+            ):
+                return None  # built for another tenant (hash collision) or model
+            snapshot = TenantSnapshot(directory, meta)
+        except Exception as e:
+            print(f"Ignoring unreadable local index snapshot {directory}: {str(e)}")
+            return None
+
+        self.snapshots.set(key, snapshot)
+        return snapshot
+
+    def write(
+        self,
+        collection: str,
+        tenant: str,
+        ids: List[Any],
+        vectors: Any,
+        payloads: List[Dict[str, Any]],
+        marker: Optional[str] = None,
+    ) -> TenantSnapshot:
+        """
+        Replace a tenant's snapshot.
+
+        Files are written under a new build id and meta.json is swapped last,
+        so readers never see a half-written snapshot.
+
+        Args:
+            marker: Fingerprint of the tenant's content (point ids and content
+                hashes), compared before a snapshot opened from disk is trusted
+        """
+        directory = self._tenant_dir(collection, tenant)
+        os.makedirs(directory, exist_ok=True)
+        build_id = f"{int(time.time() * 1000)}"
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if len(ids):
+            matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+        vectors_file = f"vectors-{build_id}.npy"
+        payloads_file = f"payloads-{build_id}.json"
+        np.save(os.path.join(directory, vectors_file), matrix)
+        with open(os.path.join(directory, payloads_file), "w") as f:
+            json.dump({"ids": ids, "payloads": payloads}, f)
+
+        meta = {
+            "tenant": tenant,
+            "collection": collection,
+            "count": len(ids),
+            "dimension": EMBEDDING_DIMENSION,
+            "model": EMBEDDING_MODEL_NAME,
+            "vectors_file": vectors_file,
+            "payloads_file": payloads_file,
+            "marker": marker,
+            "built_at": time.time(),
+        }
+        meta_path = os.path.join(directory, "meta.json")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        # Remove files of previous builds
+        for name in os.listdir(directory):
+            if name.endswith((".npy", ".json")) and build_id not in name and name != "meta.json":
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+        snapshot = TenantSnapshot(directory, meta, ids, payloads)
+        self.snapshots.set((collection, tenant), snapshot)
+        self.builds += 1
+        return snapshot
+
+    def drop(self, collection: str, tenant: str):
+        """Delete a tenant's snapshot (e.g. it grew past the snapshot size limit)."""
+        self.snapshots.pop((collection, tenant))
+        shutil.rmtree(self._tenant_dir(collection, tenant), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.root,
+            "loaded_tenants": len(self.snapshots),
+            "local_searches": self.local_searches,
+            "fallback_searches": self.fallback_searches,
+            "builds": self.builds,
+        }
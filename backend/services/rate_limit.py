@@ -0,0 +1,493 @@
+"""
+Async concurrency and rate limiting primitives shared by the services.
+"""
+
+import asyncio
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Async limiter on the number of in-flight calls with AIMD adaptation.
+
+    The limit is halved whenever the upstream signals throttling (HTTP 429)
+    and grows back by one after `limit` consecutive successes, never going
+    above `max_limit`.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        """
+        Args:
+            max_limit: Upper bound (and starting value) for concurrent calls
+            min_limit: Lower bound the limit never shrinks below
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.throttle_events = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+    def on_success(self):
+        """Additive increase after a full window of successful calls."""
+        self._successes += 1
+        if self.limit < self.max_limit and self._successes >= self.limit:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttle(self):
+        """Multiplicative decrease when the upstream rate limits us."""
+        self.throttle_events += 1
+        self._successes = 0
+        new_limit = max(self.min_limit, self.limit // 2)
+        if new_limit != self.limit:
+            print(
+                f"Rate limited: reducing concurrency from {self.limit} to {new_limit}"
+            )
+        self.limit = new_limit
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "throttle_events": self.throttle_events,
+        }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class Throttled(Exception):
+    """
+    Raised by a scheduled job when the server answered HTTP 429 or 5xx.
+
+    host_scoped=False means a shared upstream (the FireCrawl API) is
+    throttling us rather than the page's own host, so every host slows down.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        retry_after: Optional[float] = None,
+        host_scoped: bool = True,
+    ):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.host_scoped = host_scoped
+        message = f"HTTP {status_code}"
+        if retry_after is not None:
+            message += f" (retry after {retry_after:.1f}s)"
+        super().__init__(message)
+
+
+class TokenBucket:
+    """
+    Token bucket refilling at `rate` tokens per second, up to `capacity`.
+
+    A rate of 0 (or less) means unlimited: tokens are always available.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic() if now is None else now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: Optional[float] = None):
+        """Spend one token (callers check wait_time first)."""
+        if self.rate > 0:
+            self._refill(time.monotonic() if now is None else now)
+            self.tokens -= 1
+
+    async def acquire(self):
+        while True:
+            delay = self.wait_time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        self.take()
+
+
+class Backoff:
+    """
+    Pause and rate of one host (or shared upstream) after throttling.
+
+    Throttling pauses for Retry-After if the server sent one, otherwise for
+    an exponentially growing step (1s, 2s, 4s... up to max_backoff), and
+    halves the bucket's rate (down to a sixteenth of its base rate). Each
+    success halves the step and adds back a tenth of the base rate.
+    """
+
+    def __init__(self, bucket: TokenBucket, max_backoff: float = 60.0):
+        self.bucket = bucket
+        self.base_rate = bucket.rate
+        self.max_backoff = max_backoff
+        self.step = 0.0  # current backoff step in seconds (0 = not backing off)
+        self.resume_at = 0.0  # monotonic time before which nothing is sent
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """Seconds until the next request may go out (pause and bucket)."""
+        now = time.monotonic() if now is None else now
+        return max(self.resume_at - now, self.bucket.wait_time(now))
+
+    def paused(self, now: Optional[float] = None) -> bool:
+        return self.resume_at > (time.monotonic() if now is None else now)
+
+    def on_success(self):
+        """Additive increase back towards the base rate."""
+        self.step = self.step / 2 if self.step >= 2 else 0.0
+        if self.bucket.rate < self.base_rate:
+            self.bucket.rate = min(self.base_rate, self.bucket.rate + self.base_rate / 10)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        """
+        Back off after an HTTP 429/5xx.
+
+        Returns:
+            Seconds paused
+        """
+        self.step = min(self.max_backoff, max(1.0, self.step * 2))
+        pause = min(retry_after if retry_after is not None else self.step, self.max_backoff)
+        self.resume_at = max(self.resume_at, time.monotonic() + pause)
+        if self.base_rate > 0:
+            self.bucket.rate = max(self.base_rate / 16, self.bucket.rate / 2)
+        return pause
+
+
+class _Job:
+    __slots__ = ("url", "run", "future", "attempts", "task")
+
+    def __init__(self, url: str, run: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.url = url
+        self.run = run
+        self.future = future
+        self.attempts = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class _Host:
+    """Queue, rate and backoff state of one host."""
+
+    def __init__(self, rate: float, burst: int, max_backoff: float):
+        self.jobs: Deque[_Job] = deque()
+        self.bucket = TokenBucket(rate, burst)
+        self.backoff = Backoff(self.bucket, max_backoff)
+        self.in_flight = 0
+        self.completed = 0
+        self.throttled = 0
+
+
+class PolitenessScheduler:
+    """
+    Runs scrape jobs with a steady number in flight, politely per host.
+
+    Jobs queue per host. A dispatcher starts the next job as soon as a slot
+    frees up (there is no batch barrier), taking hosts round-robin, and only
+    when both the global token bucket and the host's bucket have a token.
+
+    A job that raises Throttled (HTTP 429/5xx) is re-queued at the front of
+    its host's queue and the host pauses: for Retry-After if the server sent
+    one, otherwise for an exponentially growing backoff (1s, 2s, 4s... up to
+    max_backoff). The host's rate is also halved and grows back additively
+    with each success. Throttling by a shared upstream (host_scoped=False)
+    does the same to the global bucket.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        host_concurrency: int,
+        global_rate: float,
+        host_rate: float,
+        max_backoff: float = 60.0,
+        max_retries: int = 3,
+    ):
+        """
+        Args:
+            concurrency: Jobs in flight across all hosts
+            host_concurrency: Jobs in flight per host
+            global_rate: Job starts per second across all hosts (0 = unlimited)
+            host_rate: Job starts per second per host (0 = unlimited)
+            max_backoff: Longest pause (seconds) after throttling
+            max_retries: Times a throttled job is retried before it fails
+        """
+        self.concurrency = max(1, concurrency)
+        self.host_concurrency = max(1, min(host_concurrency, self.concurrency))
+        self.host_rate = host_rate
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+
+        self.bucket = TokenBucket(global_rate, self.concurrency)
+        self._backoff = Backoff(self.bucket, max_backoff)
+        self._hosts: Dict[str, _Host] = {}
+        self._turn = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttle_events = 0
+        self._finished: Deque[float] = deque()  # completion times, last minute
+
+    def submit(self, url: str, run: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Queue a job for the host of `url`.
+
+        Args:
+            url: URL the job requests (its host picks the queue and buckets)
+            run: Callable returning the awaitable to run; called again on retry
+
+        Returns:
+            Future with the job's result. Cancelling it drops the job, or
+            cancels it if it is already running.
+        """
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+        job = _Job(url, run, loop.create_future())
+        job.future.add_done_callback(lambda _: self._on_future_done(job))
+        self._host(self._host_name(url)).jobs.append(job)
+        self.queued += 1
+        self._wakeup.set()
+        return job.future
+
+    def limit_host(self, url: str, rate: float):
+        """Cap the request rate of a host (e.g. to its robots.txt Crawl-delay)."""
+        host = self._host(self._host_name(url))
+        if host.backoff.base_rate <= 0 or rate < host.backoff.base_rate:
+            host.backoff.base_rate = rate
+            host.bucket.rate = rate if host.bucket.rate <= 0 else min(host.bucket.rate, rate)
+
+    @staticmethod
+    def _on_future_done(job: _Job):
+        # A caller cancelling the future also stops the job if it is running
+        if job.future.cancelled() and job.task is not None:
+            job.task.cancel()
+
+    @staticmethod
+    def _host_name(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def _host(self, name: str) -> _Host:
+        host = self._hosts.get(name)
+        if host is None:
+            if len(self._hosts) >= 1024:
+                # Forget idle hosts that are not backing off
+                now = time.monotonic()
+                self._hosts = {
+                    n: h
+                    for n, h in self._hosts.items()
+                    if h.jobs or h.in_flight or h.backoff.paused(now)
+                }
+            host = self._hosts[name] = _Host(
+                self.host_rate, self.host_concurrency, self.max_backoff
+            )
+        return host
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._start_ready()
+            try:
+                # Woken early by submit() and by finishing jobs
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start_ready(self) -> Optional[float]:
+        """
+        Start every job that may start now.
+
+        Returns:
+            Seconds until the next one may start, or None to wait for an event
+        """
+        while self.queued and self.in_flight < self.concurrency:
+            now = time.monotonic()
+            wait = self._backoff.wait_time(now)
+            if wait > 0:
+                return wait
+            host, wait = self._next_host(now)
+            if host is None:
+                return wait
+            job = host.jobs.popleft()
+            self.queued -= 1
+            if job.future.done():  # cancelled while queued
+                continue
+            self.bucket.take(now)
+            host.bucket.take(now)
+            host.in_flight += 1
+            self.in_flight += 1
+            job.task = asyncio.create_task(self._run(host, job))
+            self._running.add(job.task)
+            job.task.add_done_callback(self._running.discard)
+        return None
+
+    def _next_host(self, now: float) -> Tuple[Optional[_Host], Optional[float]]:
+        """Next host (round-robin) allowed to start a job, else the shortest wait."""
+        hosts = list(self._hosts.values())
+        shortest = None
+        for i in range(len(hosts)):
+            host = hosts[(self._turn + i) % len(hosts)]
+            if not host.jobs or host.in_flight >= self.host_concurrency:
+                continue
+            wait = host.backoff.wait_time(now)
+            if wait <= 0:
+                self._turn = (self._turn + i + 1) % len(hosts)
+                return host, 0.0
+            shortest = wait if shortest is None else min(shortest, wait)
+        return None, shortest
+
+    async def _run(self, host: _Host, job: _Job):
+        try:
+            result = await job.run()
+        except Throttled as e:
+            self._on_throttle(host, e)
+            if job.attempts < self.max_retries:
+                job.attempts += 1
+                self.retries += 1
+                host.jobs.appendleft(job)
+                self.queued += 1
+            else:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self._on_success(host)
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            job.task = None
+            host.in_flight -= 1
+            self.in_flight -= 1
+            self._wakeup.set()
+
+    def _on_success(self, host: _Host):
+        now = time.monotonic()
+        self.completed += 1
+        host.completed += 1
+        self._finished.append(now)
+        while self._finished and now - self._finished[0] > 60:
+            self._finished.popleft()
+        # Additive increase back towards the configured rates
+        host.backoff.on_success()
+        self._backoff.on_success()
+
+    def _on_throttle(self, host: _Host, error: Throttled):
+        self.throttle_events += 1
+        host.throttled += 1
+        if error.host_scoped:
+            pause = host.backoff.on_throttle(error.retry_after)
+            target, rate = "host", host.bucket.rate
+        else:
+            pause = self._backoff.on_throttle(error.retry_after)
+            target, rate = "all hosts", self.bucket.rate
+        print(f"{error}: pausing {target} for {pause:.1f}s, rate now {rate:.2f}/s")
+
+    def throughput(self) -> float:
+        """Jobs completed per second over the last minute."""
+        if not self._finished:
+            return 0.0
+        window = max(1.0, min(60.0, time.monotonic() - self._finished[0]))
+        return len(self._finished) / window
+
+    async def aclose(self):
+        """Stop dispatching and cancel queued and running jobs."""
+        for host in self._hosts.values():
+            for job in host.jobs:
+                job.future.cancel()
+            host.jobs.clear()
+        self.queued = 0
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*list(self._running), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttle_events": self.throttle_events,
+            "throughput": round(self.throughput(), 2),
+            "global_rate": self.bucket.rate,
+            "hosts": {
+                name: {
+                    "queued": len(host.jobs),
+                    "in_flight": host.in_flight,
+                    "completed": host.completed,
+                    "throttled": host.throttled,
+                    "rate": round(host.bucket.rate, 2),
+                    "paused_for": round(max(0.0, host.backoff.resume_at - now), 1),
+                }
+                for name, host in self._hosts.items()
+                if host.jobs or host.in_flight or host.backoff.paused(now)
+            },
+        }
@@ -0,0 +1,116 @@
+"""
+Incremental refresh of an indexed crawl or widget site.
+
+A refresh re-fetches the pages but only re-chunks and re-embeds the ones
+whose content changed. Pages answered with a 304 (conditional request) or
+whose markdown hashes to the stored contentHash are left alone; the
+vectors of changed pages are replaced.
+
+A page is only deleted when it is positively gone (HTTP 404/410, or taken
+off a widget's page list). Pages the refresh did not reach (crawl limit,
+throttling, timeouts) or could not re-index keep what is indexed.
+"""
+
+from typing import Any, Dict, List, Set
+from services.crawler import GONE_STATUSES
+
+ADDED = "added"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+REMOVED = "removed"
+
+# Page metadata a refresh uses to skip a page without re-embedding it
+FINGERPRINT_KEYS = ("contentHash", "etag", "lastModified", "sitemapLastmod")
+
+
+def is_gone(page_data: Dict[str, Any]) -> bool:
+    """Whether a scraped page reports that the page no longer exists."""
+    return bool(page_data.get("gone")) or (
+        page_data.get("metadata", {}).get("statusCode") in GONE_STATUSES
+    )
+
+
+class RefreshPlan:
+    """Sorts the pages of a refresh into added / changed / unchanged / removed."""
+
+    def __init__(self, previous: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            previous: Stored metadata of every indexed page, by URL
+                (contentHash, etag, lastModified, depth)
+        """
+        self.previous = previous
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.unchanged: List[str] = []
+        self.failures = 0
+        self.kept = 0
+        self._seen: Set[str] = set()
+        self._gone: Set[str] = set()
+
+    def classify(self, page_data: Dict[str, Any], url: str = None) -> str:
+        """
+        Classify a freshly scraped page.
+
+        Args:
+            page_data: Page dict from the scraper
+            url: URL the page is indexed under (defaults to page_data["url"])
+
+        Returns:
+            ADDED, CHANGED or UNCHANGED
+        """
+        url = url or page_data["url"]
+        if url in self._seen:
+            return UNCHANGED  # already handled (e.g. reached again through a redirect)
+        self._seen.add(url)
+
+        previous = self.previous.get(url)
+        if previous is None:
+            self.added.append(url)
+            return ADDED
+        stored_hash = previous.get("contentHash")
+        if page_data.get("not_modified") or (
+            stored_hash and stored_hash == page_data.get("metadata", {}).get("contentHash")
+        ):
+            self.unchanged.append(url)
+            return UNCHANGED
+        self.changed.append(url)
+        return CHANGED
+
+    def keep(self, url: str):
+        """Keep an indexed page that could not be re-fetched this time."""
+        if url not in self._seen:
+            self._seen.add(url)
+            self.kept += 1
+
+    def gone(self, url: str):
+        """An indexed page no longer exists: its chunks and record are deleted."""
+        if url in self.previous and url not in self._seen:
+            self._gone.add(url)
+
+    def unreached(self) -> List[str]:
+        """Indexed pages that were neither re-fetched, kept nor reported gone."""
+        return [
+            url for url in self.previous if url not in self._seen and url not in self._gone
+        ]
+
+    def failed(self, url: str):
+        """A changed or new page could not be re-indexed: keep its old chunks."""
+        for pages in (self.added, self.changed):
+            if url in pages:
+                pages.remove(url)
+        self.failures += 1
+
+    def removed(self) -> List[str]:
+        """Indexed pages reported gone (and not reached again under the same URL)."""
+        return [url for url in self.previous if url in self._gone and url not in self._seen]
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "changed": len(self.changed),
+            "added": len(self.added),
+            "unchanged": len(self.unchanged),
+            "removed": len(self.removed()),
+            "kept": self.kept,
+            "failed": self.failures,
+        }
@@ -0,0 +1,373 @@
+"""
+Online re-indexing of Qdrant collections.
+
+When the embedding model or dimension changes, a collection is rebuilt into
+a new versioned collection while the old one keeps serving reads: the stored
+chunk text is scrolled in batches, re-embedded with the current model and
+written to the new collection, then the alias is switched atomically.
+Progress is checkpointed so an interrupted job resumes where it stopped;
+a job that cannot resume (it failed, or the model changed) deletes the
+unfinished target its checkpoint recorded before starting over.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+from config import (
+    COLLECTION_NAME,
+    WIDGET_COLLECTION_NAME,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+    QDRANT_AUTO_REINDEX,
+    REINDEX_BATCH_SIZE,
+    REINDEX_STATE_DIR,
+    QDRANT_REINDEX_KEEP_OLD,
+)
+
+# Payload fields indexed on each collection
+PAYLOAD_INDEXES = {
+    COLLECTION_NAME: ["crawl_id", "url"],
+    WIDGET_COLLECTION_NAME: ["site_id"],
+}
+
+
+class ReindexJob:
+    """Re-embeds one aliased collection into a new versioned collection."""
+
+    def __init__(self, vector_store, embedding_service, alias: str):
+        self.vector_store = vector_store
+        self.embedding_service = embedding_service
+        self.alias = alias
+        self.source: Optional[str] = None
+        self.target: Optional[str] = None
+        self.model = EMBEDDING_MODEL_NAME
+        self.dimension = EMBEDDING_DIMENSION
+        self.offset: Any = None
+        self.processed = 0
+        self.total = 0
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Throughput is measured for this run only (not across resumes)
+        self._run_started_at: Optional[float] = None
+        self._run_processed = 0
+
+    # ============== Checkpoints ==============
+
+    @staticmethod
+    def checkpoint_path(alias: str) -> str:
+        return os.path.join(REINDEX_STATE_DIR, f"{alias}.json")
+
+    def save_checkpoint(self):
+        os.makedirs(REINDEX_STATE_DIR, exist_ok=True)
+        path = self.checkpoint_path(self.alias)
+        state = {
+            "alias": self.alias,
+            "source": self.source,
+            "target": self.target,
+            "model": self.model,
+            "dimension": self.dimension,
+            "offset": self.offset,
+            "processed": self.processed,
+            "total": self.total,
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        # Write then rename so a crash never leaves a half-written checkpoint
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def _load_state(cls, alias: str) -> Optional[Dict[str, Any]]:
+        path = cls.checkpoint_path(alias)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    @classmethod
+    def load(cls, vector_store, embedding_service, alias: str) -> Optional["ReindexJob"]:
+        """Load a job from its checkpoint (None if there is none)."""
+        state = cls._load_state(alias)
+        if state is None:
+            return None
+
+        job = cls(vector_store, embedding_service, alias)
+        for key in (
+            "source",
+            "target",
+            "offset",
+            "processed",
+            "total",
+            "status",
+            "error",
+            "started_at",
+            "finished_at",
+        ):
+            setattr(job, key, state.get(key))
+        job.model = state.get("model", job.model)
+        job.dimension = state.get("dimension", job.dimension)
+        return job
+
+    def can_resume(self) -> bool:
+        """A checkpoint is only reusable for the same model and dimension."""
+        return (
+            self.status == "running"
+            and self.target is not None
+            and self.model == EMBEDDING_MODEL_NAME
+            and self.dimension == EMBEDDING_DIMENSION
+        )
+
+    # ============== Run ==============
+
+    def _previous_target(self) -> Optional[str]:
+        """Target collection of the last run of this alias, from its checkpoint."""
+        if self.target is not None:
+            return self.target
+        try:
+            state = self._load_state(self.alias)
+        except Exception as e:
+            print(f"Ignoring unreadable re-index checkpoint for {self.alias}: {str(e)}")
+            return None
+        return state.get("target") if state else None
+
+    def _prepare(self):
+        """Create the target collection (or reuse it when resuming)."""
+        client = self.vector_store.client
+        existing = [c.name for c in client.get_collections().collections]
+
+        if self.status == "running" and self.target is not None:
+            if self.target in existing:
+                print(
+                    f"Resuming re-index of {self.alias} into {self.target} "
+                    f"({self.processed}/{self.total} points done)"
+                )
+                return
+            # Target vanished: start over
+            self.offset = None
+            self.processed = 0
+
+        self.source = self.vector_store._resolve_collection(self.alias)
+        if self.source is None:
+            raise Exception(f"Collection '{self.alias}' does not exist")
+
+        # A failed or abandoned run (e.g. for another model) leaves its partly
+        # filled target behind; the alias never pointed at it, so drop it
+        previous = self._previous_target()
+        if previous is not None and previous != self.source and previous in existing:
+            client.delete_collection(previous)
+            print(f"Deleted unfinished re-index target {previous}")
+
+        self.target = self.vector_store._versioned_collection_name(self.alias)
+        self.vector_store._create_collection(self.target)
+        for field_name in PAYLOAD_INDEXES.get(self.alias, []):
+            try:
+                client.create_payload_index(
+                    collection_name=self.target,
+                    field_name=field_name,
+                    field_schema="keyword",
+                )
+            except Exception as e:
+                print(f"Warning: Could not create payload index '{field_name}': {str(e)}")
+
+        self.offset = None
+        self.processed = 0
+        self.started_at = time.time()
+        print(f"Re-indexing {self.alias}: {self.source} -> {self.target}")
+
+    @staticmethod
+    def _point_text(payload: Dict[str, Any]) -> str:
+        return payload.get("markdown") or payload.get("title") or ""
+
+    async def run(self):
+        """Re-embed every point into the target collection, then switch the alias."""
+        self.status = "running"
+        self.error = None
+        self.finished_at = None
+        try:
+            await asyncio.to_thread(self._prepare)
+            self.total = await asyncio.to_thread(
+                self.vector_store.count_points, self.source
+            )
+            self.save_checkpoint()
+
+            # Writes that arrive while we copy go to the new collection too
+            self.vector_store.begin_reindex(self.alias, self.target)
+
+            self._run_started_at = time.monotonic()
+            self._run_processed = 0
+
+            while True:
+                points, next_offset = await asyncio.to_thread(
+                    self.vector_store.scroll_points,
+                    self.source,
+                    self.offset,
+                    REINDEX_BATCH_SIZE,
+                )
+                if points:
+                    await self._reindex_batch(points)
+
+                self.offset = next_offset
+                self.save_checkpoint()
+                if next_offset is None:
+                    break
+
+            # Cut over: reads now hit the new collection
+            previous = await asyncio.to_thread(
+                self.vector_store.switch_alias, self.alias, self.target
+            )
+            self.vector_store.end_reindex(self.alias)
+            self.vector_store.reindex_required.pop(self.alias, None)
+
+            if previous and previous != self.target and not QDRANT_REINDEX_KEEP_OLD:
+                await asyncio.to_thread(
+                    self.vector_store.client.delete_collection, previous
+                )
+                print(f"Deleted previous collection {previous}")
+
+            self.status = "completed"
+            self.finished_at = time.time()
+            self.save_checkpoint()
+            stats = self.status_dict()
+            print(
+                f"Re-index of {self.alias} completed: {self.processed} points "
+                f"({stats['points_per_sec']} points/s)"
+            )
+        except asyncio.CancelledError:
+            # Keep status "running" so the job resumes on next startup
+            self.vector_store.end_reindex(self.alias)
+            self.save_checkpoint()
+            raise
+        except Exception as e:
+            self.vector_store.end_reindex(self.alias)
+            self.status = "failed"
+            self.error = str(e)
+            self.finished_at = time.time()
+            self.save_checkpoint()
+            print(f"Re-index of {self.alias} failed: {str(e)}")
+
+    async def _reindex_batch(self, points: List[Any]):
+        # Slim payloads keep their text in the chunk store
+        hydrated = await asyncio.to_thread(
+            self.vector_store.hydrate_payloads, [point.payload or {} for point in points]
+        )
+        texts = [self._point_text(payload) for payload in hydrated]
+        embeddings = await self.embedding_service.generate_embeddings(texts)
+        await asyncio.to_thread(
+            self.vector_store.upsert_vectors,
+            self.target,
+            [point.id for point in points],
+            embeddings,
+            [point.payload or {} for point in points],
+        )
+        self.processed += len(points)
+        self._run_processed += len(points)
+
+    def status_dict(self) -> Dict[str, Any]:
+        points_per_sec = None
+        eta_seconds = None
+        if self._run_started_at is not None and self._run_processed:
+            elapsed = time.monotonic() - self._run_started_at
+            if elapsed > 0:
+                points_per_sec = round(self._run_processed / elapsed, 1)
+                if self.status == "running" and self.total:
+                    remaining = max(0, self.total - self.processed)
+                    eta_seconds = round(remaining / points_per_sec, 1)
+
+        return {
+            "collection": self.alias,
+            "status": self.status,
+            "source": self.source,
+            "target": self.target,
+            "model": self.model,
+            "dimension": self.dimension,
+            "processed": self.processed,
+            "total": self.total,
+            "progress": (self.processed / self.total) if self.total else None,
+            "points_per_sec": points_per_sec,
+            "eta_seconds": eta_seconds,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class ReindexManager:
+    """Runs re-index jobs in the background, at most one per collection."""
+
+    def __init__(self, vector_store, embedding_service):
+        self.vector_store = vector_store
+        self.embedding_service = embedding_service
+        self.jobs: Dict[str, ReindexJob] = {}
+        self.active_tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, alias: str, job: Optional[ReindexJob] = None) -> ReindexJob:
+        """
+        Start re-indexing a collection (no-op if one is already running).
+
+        Args:
+            alias: Collection alias (COLLECTION_NAME or WIDGET_COLLECTION_NAME)
+            job: Job restored from a checkpoint, if resuming
+
+        Returns:
+            The running job
+        """
+        if alias in self.active_tasks:
+            print(f"Re-index for {alias} is already running")
+            return self.jobs[alias]
+
+        job = job or ReindexJob(self.vector_store, self.embedding_service, alias)
+        self.jobs[alias] = job
+
+        task = asyncio.create_task(job.run())
+        self.active_tasks[alias] = task
+
+        # Add callback to clean up when done
+        task.add_done_callback(lambda t: self.active_tasks.pop(alias, None))
+        return job
+
+    async def resume_pending(self):
+        """
+        Resume interrupted jobs and start the ones needed after a model change.
+
+        Called on application startup.
+        """
+        try:
+            # Connecting checks the collections for dimension mismatches
+            await asyncio.to_thread(self.vector_store._get_client)
+            await asyncio.to_thread(self.vector_store._ensure_widget_collection_exists)
+        except Exception as e:
+            print(f"Skipping re-index check, Qdrant unavailable: {str(e)}")
+            return
+
+        for alias in (COLLECTION_NAME, WIDGET_COLLECTION_NAME):
+            try:
+                job = ReindexJob.load(self.vector_store, self.embedding_service, alias)
+            except Exception as e:
+                print(f"Ignoring unreadable re-index checkpoint for {alias}: {str(e)}")
+                job = None
+
+            if job is not None and job.can_resume():
+                self.start(alias, job)
+            elif alias in self.vector_store.reindex_required:
+                if QDRANT_AUTO_REINDEX:
+                    self.start(alias)
+                else:
+                    print(
+                        f"Collection {alias} needs a re-index: POST /api/vector-store/reindex"
+                    )
+            elif job is not None:
+                # Keep the last finished job visible in the status endpoint
+                self.jobs[alias] = job
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "reindex_required": dict(self.vector_store.reindex_required),
+            "jobs": {alias: job.status_dict() for alias, job in self.jobs.items()},
+        }
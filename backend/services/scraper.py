@@ -1,13 +1,47 @@
+import asyncio
+import hashlib
+import re
 import uuid
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from urllib.parse import urlparse
 from firecrawl import FirecrawlApp
-from config import FIRECRAWL_API_KEY
+from config import FIRECRAWL_API_KEY, SCRAPER_ENGINE
+from services.crawler import HttpCrawler, is_crawlable, normalize_url
+from services.discovery import RobotsRules
+
+SCRAPER_ENGINES = ("firecrawl", "http")
+
+# Link targets in markdown: [text](url "title"), ![alt](src) and <https://...>
+_MARKDOWN_LINK_RE = re.compile(r"\]\(\s*<?([^\s()<>]+)>?(?:\s+[\"'][^)]*)?\)")
+_MARKDOWN_IMAGE_RE = re.compile(r"!\[[^\]]*\]\(\s*<?([^\s()<>]+)")
+_AUTOLINK_RE = re.compile(r"<(https?://[^>\s]+)>")
+
+
+def content_hash(markdown: str) -> str:
+    """Fingerprint of a page's content, compared on refresh to skip unchanged pages."""
+    return hashlib.sha256(markdown.strip().encode("utf-8")).hexdigest()
 
 
 class ScraperService:
-    def __init__(self):
+    def __init__(self, engine: str = SCRAPER_ENGINE):
+        if engine not in SCRAPER_ENGINES:
+            print(f"Unknown SCRAPER_ENGINE '{engine}', using firecrawl")
+            engine = "firecrawl"
+        self.engine = engine
         self.firecrawl = FirecrawlApp(api_key=FIRECRAWL_API_KEY)
+        self.http_crawler = HttpCrawler()
+
+    async def aclose(self):
+        """Close pooled connections (called on application shutdown)."""
+        await self.http_crawler.aclose()
+
+    @staticmethod
+    def _fingerprint(page: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the content hash to a scraped page's metadata (304s keep the stored one)."""
+        if not (page.get("not_modified") or page.get("gone")):
+            page["metadata"]["contentHash"] = content_hash(page.get("markdown") or "")
+        return page
 
     def _extract_base_url(self, url: str) -> str:
         """Extract base URL (scheme + netloc) from a full URL."""
@@ -22,27 +56,88 @@ class ScraperService:
                 return f"{parts[0]}//{parts[2]}"
             return url
 
+    def extract_links_from_markdown(self, markdown: str, base_url: str) -> List[str]:
+        """
+        Links in a page's markdown that lead to other pages of the same site.
+
+        Image sources are skipped; links are resolved against `base_url`,
+        normalized and de-duplicated (first occurrence first).
+        """
+        images = set(_MARKDOWN_IMAGE_RE.findall(markdown))
+        links = []
+        seen = set()
+        for target in _MARKDOWN_LINK_RE.findall(markdown) + _AUTOLINK_RE.findall(markdown):
+            if target in images:
+                continue
+            link = normalize_url(target, base_url)
+            if link and link not in seen and is_crawlable(link, base_url):
+                seen.add(link)
+                links.append(link)
+        return links
+
+    async def discover(
+        self, url: str, max_urls: int
+    ) -> Tuple[RobotsRules, Dict[str, Optional[datetime]]]:
+        """
+        Read a site's robots.txt and sitemaps (see HttpCrawler.discover).
+
+        Returns:
+            The robots.txt rules, and the sitemap page URLs with their lastmod
+        """
+        return await self.http_crawler.discover(url, max_urls)
+
     async def scrape_site(
-        self, url: str, max_depth: int = 3, crawl_id: str = None
-    ) -> List[Dict[str, Any]]:
+        self,
+        url: str,
+        max_depth: int = 3,
+        crawl_id: str = None,
+        engine: str = None,
+        known: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Scrape a website using FireCrawl and return markdown content with unique IDs.
+        Crawl a website, yielding pages as soon as they are scraped.
+
+        With FireCrawl, pages are read from the paginated crawl status while
+        the job is still running; the built-in "http" engine yields each page
+        as soon as it is fetched and converted, after seeding its frontier
+        from robots.txt and sitemaps. Either way callers can chunk and embed
+        the first pages before the crawl finishes.
 
         Args:
             url: The URL to scrape
             max_depth: Maximum depth for crawling (default: 3)
             crawl_id: Unique crawl session ID
+            engine: "firecrawl" or "http" (default: SCRAPER_ENGINE)
+            known: Stored metadata of previously crawled pages, by URL. The
+                http engine re-fetches them conditionally (or not at all when
+                their sitemap lastmod has not moved) and yields unchanged ones
+                with not_modified=True and no markdown; FireCrawl has no
+                conditional requests, so it re-scrapes them. Known pages that
+                answer 404/410 (checked directly if FireCrawl did not reach
+                them) are yielded with gone=True
 
-        Returns:
-            List of dictionaries containing page_id, url, markdown, base_url, crawl_id, and metadata
+        Yields:
+            Dicts containing page_id, url, markdown, base_url, crawl_id, and
+            metadata (including contentHash)
         """
         base_url = self._extract_base_url(url)
+        yielded = 0
+        reached = set()
+
+        if (engine or self.engine) == "http":
+            async for page in self.http_crawler.crawl(
+                url, max_depth, crawl_id, base_url, known=known
+            ):
+                yield self._fingerprint(page)
+                yielded += 1
+            # Nothing in plain HTML (client-rendered site): let FireCrawl render the page
+            if not yielded and FIRECRAWL_API_KEY:
+                for page in await self._scrape_single_page(url, base_url, crawl_id):
+                    yield self._fingerprint(page)
+            return
 
         try:
             # Use multi-page crawl to get the main page + all links found on it
-            # max_depth=1 means: scrape the initial page and all pages linked from it
-            import asyncio
-
             def _start_crawl():
                 from firecrawl.v2.types import ScrapeOptions
 
@@ -55,76 +150,152 @@ class ScraperService:
 
             crawl_job = await asyncio.to_thread(_start_crawl)
 
-            # Poll for completion with exponential backoff
-            max_wait = 120  # Wait up to 120 seconds
-            waited = 0
-            attempt = 0
-            while waited < max_wait:
+            async for document in self._iter_crawl_documents(crawl_job.id):
+                page = self._page_from_document(document, url, base_url, crawl_id)
+                reached.add(page["url"])
+                yield self._fingerprint(page)
+                yielded += 1
+        except Exception as e:
+            if yielded:
+                print(f"Crawl stopped after {yielded} pages: {str(e)}")
+                return
+            print(f"Crawl failed, falling back to single page scrape: {str(e)}")
+
+        # If the crawl produced nothing, fall back to single page
+        if not yielded:
+            for page in await self._scrape_single_page(url, base_url, crawl_id):
+                reached.add(page["url"])
+                yield self._fingerprint(page)
+
+        # FireCrawl does not report pages that disappeared: check the known
+        # pages it did not reach (crawl limit, errors) directly
+        if known:
+            unreached = [page_url for page_url in known if page_url not in reached]
+            for page in await self.http_crawler.gone_pages(
+                unreached, base_url, crawl_id, known
+            ):
+                yield page
+
+    async def scrape_page(
+        self,
+        url: str,
+        crawl_id: str = None,
+        engine: str = None,
+        previous: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Scrape a single page.
+
+        Args:
+            url: Page URL
+            crawl_id: Unique crawl session ID
+            engine: "firecrawl" or "http" (default: SCRAPER_ENGINE)
+            previous: Stored metadata of the page; the http engine fetches
+                conditionally and returns a not_modified page on a 304
+
+        Returns:
+            Page dict (same shape as scrape_site pages), or None if nothing was fetched
+        """
+        base_url = self._extract_base_url(url)
+        if (engine or self.engine) == "http":
+            page = await self.http_crawler.fetch_page(url, base_url, crawl_id, previous)
+            return self._fingerprint(page) if page else None
+        pages = await self._scrape_single_page(url, base_url, crawl_id)
+        return self._fingerprint(pages[0]) if pages else None
+
+    async def _iter_crawl_documents(self, job_id: str, max_wait: float = 120):
+        """
+        Poll a crawl job and yield each scraped document once.
+
+        The cursor is the number of documents consumed plus the result page
+        it falls in: later polls re-read from that page (which keeps growing
+        while the crawl runs) instead of from the first one.
+
+        Args:
+            job_id: FireCrawl crawl job ID
+            max_wait: Seconds to keep polling before giving up on the rest
+        """
+        from firecrawl.v2.types import PaginationConfig
+
+        page_url = None  # result page holding the cursor (None = first page)
+        page_start = 0  # index of that page's first document
+        cursor = 0  # documents consumed
+        seen_urls = set()
+        waited = 0.0
+        attempt = 0
+
+        while True:
+            if page_url is None:
                 status = await asyncio.to_thread(
-                    lambda: self.firecrawl.get_crawl_status(crawl_job.job_id)
+                    self.firecrawl.get_crawl_status,
+                    job_id,
+                    PaginationConfig(auto_paginate=False),
+                )
+            else:
+                status = await asyncio.to_thread(
+                    self.firecrawl.get_crawl_status_page, page_url
                 )
-                if status.status == "completed":
-                    # Get the results
-                    results = await asyncio.to_thread(
-                        lambda: self.firecrawl.get_crawl_status(crawl_job.job_id)
-                    )
-                    pages = []
-                    if hasattr(results, "data") and results.data:
-                        for page in results.data:
-                            page_id = str(uuid.uuid4())
-                            page_url = getattr(page, "url", url)
-                            markdown_content = self._extract_markdown_from_result(page)
-
-                            pages.append(
-                                {
-                                    "page_id": page_id,
-                                    "url": page_url,
-                                    "base_url": base_url,
-                                    "markdown": markdown_content,
-                                    "crawl_id": crawl_id,
-                                    "metadata": {
-                                        "title": (
-                                            getattr(
-                                                getattr(page, "metadata", None),
-                                                "title",
-                                                "",
-                                            )
-                                            if hasattr(page, "metadata")
-                                            else ""
-                                        ),
-                                        "description": (
-                                            getattr(
-                                                getattr(page, "metadata", None),
-                                                "description",
-                                                "",
-                                            )
-                                            if hasattr(page, "metadata")
-                                            else ""
-                                        ),
-                                        "statusCode": 200,
-                                    },
-                                }
-                            )
-                        return (
-                            pages
-                            if pages
-                            else await self._scrape_single_page(url, base_url, crawl_id)
-                        )
-                    elif status.status == "failed":
-                        break
-                    # Exponential backoff: 2s, 4s, 8s, max 15s
-                    wait_time = min(2**attempt, 15)
-                    await asyncio.sleep(wait_time)
-                    waited += wait_time
-                    attempt += 1
-
-                # If crawl didn't complete, fall back to single page
-                return await self._scrape_single_page(url, base_url, crawl_id)
 
-        except Exception as e:
-            print(f"Crawl failed, falling back to single page scrape: {str(e)}")
-            # Fallback to single page scrape if crawl fails
-            return await self._scrape_single_page(url, base_url, crawl_id)
+            new_documents = 0
+            start = page_start
+            while True:
+                data = status.data or []
+                for offset, document in enumerate(data):
+                    if start + offset < cursor:
+                        continue
+                    cursor = start + offset + 1
+                    document_url = self._document_url(document)
+                    if document_url:
+                        if document_url in seen_urls:
+                            continue
+                        seen_urls.add(document_url)
+                    new_documents += 1
+                    yield document
+                if not status.next:
+                    break
+                # Move to the next result page; later polls resume from it
+                page_url, page_start = status.next, start + len(data)
+                start = page_start
+                status = await asyncio.to_thread(
+                    self.firecrawl.get_crawl_status_page, status.next
+                )
+
+            if status.status in ("completed", "failed", "cancelled"):
+                if status.status != "completed":
+                    print(f"Crawl {job_id} {status.status} after {cursor} pages")
+                return
+            if waited >= max_wait:
+                print(f"Crawl {job_id} still running after {max_wait}s; stopping at {cursor} pages")
+                return
+
+            # Poll quickly while pages keep arriving, back off when idle (1s, 2s, 4s, max 15s)
+            attempt = 0 if new_documents else attempt + 1
+            wait_time = min(2**attempt, 15)
+            await asyncio.sleep(wait_time)
+            waited += wait_time
+
+    @staticmethod
+    def _document_url(document) -> str:
+        metadata = getattr(document, "metadata", None)
+        return getattr(metadata, "source_url", None) or getattr(metadata, "url", None) or ""
+
+    def _page_from_document(
+        self, document, url: str, base_url: str, crawl_id: str = None
+    ) -> Dict[str, Any]:
+        """Page dict (same shape as _scrape_single_page) for a crawled document."""
+        metadata = getattr(document, "metadata", None)
+        return {
+            "page_id": str(uuid.uuid4()),
+            "url": self._document_url(document) or url,
+            "base_url": base_url,
+            "markdown": self._extract_markdown_from_result(document),
+            "crawl_id": crawl_id,
+            "metadata": {
+                "title": getattr(metadata, "title", "") or "",
+                "description": getattr(metadata, "description", "") or "",
+                "statusCode": getattr(metadata, "status_code", None) or 200,
+            },
+        }
 
     def _extract_markdown_from_result(self, result) -> str:
         """Extract markdown content from Firecrawl result, handling different response formats."""
@@ -196,6 +367,7 @@ class ScraperService:
                         if hasattr(metadata, "description")
                         else ""
                     ),
+                    "statusCode": getattr(metadata, "status_code", None),
                 }
 
             page_id = str(uuid.uuid4())
@@ -217,7 +389,9 @@ class ScraperService:
                             if isinstance(metadata, dict)
                             else getattr(metadata, "description", "")
                         ),
-                        "statusCode": 200,
+                        "statusCode": metadata.get("statusCode")
+                        or metadata.get("status_code")
+                        or 200,
                     },
                 }
             ]
@@ -1,13 +1,37 @@
+import asyncio
 import hashlib
-from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient
+import json
+import time
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Set, Tuple
+import numpy as np
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.models import (
     Distance,
     VectorParams,
     PointStruct,
+    Batch,
     Filter,
     FieldCondition,
     MatchValue,
+    MatchAny,
+    HnswConfigDiff,
+    VectorParamsDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    PointIdsList,
+    FilterSelector,
+    SearchParams,
+    QuantizationSearchParams,
+    QueryRequest,
 )
 from config import (
     QDRANT_URL,
@@ -15,10 +39,59 @@ from config import (
     COLLECTION_NAME,
     EMBEDDING_DIMENSION,
     WIDGET_COLLECTION_NAME,
+    QDRANT_QUANTIZATION,
+    QDRANT_QUANTIZATION_ALWAYS_RAM,
+    QDRANT_VECTORS_ON_DISK,
+    QDRANT_HNSW_M,
+    QDRANT_HNSW_EF_CONSTRUCT,
+    QDRANT_HNSW_EF,
+    QDRANT_RESCORE,
+    QDRANT_OVERSAMPLING,
+    QDRANT_HTTP2,
+    QDRANT_HTTP_MAX_CONNECTIONS,
+    QDRANT_HTTP_MAX_KEEPALIVE,
+    QDRANT_HTTP_KEEPALIVE_EXPIRY,
+    QDRANT_CONNECT_TIMEOUT,
+    QDRANT_SEARCH_TIMEOUT,
+    QDRANT_COUNT_TIMEOUT,
+    QDRANT_DELETE_TIMEOUT,
+    QDRANT_RECONNECT_INTERVAL,
+    QDRANT_DEBUG,
+    QDRANT_UPSERT_BATCH_SIZE,
+    QDRANT_WRITE_CONCURRENCY,
+    QDRANT_PREFER_GRPC,
+    QDRANT_GRPC_PORT,
+    LOCAL_INDEX_ENABLED,
+    LOCAL_INDEX_MAX_POINTS,
+    LOCAL_INDEX_SNAPSHOT_MAX_POINTS,
+    LOCAL_INDEX_REVALIDATE_SECONDS,
+    CHUNK_STORE_ENABLED,
+    CHUNK_STORE_PATH,
+    CHUNK_STORE_COMPRESSION,
+    CHUNK_STORE_GC_INTERVAL_SECONDS,
+    CHUNK_STORE_GC_GRACE_SECONDS,
 )
+from services.local_index import LocalVectorIndex, ScoredChunk, TenantSnapshot
+from services.chunk_store import ChunkStore, chunk_hash
 
 
 class VectorStoreService:
+    # Re-index target collections receiving writes while a job runs
+    # (alias -> collection). Shared by every instance so the background
+    # scraper's writes are mirrored too.
+    _reindex_targets: Dict[str, str] = {}
+    # Write version per tenant ((alias, crawl_id / site_id) -> counter), bumped
+    # on every upsert or delete; a local snapshot is only used while it matches
+    _tenant_versions: Dict[Tuple[str, str], int] = {}
+    # Payload field holding the tenant id in each collection
+    TENANT_KEYS = {COLLECTION_NAME: "crawl_id", WIDGET_COLLECTION_NAME: "site_id"}
+    # Page metadata key -> widget payload field of the page fingerprint
+    WIDGET_FINGERPRINT_FIELDS = {
+        "contentHash": "page_hash",
+        "etag": "etag",
+        "lastModified": "last_modified",
+    }
+
     def __init__(self):
         # Store connection config but don't connect yet (lazy connection)
         self.qdrant_url = QDRANT_URL
@@ -26,12 +99,47 @@ class VectorStoreService:
         self.collection_name = COLLECTION_NAME
         self._client = None  # Will be initialized on first use
         self._connection_error = None  # Store connection errors
+        self._connection_error_at = 0.0
+        # Collections whose vectors have a different dimension than the model
+        # (alias -> existing dimension); they are re-indexed, never deleted
+        self.reindex_required: Dict[str, int] = {}
+        # Shared async HTTP client for REST calls (created on first use)
+        self._http: Optional[httpx.AsyncClient] = None
+        # Async gRPC client for reads when QDRANT_PREFER_GRPC is set
+        self._grpc: Optional[AsyncQdrantClient] = None
+        # Bounds concurrent write requests (created on first write, inside the event loop)
+        self._write_semaphore: Optional[asyncio.Semaphore] = None
+        # Collections with wait=False writes not yet confirmed by flush_writes()
+        self._unflushed: Set[str] = set()
+        # Tenants written with wait=False (their version is bumped again on flush)
+        self._unflushed_tenants: Set[Tuple[str, str]] = set()
+        # Barriers started by flush_writes() and not yet applied
+        self._flush_barriers: Set[asyncio.Task] = set()
+        # Brute-force snapshots of small tenants (None when disabled)
+        self.local_index: Optional[LocalVectorIndex] = (
+            LocalVectorIndex() if LOCAL_INDEX_ENABLED else None
+        )
+        # Chunk text store (None = text stays inline in the payload)
+        if CHUNK_STORE_ENABLED and not CHUNK_STORE_PATH:
+            raise ValueError(
+                "CHUNK_STORE_PATH must be set (on persistent storage) when CHUNK_STORE_ENABLED is true"
+            )
+        self.chunk_store: Optional[ChunkStore] = (
+            ChunkStore(CHUNK_STORE_PATH, CHUNK_STORE_COMPRESSION) if CHUNK_STORE_ENABLED else None
+        )
+        # Snapshot refreshes in flight, and tenants not worth a snapshot
+        # ((alias, tenant) -> (version, retry after))
+        self._snapshot_tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._snapshot_skipped: Dict[Tuple[str, str], Tuple[int, float]] = {}
 
     def _get_client(self):
         """Get Qdrant client, creating it if necessary (lazy initialization)."""
         if self._client is None:
-            if self._connection_error is not None:
-                # Connection previously failed - raise helpful error
+            if (
+                self._connection_error is not None
+                and time.monotonic() - self._connection_error_at < QDRANT_RECONNECT_INTERVAL
+            ):
+                # Connection failed recently - raise helpful error until the next retry
                 raise ConnectionError(
                     f"Qdrant is not available at {self.qdrant_url}. "
                     f"Please start Qdrant (e.g., 'docker-compose up -d qdrant' or 'docker run -p 6333:6333 qdrant/qdrant'). "
@@ -39,22 +147,29 @@ class VectorStoreService:
                 )
 
             try:
+                transport = " (gRPC)" if QDRANT_PREFER_GRPC else ""
                 if self.qdrant_api_key:
                     self._client = QdrantClient(
-                        url=self.qdrant_url, api_key=self.qdrant_api_key
+                        url=self.qdrant_url,
+                        api_key=self.qdrant_api_key,
+                        **self._grpc_options(),
                     )
-                    print(f"Connected to Qdrant Cloud: {self.qdrant_url}")
+                    print(f"Connected to Qdrant Cloud: {self.qdrant_url}{transport}")
                 else:
                     # Local Qdrant instance
-                    self._client = QdrantClient(url=self.qdrant_url)
-                    print(f"Connected to local Qdrant: {self.qdrant_url}")
+                    self._client = QdrantClient(url=self.qdrant_url, **self._grpc_options())
+                    print(f"Connected to local Qdrant: {self.qdrant_url}{transport}")
 
                 # Ensure collection exists on first connection
                 self._ensure_collection_exists()
                 self._ensure_payload_indexes()
+                self._connection_error = None
             except Exception as e:
                 # Store the error but don't raise - allow server to start
+                # (the connection is retried after QDRANT_RECONNECT_INTERVAL)
+                self._client = None
                 self._connection_error = str(e)
+                self._connection_error_at = time.monotonic()
                 print(
                     f"Warning: Could not connect to Qdrant at {self.qdrant_url}: {str(e)}"
                 )
@@ -78,24 +193,521 @@ class VectorStoreService:
             )
         return client
 
+    # ============== Pooled REST client ==============
+
+    def _http_client(self) -> httpx.AsyncClient:
+        """
+        Long-lived async HTTP client for Qdrant REST calls.
+
+        Reusing pooled (keep-alive) connections avoids a TCP and TLS handshake
+        on every query; with HTTP/2 concurrent requests share one connection.
+        """
+        if self._http is None or self._http.is_closed:
+            http2 = QDRANT_HTTP2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    print("Warning: h2 not installed, using HTTP/1.1 for Qdrant (pip install 'httpx[http2]')")
+                    http2 = False
+
+            headers = {"Content-Type": "application/json"}
+            if QDRANT_API_KEY:
+                headers["api-key"] = QDRANT_API_KEY
+
+            self._http = httpx.AsyncClient(
+                base_url=QDRANT_URL,
+                headers=headers,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=QDRANT_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=QDRANT_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=QDRANT_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    QDRANT_SEARCH_TIMEOUT, connect=QDRANT_CONNECT_TIMEOUT
+                ),
+            )
+        return self._http
+
+    async def _post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: float,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> httpx.Response:
+        """
+        POST a JSON payload to the Qdrant REST API with an operation timeout.
+
+        Args:
+            timings: If given, receives serialize / network times (ms) and wire sizes
+        """
+        timeout = httpx.Timeout(timeout, connect=QDRANT_CONNECT_TIMEOUT)
+        if timings is None:
+            return await self._http_client().post(path, json=payload, timeout=timeout)
+
+        start = time.perf_counter()
+        content = json.dumps(payload).encode("utf-8")
+        timings["serialize"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        response = await self._http_client().post(
+            path,
+            content=content,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+        )
+        timings["network"] = (time.perf_counter() - start) * 1000
+        timings["request_bytes"] = len(content)
+        timings["response_bytes"] = len(response.content)
+        return response
+
+    async def aclose(self):
+        """Close pooled connections (called on application shutdown)."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._grpc is not None:
+            await self._grpc.close()
+            self._grpc = None
+
+    # ============== Transport (REST or gRPC) ==============
+
+    @staticmethod
+    def _grpc_options() -> Dict[str, Any]:
+        """Client options selecting the gRPC transport (empty for REST)."""
+        if not QDRANT_PREFER_GRPC:
+            return {}
+        return {"prefer_grpc": True, "grpc_port": QDRANT_GRPC_PORT}
+
+    def _grpc_client(self) -> AsyncQdrantClient:
+        """Long-lived async gRPC client (one HTTP/2 channel shared by all reads)."""
+        if self._grpc is None:
+            self._grpc = AsyncQdrantClient(
+                url=self.qdrant_url, api_key=self.qdrant_api_key, **self._grpc_options()
+            )
+        return self._grpc
+
+    @staticmethod
+    def _match_filter(key: str, value: str) -> Filter:
+        return Filter(must=[FieldCondition(key=key, match=MatchValue(value=value))])
+
+    def _search_params_model(self) -> Optional[SearchParams]:
+        """_search_params() as a client model (for the gRPC transport)."""
+        params = self._search_params()
+        if params is None:
+            return None
+        quantization = params.get("quantization")
+        return SearchParams(
+            hnsw_ef=params.get("hnsw_ef"),
+            quantization=QuantizationSearchParams(**quantization) if quantization else None,
+        )
+
+    async def _search_points(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        limit: int,
+        filter_key: str,
+        filter_value: str,
+        with_vectors: bool = False,
+        score_threshold: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[ScoredChunk]:
+        """
+        Filtered vector search over the configured transport.
+
+        The tenant filter, score threshold and payload include-list are all
+        applied by Qdrant, so only the hits we keep are sent and decoded.
+
+        Args:
+            collection_name: Collection or alias to search
+            query_vector: Query embedding
+            limit: Maximum hits
+            filter_key: Payload field holding the tenant id
+            filter_value: Tenant id the hits must match
+            with_vectors: Also return the stored vectors
+            score_threshold: Minimum score (None = no threshold)
+            fields: Payload fields to return (None = full payload)
+
+        Returns:
+            Hits, best first
+        """
+        timings: Optional[Dict[str, float]] = {} if QDRANT_DEBUG else None
+
+        if QDRANT_PREFER_GRPC:
+            start = time.perf_counter()
+            response = await self._grpc_client().query_points(
+                collection_name=collection_name,
+                query=query_vector,
+                query_filter=self._match_filter(filter_key, filter_value),
+                search_params=self._search_params_model(),
+                limit=limit,
+                score_threshold=score_threshold,
+                with_payload=fields if fields else True,
+                with_vectors=with_vectors,
+                timeout=int(QDRANT_SEARCH_TIMEOUT),
+            )
+            points = [
+                ScoredChunk(point.id, point.score, point.payload or {}, point.vector)
+                for point in response.points
+            ]
+            if timings is not None:
+                # The client serializes and decodes inside the call
+                timings["call"] = (time.perf_counter() - start) * 1000
+                self._log_timings("search (gRPC)", collection_name, timings, len(points))
+            return points
+
+        payload = {
+            "vector": query_vector,
+            "limit": limit,
+            "with_payload": fields if fields else True,
+            "filter": {"must": [{"key": filter_key, "match": {"value": filter_value}}]},
+        }
+        if score_threshold is not None:
+            payload["score_threshold"] = score_threshold
+        if with_vectors:
+            payload["with_vector"] = True
+        search_params = self._search_params()
+        if search_params:
+            payload["params"] = search_params
+
+        response = await self._post(
+            f"/collections/{collection_name}/points/search",
+            payload,
+            QDRANT_SEARCH_TIMEOUT,
+            timings=timings,
+        )
+        if response.status_code != 200 and QDRANT_DEBUG:
+            print(f"Qdrant search error body: {response.text}")
+        response.raise_for_status()
+
+        start = time.perf_counter()
+        points = [
+            ScoredChunk(
+                point["id"], point["score"], point.get("payload") or {}, point.get("vector")
+            )
+            for point in json.loads(response.content).get("result", [])
+        ]
+        if timings is not None:
+            timings["decode"] = (time.perf_counter() - start) * 1000
+            self._log_timings("search", collection_name, timings, len(points))
+        return points
+
+    async def _search_points_batch(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        limit: int,
+        filter_key: str,
+        filter_value: str,
+        score_threshold: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[List[ScoredChunk]]:
+        """
+        Run several filtered vector searches in one request (/points/search/batch).
+
+        Args:
+            score_threshold: Minimum score, applied by Qdrant (None = no threshold)
+            fields: Payload fields to return (None = full payload)
+
+        Returns:
+            One list of hits per query vector, in order
+        """
+        with_payload = fields if fields else True
+        timings: Optional[Dict[str, float]] = {} if QDRANT_DEBUG else None
+
+        if QDRANT_PREFER_GRPC:
+            start = time.perf_counter()
+            query_filter = self._match_filter(filter_key, filter_value)
+            params = self._search_params_model()
+            responses = await self._grpc_client().query_batch_points(
+                collection_name=collection_name,
+                requests=[
+                    QueryRequest(
+                        query=vector,
+                        filter=query_filter,
+                        params=params,
+                        limit=limit,
+                        score_threshold=score_threshold,
+                        with_payload=with_payload,
+                    )
+                    for vector in query_vectors
+                ],
+                timeout=int(QDRANT_SEARCH_TIMEOUT),
+            )
+            batches = [
+                [
+                    ScoredChunk(point.id, point.score, point.payload or {})
+                    for point in response.points
+                ]
+                for response in responses
+            ]
+            if timings is not None:
+                timings["call"] = (time.perf_counter() - start) * 1000
+                self._log_timings(
+                    "batch search (gRPC)", collection_name, timings, sum(map(len, batches))
+                )
+            return batches
+
+        search_filter = {"must": [{"key": filter_key, "match": {"value": filter_value}}]}
+        search_params = self._search_params()
+        searches = []
+        for vector in query_vectors:
+            search = {
+                "vector": vector,
+                "limit": limit,
+                "with_payload": with_payload,
+                "filter": search_filter,
+            }
+            if score_threshold is not None:
+                search["score_threshold"] = score_threshold
+            if search_params:
+                search["params"] = search_params
+            searches.append(search)
+
+        response = await self._post(
+            f"/collections/{collection_name}/points/search/batch",
+            {"searches": searches},
+            QDRANT_SEARCH_TIMEOUT,
+            timings=timings,
+        )
+        if response.status_code != 200 and QDRANT_DEBUG:
+            print(f"Qdrant batch search error body: {response.text}")
+        response.raise_for_status()
+
+        start = time.perf_counter()
+        batches = [
+            [
+                ScoredChunk(point["id"], point["score"], point.get("payload") or {})
+                for point in points
+            ]
+            for points in json.loads(response.content).get("result", [])
+        ]
+        if timings is not None:
+            timings["decode"] = (time.perf_counter() - start) * 1000
+            self._log_timings("batch search", collection_name, timings, sum(map(len, batches)))
+        return batches
+
+    @staticmethod
+    def _log_timings(
+        operation: str, collection_name: str, timings: Dict[str, float], hits: int
+    ):
+        """Print one QDRANT_DEBUG timing line (milliseconds, plus wire sizes for REST)."""
+        parts = [
+            f"{stage} {value:.2f} ms" if not stage.endswith("_bytes") else f"{stage} {int(value)}"
+            for stage, value in timings.items()
+        ]
+        print(f"Qdrant {operation} on {collection_name}: {', '.join(parts)}, {hits} hits")
+
+    async def _count_points(
+        self, collection_name: str, filter_key: str, filter_value: str
+    ) -> int:
+        """Exact count of the points matching a keyword filter."""
+        if QDRANT_PREFER_GRPC:
+            result = await self._grpc_client().count(
+                collection_name=collection_name,
+                count_filter=self._match_filter(filter_key, filter_value),
+                exact=True,
+            )
+            return result.count
+
+        response = await self._post(
+            f"/collections/{collection_name}/points/count",
+            {"filter": {"must": [{"key": filter_key, "match": {"value": filter_value}}]}},
+            QDRANT_COUNT_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json().get("result", {}).get("count", 0)
+
+    async def _delete_by_filter(
+        self, collection_name: str, filter_key: str, filter_value: str
+    ):
+        """Delete the points matching a keyword filter."""
+        await self._delete_where(collection_name, {filter_key: filter_value})
+
+    async def _delete_where(
+        self,
+        collection_name: str,
+        must: Dict[str, Any],
+        must_not: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Delete the points matching keyword conditions.
+
+        Returns once the delete is applied (wait=true), so callers can bump the
+        tenant version without a query caching the pre-delete points under it.
+
+        Args:
+            must / must_not: {payload field: value, or list of values (any of)}
+        """
+
+        def conditions(fields: Dict[str, Any]):
+            return [
+                (key, {"any": list(value)} if isinstance(value, (list, set, tuple)) else {"value": value})
+                for key, value in (fields or {}).items()
+            ]
+
+        if QDRANT_PREFER_GRPC:
+
+            def condition(key, match):
+                return FieldCondition(
+                    key=key,
+                    match=MatchAny(any=match["any"]) if "any" in match else MatchValue(value=match["value"]),
+                )
+
+            await self._grpc_client().delete(
+                collection_name=collection_name,
+                points_selector=FilterSelector(
+                    filter=Filter(
+                        must=[condition(k, m) for k, m in conditions(must)],
+                        must_not=[condition(k, m) for k, m in conditions(must_not)] or None,
+                    )
+                ),
+            )
+            return
+
+        rest_filter = {"must": [{"key": k, "match": m} for k, m in conditions(must)]}
+        if must_not:
+            rest_filter["must_not"] = [{"key": k, "match": m} for k, m in conditions(must_not)]
+        response = await self._post(
+            f"/collections/{collection_name}/points/delete?wait=true",
+            {"filter": rest_filter},
+            QDRANT_DELETE_TIMEOUT,
+        )
+        response.raise_for_status()
+
     def _generate_stable_id(self, page_id: str) -> int:
         """Generate a stable int64 ID from page_id using SHA256 hash."""
         hash_bytes = hashlib.sha256(page_id.encode("utf-8")).digest()
         # Use first 8 bytes for int64, mask to ensure positive
         return int.from_bytes(hash_bytes[:8], byteorder="big") & 0x7FFFFFFFFFFFFFFF
 
+    @staticmethod
+    def _as_vector_rows(vectors) -> List[List[float]]:
+        """
+        Convert embeddings (ndarray rows or lists) to the nested float lists Qdrant expects.
+        A single ndarray.tolist() call avoids per-element Python conversion.
+        """
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    # ============== Storage profile (quantization / HNSW) ==============
+
+    def _vectors_config(self) -> VectorParams:
+        """Vector params for new collections (originals optionally kept on disk)."""
+        return VectorParams(
+            size=EMBEDDING_DIMENSION,
+            distance=Distance.COSINE,
+            on_disk=QDRANT_VECTORS_ON_DISK,
+        )
+
+    def _hnsw_config(self) -> HnswConfigDiff:
+        return HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT)
+
+    def _quantization_config(self):
+        """Quantization config from QDRANT_QUANTIZATION (None = full float32 only)."""
+        if QDRANT_QUANTIZATION == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=QDRANT_QUANTIZATION_ALWAYS_RAM,
+                )
+            )
+        if QDRANT_QUANTIZATION == "binary":
+            return BinaryQuantization(
+                binary=BinaryQuantizationConfig(
+                    always_ram=QDRANT_QUANTIZATION_ALWAYS_RAM
+                )
+            )
+        return None
+
+    def _create_collection(self, collection_name: str):
+        """Create a collection using the configured storage profile."""
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=self._vectors_config(),
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config(),
+        )
+
+    def _search_params(self) -> Optional[Dict[str, Any]]:
+        """Search-time params for the Qdrant REST API (hnsw_ef, rescoring)."""
+        params: Dict[str, Any] = {}
+        if QDRANT_HNSW_EF > 0:
+            params["hnsw_ef"] = QDRANT_HNSW_EF
+        if QDRANT_QUANTIZATION in ("scalar", "binary"):
+            # Search the quantized vectors, then rescore the top candidates
+            # with the original vectors (read from disk if on_disk is set)
+            params["quantization"] = {
+                "rescore": QDRANT_RESCORE,
+                "oversampling": QDRANT_OVERSAMPLING,
+            }
+        return params or None
+
+    def storage_profile(self) -> Dict[str, Any]:
+        """The configured storage profile (what new collections are created with)."""
+        return {
+            "quantization": QDRANT_QUANTIZATION,
+            "quantization_always_ram": QDRANT_QUANTIZATION_ALWAYS_RAM,
+            "vectors_on_disk": QDRANT_VECTORS_ON_DISK,
+            "hnsw_m": QDRANT_HNSW_M,
+            "hnsw_ef_construct": QDRANT_HNSW_EF_CONSTRUCT,
+            "hnsw_ef": QDRANT_HNSW_EF or None,
+            "rescore": QDRANT_RESCORE,
+            "oversampling": QDRANT_OVERSAMPLING,
+            "chunk_store": self.chunk_store.stats() if self.chunk_store is not None else None,
+        }
+
+    def apply_storage_profile(self, collection_name: str) -> Dict[str, Any]:
+        """
+        Apply the configured storage profile to an existing collection.
+
+        Qdrant rebuilds the quantized vectors and HNSW graph in the background;
+        the collection stays searchable while it optimizes.
+
+        Args:
+            collection_name: Collection to update
+
+        Returns:
+            Collection name, applied profile and the collection status
+        """
+        try:
+            # Collection-level settings live on the physical collection, not the alias
+            collection_name = self._resolve_collection(collection_name) or collection_name
+            quantization = self._quantization_config() or Disabled.DISABLED
+            self.client.update_collection(
+                collection_name=collection_name,
+                # "" is the default (unnamed) vector
+                vectors_config={"": VectorParamsDiff(on_disk=QDRANT_VECTORS_ON_DISK)},
+                hnsw_config=self._hnsw_config(),
+                quantization_config=quantization,
+            )
+            info = self.client.get_collection(collection_name)
+            print(
+                f"Applied storage profile to {collection_name}: {QDRANT_QUANTIZATION} quantization"
+            )
+            return {
+                "collection": collection_name,
+                "status": str(getattr(info, "status", "")),
+                "points": getattr(info, "points_count", None),
+                "profile": self.storage_profile(),
+            }
+        except Exception as e:
+            raise Exception(f"Failed to apply storage profile: {str(e)}")
+
     def _ensure_payload_indexes(self):
         """Create payload indexes for faster filtering on commonly queried fields."""
         try:
             # Check if collection exists first
-            collections = self.client.get_collections().collections
-            if self.collection_name not in [c.name for c in collections]:
+            collection_name = self._resolve_collection(self.collection_name)
+            if collection_name is None:
                 return
 
             # Create index for crawl_id (most common filter)
             try:
                 self.client.create_payload_index(
-                    collection_name=self.collection_name,
+                    collection_name=collection_name,
                     field_name="crawl_id",
                     field_schema="keyword",
                 )
@@ -105,7 +717,7 @@ class VectorStoreService:
             # Create index for url
             try:
                 self.client.create_payload_index(
-                    collection_name=self.collection_name,
+                    collection_name=collection_name,
                     field_name="url",
                     field_schema="keyword",
                 )
@@ -115,164 +727,472 @@ class VectorStoreService:
         except Exception as e:
             print(f"Warning: Could not create payload indexes: {str(e)}")
 
-    def _ensure_collection_exists(self):
-        """Create collection if it doesn't exist, or recreate if dimension mismatch."""
+    # ============== Versioned collections and aliases ==============
+
+    def _resolve_collection(self, name: str) -> Optional[str]:
+        """
+        Resolve a collection name to the physical collection behind it.
+
+        Reads and writes use the alias (e.g. 'scraped_pages'), which points at a
+        versioned collection (e.g. 'scraped_pages_v1718000000000'). Collections
+        created before aliases were introduced resolve to themselves.
+
+        Returns:
+            Physical collection name, or None if neither alias nor collection exists
+        """
+        aliases = {
+            a.alias_name: a.collection_name for a in self.client.get_aliases().aliases
+        }
+        if name in aliases:
+            return aliases[name]
+        collection_names = [col.name for col in self.client.get_collections().collections]
+        return name if name in collection_names else None
+
+    @staticmethod
+    def _versioned_collection_name(alias: str) -> str:
+        return f"{alias}_v{int(time.time() * 1000)}"
+
+    def _create_aliased_collection(self, alias: str) -> str:
+        """Create a new versioned collection and point the alias at it."""
+        collection_name = self._versioned_collection_name(alias)
+        self._create_collection(collection_name)
+        self.switch_alias(alias, collection_name)
+        return collection_name
+
+    def switch_alias(self, alias: str, collection_name: str) -> Optional[str]:
+        """
+        Atomically point an alias at a collection.
+
+        A pre-alias collection that is itself named like the alias has to be
+        deleted first (Qdrant doesn't allow an alias and a collection to share
+        a name); this only happens once, on the first re-index.
+
+        Returns:
+            The collection the alias pointed at before, if any
+        """
+        previous = self._resolve_collection(alias)
+        operations = []
+        if previous == alias:
+            print(f"Migrating collection '{alias}' to an alias (old collection is removed)")
+            self.client.delete_collection(collection_name=alias)
+            previous = None
+        elif previous is not None:
+            operations.append(
+                DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias))
+            )
+        operations.append(
+            CreateAliasOperation(
+                create_alias=CreateAlias(
+                    collection_name=collection_name, alias_name=alias
+                )
+            )
+        )
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        print(f"Alias '{alias}' now points to collection '{collection_name}'")
+        return previous
+
+    def _get_collection_dimension(self, collection_name: str) -> Optional[int]:
+        """Read the vector size of a collection (None if it can't be determined)."""
+        collection_info = self.client.get_collection(collection_name)
+        existing_dim = None
+
+        # Extract dimension from collection config - handle multiple formats
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [col.name for col in collections]
-
-            if self.collection_name not in collection_names:
-                # Collection doesn't exist, create it
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=EMBEDDING_DIMENSION, distance=Distance.COSINE
-                    ),
+            # Try different ways to access the dimension
+            if hasattr(collection_info, "config"):
+                config = collection_info.config
+                if hasattr(config, "params"):
+                    params = config.params
+                    if hasattr(params, "vectors"):
+                        vectors = params.vectors
+                        # Handle different vector config formats
+                        if hasattr(vectors, "size"):
+                            existing_dim = vectors.size
+                        elif isinstance(vectors, dict):
+                            existing_dim = vectors.get("size")
+                        elif hasattr(vectors, "params") and hasattr(
+                            vectors.params, "size"
+                        ):
+                            existing_dim = vectors.params.size
+
+            # Alternative: try accessing directly
+            if existing_dim is None:
+                # Try to get it from the collection info directly
+                if hasattr(collection_info, "config") and hasattr(
+                    collection_info.config, "params"
+                ):
+                    params = collection_info.config.params
+                    # Check if it's a named vectors config
+                    if hasattr(params, "vectors") and isinstance(params.vectors, dict):
+                        # For named vectors, get the default vector size
+                        if "size" in params.vectors:
+                            existing_dim = params.vectors["size"]
+                        elif isinstance(params.vectors, dict) and len(params.vectors) > 0:
+                            # Get first vector config
+                            first_vector = list(params.vectors.values())[0]
+                            if isinstance(first_vector, dict) and "size" in first_vector:
+                                existing_dim = first_vector["size"]
+                            elif hasattr(first_vector, "size"):
+                                existing_dim = first_vector.size
+
+        except Exception as e:
+            print(f"Warning: Could not extract dimension from collection: {str(e)}")
+
+        return existing_dim
+
+    def _check_dimension(self, alias: str, collection_name: str):
+        """Flag a collection for re-indexing if its dimension doesn't match the model."""
+        existing_dim = self._get_collection_dimension(collection_name)
+
+        if existing_dim is not None and existing_dim != EMBEDDING_DIMENSION:
+            if alias not in self.reindex_required:
+                print(f"⚠️  Collection dimension mismatch detected!")
+                print(f"   Collection: {alias} ({collection_name})")
+                print(f"   Existing dimension: {existing_dim}")
+                print(f"   Required dimension: {EMBEDDING_DIMENSION}")
+                print(
+                    f"   Existing data is kept; it will be re-embedded into a new collection "
+                    f"(POST /api/vector-store/reindex)."
                 )
+            self.reindex_required[alias] = existing_dim
+        elif existing_dim is None:
+            # Couldn't determine dimension, but collection exists - assume it's correct
+            print(
+                f"Using existing Qdrant collection: {alias} (could not verify dimension)"
+            )
+        else:
+            self.reindex_required.pop(alias, None)
+            # Try to get point count to show data persistence
+            try:
+                collection_info = self.client.get_collection(collection_name)
+                point_count = getattr(collection_info, "points_count", None)
+                if point_count is not None:
+                    print(
+                        f"Using existing Qdrant collection: {alias} (dimension: {existing_dim}, points: {point_count})"
+                    )
+                else:
+                    print(
+                        f"Using existing Qdrant collection: {alias} (dimension: {existing_dim})"
+                    )
+            except Exception:
                 print(
-                    f"Created Qdrant collection: {self.collection_name} with dimension {EMBEDDING_DIMENSION}"
+                    f"Using existing Qdrant collection: {alias} (dimension: {existing_dim})"
                 )
+
+    def _ensure_collection_exists(self):
+        """Create collection if it doesn't exist, or flag it for re-index on dimension mismatch."""
+        try:
+            collection_name = self._resolve_collection(self.collection_name)
+
+            if collection_name is None:
+                # Collection doesn't exist, create it behind an alias
+                collection_name = self._create_aliased_collection(self.collection_name)
                 print(
-                    f"Created Qdrant collection: {self.collection_name} with dimension {EMBEDDING_DIMENSION}"
+                    f"Created Qdrant collection: {self.collection_name} ({collection_name}) with dimension {EMBEDDING_DIMENSION}"
                 )
 
                 # Create filter index for crawl_id
                 self.client.create_payload_index(
-                    collection_name=self.collection_name,
+                    collection_name=collection_name,
                     field_name="crawl_id",
                     field_schema="keyword",
                 )
                 print(f"Created payload index for 'crawl_id'")
             else:
                 # Collection exists, check if dimension matches
-                collection_info = self.client.get_collection(self.collection_name)
-                existing_dim = None
-
-                # Extract dimension from collection config - handle multiple formats
-                try:
-                    # Try different ways to access the dimension
-                    if hasattr(collection_info, "config"):
-                        config = collection_info.config
-                        if hasattr(config, "params"):
-                            params = config.params
-                            if hasattr(params, "vectors"):
-                                vectors = params.vectors
-                                # Handle different vector config formats
-                                if hasattr(vectors, "size"):
-                                    existing_dim = vectors.size
-                                elif isinstance(vectors, dict):
-                                    existing_dim = vectors.get("size")
-                                elif hasattr(vectors, "params") and hasattr(
-                                    vectors.params, "size"
-                                ):
-                                    existing_dim = vectors.params.size
-
-                    # Alternative: try accessing directly
-                    if existing_dim is None:
-                        # Try to get it from the collection info directly
-                        if hasattr(collection_info, "config") and hasattr(
-                            collection_info.config, "params"
-                        ):
-                            params = collection_info.config.params
-                            # Check if it's a named vectors config
-                            if hasattr(params, "vectors") and isinstance(
-                                params.vectors, dict
-                            ):
-                                # For named vectors, get the default vector size
-                                if "size" in params.vectors:
-                                    existing_dim = params.vectors["size"]
-                                elif (
-                                    isinstance(params.vectors, dict)
-                                    and len(params.vectors) > 0
-                                ):
-                                    # Get first vector config
-                                    first_vector = list(params.vectors.values())[0]
-                                    if (
-                                        isinstance(first_vector, dict)
-                                        and "size" in first_vector
-                                    ):
-                                        existing_dim = first_vector["size"]
-                                    elif hasattr(first_vector, "size"):
-                                        existing_dim = first_vector.size
-
-                    print(f"Detected collection dimension: {existing_dim}")
-
-                except Exception as e:
-                    print(
-                        f"Warning: Could not extract dimension from collection: {str(e)}"
-                    )
-
-                # If dimension doesn't match, recreate collection
-                if existing_dim is not None and existing_dim != EMBEDDING_DIMENSION:
-                    print(f"⚠️  Collection dimension mismatch detected!")
-                    print(f"   Existing dimension: {existing_dim}")
-                    print(f"   Required dimension: {EMBEDDING_DIMENSION}")
-                    print(
-                        f"   Deleting and recreating collection: {self.collection_name}"
-                    )
-                    print(
-                        f"   Note: All existing data in this collection will be lost."
-                    )
-                    try:
-                        # Delete the old collection
-                        self.client.delete_collection(
-                            collection_name=self.collection_name
-                        )
-                        # Recreate with correct dimension
-                        self.client.create_collection(
-                            collection_name=self.collection_name,
-                            vectors_config=VectorParams(
-                                size=EMBEDDING_DIMENSION, distance=Distance.COSINE
-                            ),
-                        )
-                        print(
-                            f"✅ Recreated Qdrant collection: {self.collection_name} with dimension {EMBEDDING_DIMENSION}"
-                        )
-                        print(
-                            f"   You'll need to re-scrape websites to populate the collection."
-                        )
-                    except Exception as recreate_error:
-                        print(f"❌ Error recreating collection: {str(recreate_error)}")
-                        print(
-                            f"   You may need to manually delete the collection via Qdrant Cloud dashboard"
-                        )
-                        raise
-                elif existing_dim is None:
-                    # Couldn't determine dimension, but collection exists - assume it's correct
-                    print(
-                        f"Using existing Qdrant collection: {self.collection_name} (could not verify dimension)"
-                    )
-                else:
-                    # Try to get point count to show data persistence
-                    try:
-                        collection_info = self.client.get_collection(
-                            self.collection_name
-                        )
-                        point_count = getattr(collection_info, "points_count", None)
-                        if point_count is not None:
-                            print(
-                                f"Using existing Qdrant collection: {self.collection_name} (dimension: {existing_dim}, points: {point_count})"
-                            )
-                        else:
-                            print(
-                                f"Using existing Qdrant collection: {self.collection_name} (dimension: {existing_dim})"
-                            )
-                    except Exception:
-                        print(
-                            f"Using existing Qdrant collection: {self.collection_name} (dimension: {existing_dim})"
-                        )
+                self._check_dimension(self.collection_name, collection_name)
         except Exception as e:
             print(f"Error ensuring collection exists: {str(e)}")
             # Re-raise if it's a critical error
             if "connection" in str(e).lower() or "timeout" in str(e).lower():
                 raise
 
+    # ============== Online re-index support ==============
+
+    def begin_reindex(self, alias: str, target_collection: str):
+        """Start mirroring writes for `alias` into the re-index target collection."""
+        self._reindex_targets[alias] = target_collection
+
+    def end_reindex(self, alias: str):
+        self._reindex_targets.pop(alias, None)
+
+    def _write_collections(self, alias: str) -> List[str]:
+        """
+        Collections a write for `alias` must go to.
+
+        While a re-index runs, writes also go to the target collection so the
+        new collection is complete at cut-over. If the current collection has
+        the old dimension, new vectors can only go to the target.
+        """
+        target = self._reindex_targets.get(alias)
+        if target is None:
+            return [alias]
+        if alias in self.reindex_required:
+            return [target]
+        return [alias, target]
+
+    # ============== Non-blocking write pipeline ==============
+
+    async def _run_write(self, func, *args, **kwargs):
+        """Run a blocking Qdrant client call in a worker thread, bounded by the write limit."""
+        if self._write_semaphore is None:
+            self._write_semaphore = asyncio.Semaphore(max(1, QDRANT_WRITE_CONCURRENCY))
+        async with self._write_semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    @staticmethod
+    def _split_points(points) -> list:
+        """Split a Batch or a list of PointStruct into upsert-sized sub-batches."""
+        size = max(1, QDRANT_UPSERT_BATCH_SIZE)
+        if isinstance(points, Batch):
+            return [
+                Batch(
+                    ids=points.ids[i : i + size],
+                    vectors=points.vectors[i : i + size],
+                    payloads=points.payloads[i : i + size] if points.payloads else None,
+                )
+                for i in range(0, len(points.ids), size)
+            ]
+        return [points[i : i + size] for i in range(0, len(points), size)]
+
+    def _point_tenants(self, alias: str, points) -> Set[str]:
+        """Tenant ids (crawl_id / site_id) found in the payloads of a write."""
+        tenant_key = self.TENANT_KEYS.get(alias)
+        if tenant_key is None:
+            return set()
+        if isinstance(points, Batch):
+            payloads = points.payloads or []
+        else:
+            payloads = [point.payload or {} for point in points]
+        return {payload[tenant_key] for payload in payloads if payload.get(tenant_key)}
+
+    async def _upsert(self, alias: str, points, wait: bool = True):
+        """
+        Upsert points without blocking the event loop.
+
+        Sub-batches are written concurrently (bounded by QDRANT_WRITE_CONCURRENCY).
+        With wait=False Qdrant acknowledges each write once it is in its
+        write-ahead log; call flush_writes() before relying on the points
+        being searchable.
+        """
+        collection_names = self._write_collections(alias)
+        tasks = [
+            asyncio.ensure_future(
+                self._run_write(
+                    self.client.upsert,
+                    collection_name=collection_name,
+                    points=chunk,
+                    wait=wait,
+                )
+            )
+            for collection_name in collection_names
+            for chunk in self._split_points(points)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        tenants = self._point_tenants(alias, points)
+        for tenant in tenants:
+            self._bump_tenant_version(alias, tenant)
+        if not wait:
+            self._unflushed.update(collection_names)
+            self._unflushed_tenants.update((alias, tenant) for tenant in tenants)
+
+    async def flush_writes(self):
+        """
+        Barrier for wait=False writes.
+
+        Qdrant applies the updates of a collection in order, so a waited
+        (empty) delete returns only after every earlier write is applied.
+
+        Concurrent callers share the pending writes: each one takes what is
+        unflushed so far and also waits for the barriers already running,
+        which may hold the caller's own writes.
+        """
+        pending, self._unflushed = self._unflushed, set()
+        tenants, self._unflushed_tenants = self._unflushed_tenants, set()
+        running = list(self._flush_barriers)
+        barrier = asyncio.create_task(self._write_barrier(pending, tenants))
+        self._flush_barriers.add(barrier)
+        barrier.add_done_callback(self._flush_barriers.discard)
+        # Shielded: a cancelled caller must not cancel barriers others wait on
+        await asyncio.shield(asyncio.gather(*running, barrier))
+
+    async def _write_barrier(self, pending: Set[str], tenants: Set[Tuple[str, str]]):
+        await asyncio.gather(
+            *(
+                self._run_write(
+                    self.client.delete,
+                    collection_name=collection_name,
+                    points_selector=PointIdsList(points=[]),
+                    wait=True,
+                )
+                for collection_name in pending
+            )
+        )
+        # A snapshot built before the writes were applied may have missed them
+        for alias, tenant in tenants:
+            self._bump_tenant_version(alias, tenant)
+
+    def _check_searchable(self, alias: str):
+        """Fail fast with a clear message while a collection waits for re-indexing."""
+        if alias in self.reindex_required:
+            raise Exception(
+                f"Collection '{alias}' was built with {self.reindex_required[alias]}-dim "
+                f"embeddings and is being re-indexed for the current model "
+                f"({EMBEDDING_DIMENSION} dims). Check GET /api/vector-store/reindex."
+            )
+
+    def scroll_points(
+        self,
+        collection_name: str,
+        offset: Any = None,
+        limit: int = 256,
+        with_payload: Any = True,
+        scroll_filter: Optional[Filter] = None,
+        with_vectors: bool = False,
+    ) -> Tuple[list, Any]:
+        """
+        Read one page of points from a collection.
+
+        Args:
+            collection_name: Collection or alias to read
+            offset: Offset returned by the previous page (None for the first page)
+            limit: Points per page
+            with_payload: True for the full payload, or a list of payload fields
+            scroll_filter: Optional filter on the points
+            with_vectors: Also return the stored vectors
+
+        Returns:
+            Tuple of (points, next_offset); next_offset is None after the last page
+        """
+        return self.client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            offset=offset,
+            limit=limit,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+
+    async def iter_chunks(
+        self,
+        filter_key: str,
+        filter_value: str,
+        collection_name: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        page_size: int = 256,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream every chunk matching a keyword filter in document order.
+
+        Chunks come out ordered by original page (original_page_id, or url for
+        widget chunks) and chunk_index, in pages of `page_size`. No vector
+        scoring is involved. A first scroll pass reads only the ordering
+        fields; the requested payload fields are then fetched page by page.
+
+        Args:
+            filter_key: Payload field to filter on (e.g. "crawl_id", "site_id")
+            filter_value: Value the field must match
+            collection_name: Collection or alias (defaults to the main collection)
+            fields: Payload fields to return (None = full payload)
+            page_size: Chunks per yielded page
+
+        Yields:
+            Lists of chunk payload dicts
+        """
+        collection_name = collection_name or self.collection_name
+        scroll_filter = self._match_filter(filter_key, filter_value)
+
+        # Pass 1: ordering keys only (small payloads)
+        keys = []
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                self.scroll_points,
+                collection_name,
+                offset,
+                max(page_size, 1024),
+                ["original_page_id", "url", "chunk_index"],
+                scroll_filter,
+            )
+            for point in points:
+                payload = point.payload or {}
+                keys.append(
+                    (
+                        str(payload.get("original_page_id") or payload.get("url") or ""),
+                        payload.get("chunk_index") or 0,
+                        point.id,
+                    )
+                )
+            if offset is None:
+                break
+        keys.sort(key=lambda key: (key[0], key[1]))
+
+        # Pass 2: requested fields, one page at a time. Chunk text comes from the
+        # chunk store (points written before it carry inline markdown)
+        with_payload = fields if fields else True
+        wants_text = self.chunk_store is not None and (not fields or "markdown" in fields)
+        if wants_text and fields and "chunk_hash" not in fields:
+            with_payload = fields + ["chunk_hash"]
+        for start in range(0, len(keys), page_size):
+            ids = [key[2] for key in keys[start : start + page_size]]
+            records = await asyncio.to_thread(
+                self.client.retrieve,
+                collection_name=collection_name,
+                ids=ids,
+                with_payload=with_payload,
+                with_vectors=False,
+            )
+            # retrieve() doesn't keep the order of the requested ids
+            by_id = {record.id: record.payload or {} for record in records}
+            page = [by_id[point_id] for point_id in ids if point_id in by_id]
+            if wants_text:
+                page = await asyncio.to_thread(self.hydrate_payloads, page)
+                if fields and "chunk_hash" not in fields:
+                    page = [
+                        {k: v for k, v in payload.items() if k != "chunk_hash"}
+                        for payload in page
+                    ]
+            yield page
+
+    async def iter_crawl_chunks(
+        self,
+        crawl_id: str,
+        fields: Optional[List[str]] = None,
+        page_size: int = 256,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream every chunk of a crawl in document order (see iter_chunks)."""
+        async for page in self.iter_chunks(
+            "crawl_id", crawl_id, fields=fields, page_size=page_size
+        ):
+            yield page
+
+    def upsert_vectors(
+        self,
+        collection_name: str,
+        ids: List[Any],
+        vectors,
+        payloads: List[Dict[str, Any]],
+    ):
+        """Upsert precomputed vectors and payloads into a specific collection."""
+        self.client.upsert(
+            collection_name=collection_name,
+            points=Batch(ids=ids, vectors=self._as_vector_rows(vectors), payloads=payloads),
+        )
+
+    def count_points(self, collection_name: str) -> int:
+        return self.client.count(collection_name=collection_name, exact=True).count
+
     async def store_embeddings(
         self,
         page_id: str,
         url: str,
         markdown: str,
-        embedding: List[float],
+        embedding: Any,
         metadata: Dict[str, Any],
         crawl_id: str,
         base_url: Optional[str] = None,
@@ -294,7 +1214,7 @@ class VectorStoreService:
         """
         try:
             # Ensure collection exists before storing (handles race conditions)
-            self._ensure_collection_exists()
+            await asyncio.to_thread(self._ensure_collection_exists)
 
             # Build payload with all metadata
             payload = {
@@ -316,12 +1236,16 @@ class VectorStoreService:
             if "original_page_id" in metadata:
                 payload["original_page_id"] = metadata["original_page_id"]
 
+            await self._slim_payloads([payload])
+
             point = PointStruct(
-                id=self._generate_stable_id(page_id), vector=embedding, payload=payload
+                id=self._generate_stable_id(page_id),
+                vector=self._as_vector_rows(embedding),
+                payload=payload,
             )
 
             try:
-                self.client.upsert(collection_name=self.collection_name, points=[point])
+                await self._upsert(self.collection_name, [point])
             except Exception as upsert_error:
                 error_msg = str(upsert_error)
                 # If collection doesn't exist, try to recreate it and retry once
@@ -332,11 +1256,9 @@ class VectorStoreService:
                     print(
                         f"Collection {self.collection_name} not found during upsert, recreating..."
                     )
-                    self._ensure_collection_exists()
+                    await asyncio.to_thread(self._ensure_collection_exists)
                     # Retry the upsert
-                    self.client.upsert(
-                        collection_name=self.collection_name, points=[point]
-                    )
+                    await self._upsert(self.collection_name, [point])
                 else:
                     raise
 
@@ -345,13 +1267,15 @@ class VectorStoreService:
             raise Exception(f"Failed to store embedding: {str(e)}")
 
     async def store_embeddings_batch(
-        self, embeddings_data: List[Dict[str, Any]]
+        self, embeddings_data: List[Dict[str, Any]], wait: bool = True
     ) -> bool:
         """
         Store multiple embeddings in a single batch operation for better performance.
 
         Args:
             embeddings_data: List of dicts containing page_id, url, markdown, embedding, metadata, crawl_id, base_url
+            wait: Wait until the points are applied; with False (bulk ingest) call
+                flush_writes() once all batches are sent
 
         Returns:
             True if successful
@@ -361,10 +1285,11 @@ class VectorStoreService:
                 return True
 
             # Ensure collection exists before storing
-            self._ensure_collection_exists()
+            await asyncio.to_thread(self._ensure_collection_exists)
 
-            # Build all points
-            points = []
+            # Build all points in column form (ids / vectors / payloads)
+            ids = []
+            payloads = []
             for data in embeddings_data:
                 payload = {
                     "page_id": data["page_id"],
@@ -385,16 +1310,22 @@ class VectorStoreService:
                 if "original_page_id" in metadata:
                     payload["original_page_id"] = metadata["original_page_id"]
 
-                point = PointStruct(
-                    id=self._generate_stable_id(data["page_id"]),
-                    vector=data["embedding"],
-                    payload=payload,
-                )
-                points.append(point)
+                ids.append(self._generate_stable_id(data["page_id"]))
+                payloads.append(payload)
+
+            # Chunk text goes to the chunk store, not the Qdrant payload
+            await self._slim_payloads(payloads)
+
+            # Stack the float32 rows once and convert in a single call
+            points = Batch(
+                ids=ids,
+                vectors=self._as_vector_rows([d["embedding"] for d in embeddings_data]),
+                payloads=payloads,
+            )
 
             # Batch upsert all points at once - much faster than individual upserts
             try:
-                self.client.upsert(collection_name=self.collection_name, points=points)
+                await self._upsert(self.collection_name, points, wait=wait)
             except Exception as upsert_error:
                 error_msg = str(upsert_error)
                 if (
@@ -404,10 +1335,8 @@ class VectorStoreService:
                     print(
                         f"Collection {self.collection_name} not found during batch upsert, recreating..."
                     )
-                    self._ensure_collection_exists()
-                    self.client.upsert(
-                        collection_name=self.collection_name, points=points
-                    )
+                    await asyncio.to_thread(self._ensure_collection_exists)
+                    await self._upsert(self.collection_name, points, wait=wait)
                 else:
                     raise
 
@@ -415,105 +1344,557 @@ class VectorStoreService:
         except Exception as e:
             raise Exception(f"Failed to batch store embeddings: {str(e)}")
 
+    # ============== Chunk text ==============
+
+    async def _slim_payloads(self, payloads: List[Dict[str, Any]]):
+        """
+        Give each payload the chunk_hash of its text, and move the text into
+        the chunk store when there is one.
+
+        The hash is stored either way: local index snapshots are validated
+        against the ids and hashes of a tenant's points.
+        """
+        if not payloads:
+            return
+        if self.chunk_store is None:
+            for payload in payloads:
+                payload["chunk_hash"] = chunk_hash(payload.get("markdown") or "")
+            return
+        texts = [payload.pop("markdown", "") or "" for payload in payloads]
+        hashes = await asyncio.to_thread(self.chunk_store.put_many, texts)
+        for payload, text_hash in zip(payloads, hashes):
+            payload["chunk_hash"] = text_hash
+
+    def hydrate_payloads(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fill in the markdown of slim payloads with one bulk chunk store read.
+
+        Payloads that still carry inline markdown are returned as they are;
+        the others are copied (never mutated, they may be cached snapshots).
+        Payloads whose text is missing from the store are returned without
+        markdown (see _map_results) and counted in the store's misses.
+        """
+        missing = [
+            payload["chunk_hash"]
+            for payload in payloads
+            if "markdown" not in payload and payload.get("chunk_hash")
+        ]
+        if not missing or self.chunk_store is None:
+            return payloads
+        texts = self.chunk_store.get_many(missing)
+        lost = len(set(missing) - texts.keys())
+        if lost:
+            print(
+                f"Warning: {lost} chunk texts missing from the chunk store "
+                f"({self.chunk_store.path}); was it moved or not persisted?"
+            )
+        return [
+            {**payload, "markdown": texts[payload["chunk_hash"]]}
+            if "markdown" not in payload and payload.get("chunk_hash") in texts
+            else payload
+            for payload in payloads
+        ]
+
+    async def collect_chunk_garbage(self) -> int:
+        """
+        Delete chunk store texts that no point refers to (mark and sweep).
+
+        Marks the chunk_hash of every point in the crawl and widget
+        collections (re-index targets included), then sweeps the texts
+        written CHUNK_STORE_GC_GRACE_SECONDS before marking started or
+        earlier: a text stored just before the scan may belong to an upsert
+        that lands after the scan passed its point. Any Qdrant error aborts
+        the pass without deleting anything.
+
+        Returns:
+            Number of texts deleted
+        """
+        if self.chunk_store is None:
+            return 0
+        started_at = time.time() - CHUNK_STORE_GC_GRACE_SECONDS
+        live: Set[str] = set()
+        for alias in (COLLECTION_NAME, WIDGET_COLLECTION_NAME):
+            for collection_name in self._write_collections(alias):
+                if await asyncio.to_thread(self._resolve_collection, collection_name) is None:
+                    continue
+                offset = None
+                while True:
+                    points, offset = await asyncio.to_thread(
+                        self.scroll_points, collection_name, offset, 1024, ["chunk_hash"]
+                    )
+                    live.update(
+                        point.payload["chunk_hash"]
+                        for point in points
+                        if point.payload and point.payload.get("chunk_hash")
+                    )
+                    if offset is None:
+                        break
+        swept = await asyncio.to_thread(self.chunk_store.sweep, live, started_at)
+        print(f"Chunk store GC: {len(live)} texts in use, {swept} deleted")
+        return swept
+
+    async def run_chunk_gc(self, interval: float = CHUNK_STORE_GC_INTERVAL_SECONDS):
+        """Collect chunk store garbage every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.collect_chunk_garbage()
+            except Exception as e:
+                print(f"Chunk store GC failed: {str(e)}")
+
+    # ============== Local index routing ==============
+
+    def _tenant_version(self, alias: str, tenant: str) -> int:
+        return self._tenant_versions.get((alias, tenant), 0)
+
+    def _bump_tenant_version(self, alias: str, tenant: str):
+        key = (alias, tenant)
+        self._tenant_versions[key] = self._tenant_versions.get(key, 0) + 1
+
+    def _snapshot_is_fresh(self, alias: str, tenant: str, snapshot: TenantSnapshot) -> bool:
+        return (
+            snapshot.version == self._tenant_version(alias, tenant)
+            and time.monotonic() - snapshot.validated_at < LOCAL_INDEX_REVALIDATE_SECONDS
+        )
+
+    async def _tenant_search(
+        self,
+        alias: str,
+        filter_key: str,
+        filter_value: str,
+        query_vector: List[float],
+        limit: int,
+        with_vectors: bool = False,
+        score_threshold: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[ScoredChunk]:
+        """
+        Search one tenant, routed by size.
+
+        Tenants with a fresh snapshot of at most LOCAL_INDEX_MAX_POINTS chunks
+        are searched in-process; the rest go to Qdrant. If Qdrant fails, any
+        snapshot of the tenant (even a stale one) answers instead.
+
+        Returns:
+            Hits, best first (see _search_points)
+        """
+
+        def search_snapshot(snapshot: TenantSnapshot) -> List[ScoredChunk]:
+            return snapshot.search(
+                query_vector, limit, with_vectors=with_vectors, score_threshold=score_threshold
+            )
+
+        async def search_qdrant() -> List[ScoredChunk]:
+            return await self._search_points(
+                alias,
+                query_vector,
+                limit,
+                filter_key,
+                filter_value,
+                with_vectors=with_vectors,
+                score_threshold=score_threshold,
+                fields=fields,
+            )
+
+        return await self._route_tenant_search(
+            alias, filter_key, filter_value, search_snapshot, search_qdrant
+        )
+
+    async def _tenant_search_batch(
+        self,
+        alias: str,
+        filter_key: str,
+        filter_value: str,
+        query_vectors: List[List[float]],
+        limit: int,
+        score_threshold: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[List[ScoredChunk]]:
+        """
+        Search one tenant with many queries, routed like _tenant_search.
+
+        Returns:
+            One hit list per query vector, best first
+        """
+
+        def search_snapshot(snapshot: TenantSnapshot) -> List[List[ScoredChunk]]:
+            return [
+                snapshot.search(query_vector, limit, score_threshold=score_threshold)
+                for query_vector in query_vectors
+            ]
+
+        async def search_qdrant() -> List[List[ScoredChunk]]:
+            return await self._search_points_batch(
+                alias,
+                query_vectors,
+                limit,
+                filter_key,
+                filter_value,
+                score_threshold=score_threshold,
+                fields=fields,
+            )
+
+        return await self._route_tenant_search(
+            alias, filter_key, filter_value, search_snapshot, search_qdrant
+        )
+
+    async def _route_tenant_search(
+        self,
+        alias: str,
+        filter_key: str,
+        filter_value: str,
+        search_snapshot: Callable[[TenantSnapshot], Any],
+        search_qdrant: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Run a tenant search in-process or in Qdrant (see _tenant_search)."""
+        if self.local_index is None:
+            return await search_qdrant()
+
+        snapshot = self.local_index.get(alias, filter_value)
+        if (
+            snapshot is not None
+            and snapshot.count <= LOCAL_INDEX_MAX_POINTS
+            and self._snapshot_is_fresh(alias, filter_value, snapshot)
+        ):
+            self.local_index.local_searches += 1
+            return search_snapshot(snapshot)
+
+        try:
+            points = await search_qdrant()
+        except Exception as e:
+            if snapshot is None:
+                raise
+            print(
+                f"Qdrant search failed ({str(e)}); serving {filter_key}={filter_value} "
+                f"from the local index"
+            )
+            self.local_index.fallback_searches += 1
+            return search_snapshot(snapshot)
+
+        self._schedule_snapshot_refresh(alias, filter_key, filter_value)
+        return points
+
+    def _schedule_snapshot_refresh(self, alias: str, filter_key: str, filter_value: str):
+        """Build or re-validate a tenant's snapshot in the background if needed."""
+        key = (alias, filter_value)
+        if key in self._snapshot_tasks:
+            return
+        snapshot = self.local_index.get(alias, filter_value)
+        if snapshot is not None and self._snapshot_is_fresh(alias, filter_value, snapshot):
+            return
+        skipped = self._snapshot_skipped.get(key)
+        if (
+            skipped is not None
+            and skipped[0] == self._tenant_version(alias, filter_value)
+            and time.monotonic() < skipped[1]
+        ):
+            return
+
+        task = asyncio.create_task(self._refresh_snapshot(alias, filter_key, filter_value))
+        self._snapshot_tasks[key] = task
+
+        def _done(finished: asyncio.Task):
+            self._snapshot_tasks.pop(key, None)
+            if not finished.cancelled() and finished.exception() is not None:
+                print(
+                    f"Local index refresh failed for {filter_key}={filter_value}: "
+                    f"{str(finished.exception())}"
+                )
+
+        task.add_done_callback(_done)
+
+    async def _refresh_snapshot(self, alias: str, filter_key: str, filter_value: str):
+        version = self._tenant_version(alias, filter_value)
+        count = await self._count_points(alias, filter_key, filter_value)
+
+        if count == 0 or count > LOCAL_INDEX_SNAPSHOT_MAX_POINTS:
+            # Nothing to snapshot, or too large: check again after the next write
+            # or LOCAL_INDEX_REVALIDATE_SECONDS
+            self._snapshot_skipped[(alias, filter_value)] = (
+                version,
+                time.monotonic() + LOCAL_INDEX_REVALIDATE_SECONDS,
+            )
+            if self.local_index.get(alias, filter_value) is not None:
+                await asyncio.to_thread(self.local_index.drop, alias, filter_value)
+            return
+
+        snapshot = self.local_index.get(alias, filter_value)
+        if (
+            snapshot is not None
+            and snapshot.count == count
+            and snapshot.version in (None, version)
+            and snapshot.meta.get("marker")
+            == await asyncio.to_thread(self._tenant_marker, alias, filter_key, filter_value)
+        ):
+            # Opened from disk, or expired without local writes (other processes
+            # may have written): same points with the same texts, still valid
+            snapshot.version = version
+            snapshot.validated_at = time.monotonic()
+            return
+
+        start = time.perf_counter()
+        ids, vectors, payloads = await asyncio.to_thread(
+            self._read_tenant, alias, filter_key, filter_value
+        )
+        if self._tenant_version(alias, filter_value) != version:
+            return  # written while reading; the next search starts over
+        snapshot = await asyncio.to_thread(
+            self.local_index.write,
+            alias,
+            filter_value,
+            ids,
+            vectors,
+            payloads,
+            self._points_marker(ids, payloads),
+        )
+        snapshot.version = version
+        snapshot.validated_at = time.monotonic()
+        print(
+            f"Built local index for {filter_key}={filter_value}: {len(ids)} chunks "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+    # Payload fields that change when a point's content does (page_hash: widget
+    # points written before chunk_hash was stored without a chunk store)
+    MARKER_FIELDS = ["chunk_hash", "page_hash"]
+
+    @classmethod
+    def _points_marker(cls, ids: List[Any], payloads: List[Dict[str, Any]]) -> str:
+        """Hash of a tenant's point ids and content hashes, in id order."""
+        digest = hashlib.sha256()
+        for point_id, payload in sorted(zip(ids, payloads), key=lambda item: str(item[0])):
+            fields = "|".join(str(payload.get(field) or "") for field in cls.MARKER_FIELDS)
+            digest.update(f"{point_id}:{fields}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _tenant_marker(self, alias: str, filter_key: str, filter_value: str) -> str:
+        """_points_marker of a tenant as stored in Qdrant, read without vectors (blocking)."""
+        ids, payloads = [], []
+        scroll_filter = self._match_filter(filter_key, filter_value)
+        offset = None
+        while True:
+            points, offset = self.scroll_points(
+                alias, offset, 1024, self.MARKER_FIELDS, scroll_filter
+            )
+            for point in points:
+                ids.append(point.id)
+                payloads.append(point.payload or {})
+            if offset is None:
+                return self._points_marker(ids, payloads)
+
+    def _read_tenant(
+        self, alias: str, filter_key: str, filter_value: str
+    ) -> Tuple[List[Any], List[List[float]], List[Dict[str, Any]]]:
+        """Every point of a tenant with its vector and payload (blocking)."""
+        ids, vectors, payloads = [], [], []
+        scroll_filter = self._match_filter(filter_key, filter_value)
+        offset = None
+        while True:
+            points, offset = self.scroll_points(
+                alias, offset, 1024, True, scroll_filter, with_vectors=True
+            )
+            for point in points:
+                ids.append(point.id)
+                vectors.append(point.vector)
+                payloads.append(point.payload or {})
+            if offset is None:
+                break
+        return ids, vectors, payloads
+
+    def local_index_stats(self) -> Dict[str, Any]:
+        """Routing settings and counters of the local index."""
+        if self.local_index is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "max_points": LOCAL_INDEX_MAX_POINTS,
+            "snapshot_max_points": LOCAL_INDEX_SNAPSHOT_MAX_POINTS,
+            **self.local_index.stats(),
+        }
+
+    # Payload fields searches ask Qdrant for: what the result mappings below read,
+    # plus chunk_hash to fetch the text ("markdown" is only inline on legacy points)
+    CRAWL_RESULT_FIELDS = [
+        "page_id",
+        "url",
+        "base_url",
+        "markdown",
+        "chunk_hash",
+        "title",
+        "crawl_id",
+        "chunk_index",
+        "total_chunks",
+        "original_page_id",
+    ]
+    WIDGET_RESULT_FIELDS = ["page_id", "url", "markdown", "chunk_hash", "title", "label"]
+
+    def _map_results(
+        self,
+        points: List[ScoredChunk],
+        payloads: List[Dict[str, Any]],
+        to_result,
+        with_vectors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Result dicts for hits (payloads already hydrated).
+
+        Hits whose text was lost from the chunk store are left out.
+        """
+        results = []
+        for point, payload in zip(points, payloads):
+            if "markdown" not in payload and payload.get("chunk_hash"):
+                continue
+            result = to_result(payload, point.score)
+            if with_vectors and point.vector is not None:
+                result["vector"] = np.asarray(point.vector, dtype=np.float32)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def crawl_result(payload: Dict[str, Any], score: float) -> Dict[str, Any]:
+        """Search result dict for a chunk payload of the main collection."""
+        return {
+            "page_id": payload.get("page_id", ""),
+            "url": payload.get("url", ""),
+            "base_url": payload.get("base_url", ""),
+            "markdown": payload.get("markdown", ""),
+            "title": payload.get("title", ""),
+            "crawl_id": payload.get("crawl_id", ""),
+            "score": float(score),
+            "metadata": {
+                "chunk_index": payload.get("chunk_index"),
+                "total_chunks": payload.get("total_chunks"),
+                "original_page_id": payload.get("original_page_id"),
+            },
+        }
+
+    @staticmethod
+    def widget_result(payload: Dict[str, Any], score: float) -> Dict[str, Any]:
+        """Search result dict for a chunk payload of the widget collection."""
+        return {
+            "page_id": payload.get("page_id", ""),
+            "url": payload.get("url", ""),
+            "markdown": payload.get("markdown", ""),
+            "title": payload.get("title", ""),
+            "label": payload.get("label", ""),
+            "score": float(score),
+        }
+
     async def search_similar(
         self,
-        query_embedding: List[float],
+        query_embedding: Any,
         crawl_id: str,
         limit: int = 10,
         score_threshold: float = 0.3,
+        with_vectors: bool = False,
     ) -> List[Dict[str, Any]]:
         """
         Search for similar documents using query embedding, filtered by crawl_id.
 
         Args:
-            query_embedding: Query embedding vector
+            query_embedding: Query embedding vector (1-D float32 array or list)
             crawl_id: Crawl session ID to filter results (only search within this crawl)
             limit: Maximum number of results (increased for better context)
             score_threshold: Minimum similarity score (0-1) to include results
+            with_vectors: Also return each chunk's stored vector (as "vector")
 
         Returns:
             List of similar documents with scores above threshold
         """
         try:
-            import httpx
-
-            # Convert embedding to list of regular Python floats (handle numpy float32)
-            query_vector = [float(x) for x in query_embedding]
+            self._check_searchable(self.collection_name)
+
+            # Convert float32 embedding to regular Python floats in one call
+            query_vector = self._as_vector_rows(query_embedding)
+
+            # Tenant filter, threshold and payload fields are applied by Qdrant
+            points = await self._tenant_search(
+                self.collection_name,
+                "crawl_id",
+                crawl_id,
+                query_vector,
+                limit,
+                with_vectors=with_vectors,
+                score_threshold=score_threshold,
+                fields=self.CRAWL_RESULT_FIELDS,
+            )
 
-            # Build search payload for Qdrant HTTP API
-            search_url = (
-                f"{QDRANT_URL}/collections/{self.collection_name}/points/search"
+            # Chunk text is only fetched for the hits that are returned
+            payloads = await asyncio.to_thread(
+                self.hydrate_payloads, [point.payload for point in points]
             )
-            headers = {"Content-Type": "application/json"}
-            if QDRANT_API_KEY:
-                headers["api-key"] = QDRANT_API_KEY
+            results = self._map_results(points, payloads, self.crawl_result, with_vectors)
 
-            # Qdrant HTTP API filter format
-            payload = {
-                "vector": query_vector,
-                "limit": limit,
-                "with_payload": True,
-                "filter": {"must": [{"key": "crawl_id", "match": {"value": crawl_id}}]},
-            }
+            return results
+        except Exception as e:
+            raise Exception(f"Vector search failed: {str(e)}")
 
-            print(f"DEBUG: Search Payload - Vector Dim: {len(query_vector)}")
-            print(f"DEBUG: Search Payload - Filter Crawl ID: {crawl_id}")
-            # print(f"DEBUG: Full Payload: {payload}") # Uncomment for verbose
+    async def search_batch(
+        self,
+        query_embeddings: Any,
+        crawl_id: Optional[str] = None,
+        site_id: Optional[str] = None,
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search a crawl (or widget site) with many query embeddings in one request.
 
-            # Make HTTP request to Qdrant API
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(search_url, json=payload, headers=headers)
-                if response.status_code != 200:
-                    print(f"DEBUG: Qdrant Error Body: {response.text}")
-                response.raise_for_status()
-                result_data = response.json()
+        Small tenants with a fresh local snapshot are searched in-process, the
+        rest with one Qdrant batch request (see _tenant_search).
 
-            points = result_data.get("result", [])
+        Args:
+            query_embeddings: (n, dim) array or list of query vectors
+            crawl_id: Crawl to search (main collection)
+            site_id: Widget site to search (widget collection), if no crawl_id
+            limit: Maximum results per query
+            score_threshold: Minimum score (defaults to 0.3 for crawls, none for sites)
 
+        Returns:
+            One result list per query, in the order of query_embeddings
+        """
+        try:
+            if crawl_id is not None:
+                alias, filter_key, filter_value = self.collection_name, "crawl_id", crawl_id
+                to_result, fields = self.crawl_result, self.CRAWL_RESULT_FIELDS
+                threshold = 0.3 if score_threshold is None else score_threshold
+            elif site_id is not None:
+                alias, filter_key, filter_value = WIDGET_COLLECTION_NAME, "site_id", site_id
+                to_result, fields = self.widget_result, self.WIDGET_RESULT_FIELDS
+                threshold = score_threshold
+            else:
+                raise ValueError("crawl_id or site_id is required")
+
+            self._check_searchable(alias)
+
+            query_vectors = self._as_vector_rows(query_embeddings)
+            if not query_vectors:
+                return []
+
+            batches = await self._tenant_search_batch(
+                alias,
+                filter_key,
+                filter_value,
+                query_vectors,
+                limit,
+                score_threshold=threshold,
+                fields=fields,
+            )
+            # One chunk store read for the text of every query's results
+            payloads = await asyncio.to_thread(
+                self.hydrate_payloads,
+                [point.payload for points in batches for point in points],
+            )
             results = []
-            # Process points (list of dicts from HTTP API)
-            for point in points:
-                # HTTP API returns dicts with 'payload' and 'score' keys
-                if isinstance(point, dict):
-                    payload_data = point.get("payload", {})
-                    score = point.get("score", 0.0)
-                else:
-                    # Fallback for object format
-                    payload_data = point.payload if hasattr(point, "payload") else {}
-                    score = getattr(point, "score", 0.0)
-
-                # Ensure payload is a dict
-                if not isinstance(payload_data, dict):
-                    payload_data = {}
-
-                # Double-check crawl_id filter (defensive)
-                if payload_data.get("crawl_id") != crawl_id:
-                    continue
-
-                # Filter by score threshold for better relevance
-                if float(score) < score_threshold:
-                    continue
-
+            offset = 0
+            for points in batches:
                 results.append(
-                    {
-                        "page_id": payload_data.get("page_id", ""),
-                        "url": payload_data.get("url", ""),
-                        "base_url": payload_data.get("base_url", ""),
-                        "markdown": payload_data.get("markdown", ""),
-                        "title": payload_data.get("title", ""),
-                        "crawl_id": payload_data.get("crawl_id", ""),
-                        "score": float(score),
-                        "metadata": {
-                            "chunk_index": payload_data.get("chunk_index"),
-                            "total_chunks": payload_data.get("total_chunks"),
-                            "original_page_id": payload_data.get("original_page_id"),
-                        },
-                    }
+                    self._map_results(points, payloads[offset : offset + len(points)], to_result)
                 )
-
+                offset += len(points)
             return results
         except Exception as e:
-            raise Exception(f"Vector search failed: {str(e)}")
+            raise Exception(f"Batch vector search failed: {str(e)}")
 
     async def delete_page(self, page_id: str) -> bool:
         """
@@ -527,34 +1908,101 @@ class VectorStoreService:
         """
         try:
             point_id = self._generate_stable_id(page_id)
-            self.client.delete(
-                collection_name=self.collection_name, points_selector=[point_id]
+            # Look up the crawl first so its local snapshot is invalidated
+            records = await asyncio.to_thread(
+                self.client.retrieve,
+                collection_name=self.collection_name,
+                ids=[point_id],
+                with_payload=["crawl_id"],
+            )
+            await asyncio.gather(
+                *(
+                    self._run_write(
+                        self.client.delete,
+                        collection_name=collection_name,
+                        points_selector=[point_id],
+                    )
+                    for collection_name in self._write_collections(self.collection_name)
+                )
             )
+            for record in records:
+                if (record.payload or {}).get("crawl_id"):
+                    self._bump_tenant_version(self.collection_name, record.payload["crawl_id"])
             return True
         except Exception as e:
             raise Exception(f"Failed to delete page: {str(e)}")
 
+    async def delete_url_chunks(
+        self,
+        alias: str,
+        tenant: str,
+        urls: List[str],
+        keep: Optional[Tuple[str, List[str]]] = None,
+    ):
+        """
+        Delete the chunks of some pages of a crawl / widget site (incremental refresh).
+
+        Args:
+            alias: COLLECTION_NAME (tenant = crawl_id) or WIDGET_COLLECTION_NAME (site_id)
+            tenant: Crawl or site the pages belong to
+            urls: Pages whose chunks are deleted
+            keep: (payload field, values) of chunks to spare, e.g. the chunks
+                just written for the new version of a changed page
+        """
+        if not urls:
+            return
+        try:
+            must_not = {keep[0]: keep[1]} if keep and keep[1] else None
+            for i in range(0, len(urls), 256):
+                must = {self.TENANT_KEYS[alias]: tenant, "url": urls[i : i + 256]}
+                for collection_name in self._write_collections(alias):
+                    await self._delete_where(collection_name, must, must_not)
+            self._bump_tenant_version(alias, tenant)
+        except Exception as e:
+            raise Exception(f"Failed to delete page chunks: {str(e)}")
+
+    async def delete_page_chunks(self, crawl_id: str, page_ids: List[str]):
+        """
+        Delete the chunks written for some scraped pages of a crawl.
+
+        Used to drop the partial new chunks of a page whose re-embedding
+        failed, so its previous chunks stay the only ones indexed.
+
+        Args:
+            crawl_id: Crawl the pages belong to
+            page_ids: original_page_id of the chunks to delete
+        """
+        if not page_ids:
+            return
+        try:
+            for i in range(0, len(page_ids), 256):
+                must = {
+                    self.TENANT_KEYS[COLLECTION_NAME]: crawl_id,
+                    "original_page_id": page_ids[i : i + 256],
+                }
+                for collection_name in self._write_collections(COLLECTION_NAME):
+                    await self._delete_where(collection_name, must)
+            self._bump_tenant_version(COLLECTION_NAME, crawl_id)
+        except Exception as e:
+            raise Exception(f"Failed to delete page chunks: {str(e)}")
+
     # ============== Widget-specific methods ==============
 
     def _ensure_widget_collection_exists(self):
         """Create the widget embeddings collection if it doesn't exist."""
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [col.name for col in collections]
-
-            if WIDGET_COLLECTION_NAME not in collection_names:
-                self.client.create_collection(
-                    collection_name=WIDGET_COLLECTION_NAME,
-                    vectors_config=VectorParams(
-                        size=EMBEDDING_DIMENSION, distance=Distance.COSINE
-                    ),
-                )
-                print(f"Created widget collection: {WIDGET_COLLECTION_NAME}")
+            collection_name = self._resolve_collection(WIDGET_COLLECTION_NAME)
+
+            if collection_name is not None:
+                self._check_dimension(WIDGET_COLLECTION_NAME, collection_name)
+            else:
+                collection_name = self._create_aliased_collection(WIDGET_COLLECTION_NAME)
+                print(f"Created widget collection: {WIDGET_COLLECTION_NAME} ({collection_name})")
 
                 # Create indexes for widget collection
                 try:
                     self.client.create_payload_index(
-                        collection_name=WIDGET_COLLECTION_NAME,
+                        collection_name=collection_name,
                         field_name="site_id",
                         field_schema="keyword",
                     )
@@ -572,34 +2020,16 @@ class VectorStoreService:
             Tuple of (has_embeddings, count)
         """
         try:
-            self._ensure_widget_collection_exists()
-
-            # Count points with this site_id
-            import httpx
-
-            count_url = (
-                f"{QDRANT_URL}/collections/{WIDGET_COLLECTION_NAME}/points/count"
-            )
-            headers = {"Content-Type": "application/json"}
-            if QDRANT_API_KEY:
-                headers["api-key"] = QDRANT_API_KEY
-
-            payload = {
-                "filter": {"must": [{"key": "site_id", "match": {"value": site_id}}]}
-            }
+            await asyncio.to_thread(self._ensure_widget_collection_exists)
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(count_url, json=payload, headers=headers)
-                response.raise_for_status()
-                result = response.json()
-                count = result.get("result", {}).get("count", 0)
-                return (count > 0, count)
+            count = await self._count_points(WIDGET_COLLECTION_NAME, "site_id", site_id)
+            return (count > 0, count)
         except Exception as e:
             print(f"Error checking widget embeddings: {str(e)}")
             return (False, 0)
 
     async def widget_store_embeddings_batch(
-        self, site_id: str, embeddings_data: List[Dict[str, Any]]
+        self, site_id: str, embeddings_data: List[Dict[str, Any]], wait: bool = True
     ) -> bool:
         """
         Store embeddings for a widget site.
@@ -607,14 +2037,16 @@ class VectorStoreService:
         Args:
             site_id: Unique site identifier
             embeddings_data: List of embedding data dicts
+            wait: Wait until the points are applied (see store_embeddings_batch)
         """
         try:
             if not embeddings_data:
                 return True
 
-            self._ensure_widget_collection_exists()
+            await asyncio.to_thread(self._ensure_widget_collection_exists)
 
-            points = []
+            ids = []
+            payloads = []
             for data in embeddings_data:
                 payload = {
                     "site_id": site_id,
@@ -632,70 +2064,90 @@ class VectorStoreService:
                     payload["chunk_index"] = metadata["chunk_index"]
                 if "total_chunks" in metadata:
                     payload["total_chunks"] = metadata["total_chunks"]
+                # Page fingerprint, compared on the next refresh (widget pages
+                # have no page record to keep it in)
+                for key, field in self.WIDGET_FINGERPRINT_FIELDS.items():
+                    if metadata.get(key):
+                        payload[field] = metadata[key]
 
                 # Use site_id + page_id for unique point ID
-                point_id = self._generate_stable_id(f"{site_id}:{data['page_id']}")
-                point = PointStruct(
-                    id=point_id, vector=data["embedding"], payload=payload
-                )
-                points.append(point)
+                ids.append(self._generate_stable_id(f"{site_id}:{data['page_id']}"))
+                payloads.append(payload)
+
+            await self._slim_payloads(payloads)
 
-            self.client.upsert(collection_name=WIDGET_COLLECTION_NAME, points=points)
+            points = Batch(
+                ids=ids,
+                vectors=self._as_vector_rows([d["embedding"] for d in embeddings_data]),
+                payloads=payloads,
+            )
+
+            await self._upsert(WIDGET_COLLECTION_NAME, points, wait=wait)
             return True
         except Exception as e:
             raise Exception(f"Failed to store widget embeddings: {str(e)}")
 
+    async def widget_page_fingerprints(self, site_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Stored fingerprint of every indexed page of a widget site.
+
+        Returns:
+            {url: page metadata (contentHash, etag, lastModified)}; pages
+            indexed before fingerprints were stored map to {}
+        """
+        await asyncio.to_thread(self._ensure_widget_collection_exists)
+        fields = list(self.WIDGET_FINGERPRINT_FIELDS.values())
+        pages: Dict[str, Dict[str, Any]] = {}
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                self.scroll_points,
+                WIDGET_COLLECTION_NAME,
+                offset,
+                1024,
+                ["url"] + fields,
+                self._match_filter("site_id", site_id),
+            )
+            for point in points:
+                payload = point.payload or {}
+                if payload.get("url"):
+                    pages[payload["url"]] = {
+                        key: payload[field]
+                        for key, field in self.WIDGET_FINGERPRINT_FIELDS.items()
+                        if payload.get(field)
+                    }
+            if offset is None:
+                return pages
+
     async def widget_search_similar(
-        self, query_embedding: List[float], site_id: str, limit: int = 5
+        self,
+        query_embedding: Any,
+        site_id: str,
+        limit: int = 5,
+        with_vectors: bool = False,
     ) -> List[Dict[str, Any]]:
         """
         Search for similar documents in a widget site's embeddings.
         """
         try:
-            import httpx
-
-            query_vector = [float(x) for x in query_embedding]
-
-            search_url = (
-                f"{QDRANT_URL}/collections/{WIDGET_COLLECTION_NAME}/points/search"
+            self._check_searchable(WIDGET_COLLECTION_NAME)
+
+            query_vector = self._as_vector_rows(query_embedding)
+
+            points = await self._tenant_search(
+                WIDGET_COLLECTION_NAME,
+                "site_id",
+                site_id,
+                query_vector,
+                limit,
+                with_vectors=with_vectors,
+                fields=self.WIDGET_RESULT_FIELDS,
             )
-            headers = {"Content-Type": "application/json"}
-            if QDRANT_API_KEY:
-                headers["api-key"] = QDRANT_API_KEY
-
-            payload = {
-                "vector": query_vector,
-                "limit": limit,
-                "with_payload": True,
-                "filter": {"must": [{"key": "site_id", "match": {"value": site_id}}]},
-            }
-
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(search_url, json=payload, headers=headers)
-                response.raise_for_status()
-                result_data = response.json()
-
-            points = result_data.get("result", [])
-            results = []
-
-            for point in points:
-                payload_data = (
-                    point.get("payload", {}) if isinstance(point, dict) else {}
-                )
-                score = point.get("score", 0.0) if isinstance(point, dict) else 0.0
-
-                results.append(
-                    {
-                        "page_id": payload_data.get("page_id", ""),
-                        "url": payload_data.get("url", ""),
-                        "markdown": payload_data.get("markdown", ""),
-                        "title": payload_data.get("title", ""),
-                        "label": payload_data.get("label", ""),
-                        "score": float(score),
-                    }
-                )
 
-            return results
+            payloads = await asyncio.to_thread(
+                self.hydrate_payloads, [point.payload for point in points]
+            )
+            return self._map_results(points, payloads, self.widget_result, with_vectors)
         except Exception as e:
             raise Exception(f"Widget vector search failed: {str(e)}")
 
@@ -704,22 +2156,11 @@ class VectorStoreService:
         Delete all embeddings for a site (used before refresh).
         """
         try:
-            import httpx
-
-            delete_url = (
-                f"{QDRANT_URL}/collections/{WIDGET_COLLECTION_NAME}/points/delete"
-            )
-            headers = {"Content-Type": "application/json"}
-            if QDRANT_API_KEY:
-                headers["api-key"] = QDRANT_API_KEY
-
-            payload = {
-                "filter": {"must": [{"key": "site_id", "match": {"value": site_id}}]}
-            }
-
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(delete_url, json=payload, headers=headers)
-                response.raise_for_status()
+            for collection_name in self._write_collections(WIDGET_COLLECTION_NAME):
+                await self._delete_by_filter(collection_name, "site_id", site_id)
+            self._bump_tenant_version(WIDGET_COLLECTION_NAME, site_id)
+            if self.local_index is not None:
+                await asyncio.to_thread(self.local_index.drop, WIDGET_COLLECTION_NAME, site_id)
 
             return True
         except Exception as e:
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# routes.py builds its services at import time; they only need these to be set
+os.environ.setdefault("FIRECRAWL_API_KEY", "test")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
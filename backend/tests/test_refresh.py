@@ -0,0 +1,230 @@
+"""Incremental refresh: RefreshPlan and the crawl refresh in routes._refresh_crawl."""
+
+import asyncio
+import uuid
+import pytest
+import routes
+from models import ScrapeRequest
+from services.refresh import ADDED, CHANGED, UNCHANGED, RefreshPlan
+from services.scraper import content_hash
+
+CRAWL_ID = "crawl-1"
+
+
+def _page(url, markdown, **metadata):
+    return {
+        "page_id": str(uuid.uuid4()),
+        "url": url,
+        "base_url": "https://docs.test",
+        "markdown": markdown,
+        "crawl_id": CRAWL_ID,
+        "metadata": {"title": url, "contentHash": content_hash(markdown), **metadata},
+    }
+
+
+def _stored(url, markdown, **metadata):
+    return {"url": url, "metadata": {"contentHash": content_hash(markdown), **metadata}}
+
+
+# ============== RefreshPlan ==============
+
+
+def test_plan_classifies_pages():
+    plan = RefreshPlan(
+        {
+            "https://docs.test/same": {"contentHash": content_hash("same")},
+            "https://docs.test/etag": {"etag": '"v1"'},
+            "https://docs.test/edited": {"contentHash": content_hash("old")},
+        }
+    )
+    assert plan.classify(_page("https://docs.test/same", "same")) == UNCHANGED
+    assert plan.classify({**_page("https://docs.test/etag", ""), "not_modified": True}) == UNCHANGED
+    assert plan.classify(_page("https://docs.test/edited", "new")) == CHANGED
+    assert plan.classify(_page("https://docs.test/new", "new")) == ADDED
+    assert plan.unreached() == []
+
+
+def test_plan_only_removes_pages_reported_gone():
+    plan = RefreshPlan({"https://docs.test/a": {}, "https://docs.test/b": {}, "https://docs.test/c": {}})
+    plan.gone("https://docs.test/a")
+    plan.gone("https://docs.test/unknown")  # never indexed: nothing to remove
+    plan.keep("https://docs.test/b")
+    assert plan.removed() == ["https://docs.test/a"]
+    assert plan.unreached() == ["https://docs.test/c"]
+    assert plan.counts()["kept"] == 1
+
+
+def test_plan_does_not_remove_a_gone_page_reached_again():
+    plan = RefreshPlan({"https://docs.test/a": {}})
+    plan.classify(_page("https://docs.test/a", "a"))
+    plan.gone("https://docs.test/a")
+    assert plan.removed() == []
+
+
+def test_plan_failed_page_is_neither_changed_nor_added():
+    plan = RefreshPlan({"https://docs.test/a": {"contentHash": content_hash("old")}})
+    plan.classify(_page("https://docs.test/a", "new"))
+    plan.classify(_page("https://docs.test/b", "new"))
+    plan.failed("https://docs.test/a")
+    plan.failed("https://docs.test/b")
+    assert plan.changed == [] and plan.added == []
+    assert plan.counts()["failed"] == 2
+
+
+# ============== _refresh_crawl ==============
+
+
+class FakeScraper:
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def scrape_site(self, url, max_depth, crawl_id, engine, known):
+        for page in self.pages:
+            yield page
+
+
+class FakeChunking:
+    def chunk_markdown(self, markdown):
+        return [{"text": markdown, "chunk_index": 0, "total_chunks": 1}]
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    async def generate_embeddings(self, texts):
+        if any("FAIL" in text for text in texts):
+            raise RuntimeError("embedding backend unavailable")
+        self.embedded.extend(texts)
+        return [[0.0] * 4 for _ in texts]
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.stored = []
+        self.deleted_urls = []
+        self.keep = None
+        self.deleted_page_ids = []
+
+    async def store_embeddings_batch(self, items, wait=True):
+        self.stored.extend(items)
+
+    async def flush_writes(self):
+        pass
+
+    async def delete_url_chunks(self, alias, tenant, urls, keep=None):
+        self.deleted_urls.extend(urls)
+        self.keep = keep
+
+    async def delete_page_chunks(self, crawl_id, page_ids):
+        self.deleted_page_ids.extend(page_ids)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.pages = {}
+        self.deleted = []
+        self.page_count = None
+
+    def store_page(self, crawl_id, url, title="", parent_url=None, metadata=None):
+        self.pages[url] = metadata
+        return url
+
+    def delete_pages(self, crawl_id, urls):
+        self.deleted.extend(urls)
+
+    def update_crawl_page_count(self, crawl_id, count):
+        self.page_count = count
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    fakes = {
+        "db": FakeDatabase(),
+        "vectors": FakeVectorStore(),
+        "embeddings": FakeEmbeddings(),
+    }
+    monkeypatch.setattr(routes, "db_service", fakes["db"])
+    monkeypatch.setattr(routes, "vector_store_service", fakes["vectors"])
+    monkeypatch.setattr(routes, "embedding_service", fakes["embeddings"])
+    monkeypatch.setattr(routes, "chunking_service", FakeChunking())
+    return fakes
+
+
+def _refresh(monkeypatch, stored_pages, scraped_pages):
+    monkeypatch.setattr(routes, "scraper_service", FakeScraper(scraped_pages))
+    request = ScrapeRequest(url="https://docs.test", force_refresh=True)
+
+    async def run():
+        return [
+            item async for item in routes._refresh_crawl(CRAWL_ID, request, stored_pages)
+        ]
+
+    events = asyncio.run(run())
+    assert events[-1][0] == "done"
+    return events[-1][1]
+
+
+def test_unchanged_and_not_modified_pages_keep_their_vectors(monkeypatch, fakes):
+    stored = [
+        _stored("https://docs.test/same", "same"),
+        _stored("https://docs.test/cached", "cached", etag='"v1"'),
+    ]
+    not_modified = {**_page("https://docs.test/cached", ""), "not_modified": True}
+    counts = _refresh(
+        monkeypatch, stored, [_page("https://docs.test/same", "same"), not_modified]
+    )
+
+    assert counts["unchanged"] == 2
+    assert fakes["embeddings"].embedded == []
+    assert fakes["vectors"].deleted_urls == []
+    assert fakes["db"].deleted == []
+    assert "https://docs.test/cached" not in fakes["db"].pages  # a 304 rewrites nothing
+
+
+def test_unreached_pages_are_kept(monkeypatch, fakes):
+    stored = [_stored("https://docs.test/a", "a"), _stored("https://docs.test/throttled", "t")]
+    counts = _refresh(monkeypatch, stored, [_page("https://docs.test/a", "a")])
+
+    assert counts["kept"] == 1 and counts["removed"] == 0
+    assert fakes["vectors"].deleted_urls == []
+    assert fakes["db"].deleted == []
+    assert fakes["db"].page_count == 2
+
+
+def test_changed_page_is_recorded_after_its_chunks_are_stored(monkeypatch, fakes):
+    stored = [_stored("https://docs.test/a", "old")]
+    page = _page("https://docs.test/a", "new")
+    counts = _refresh(monkeypatch, stored, [page])
+
+    assert counts["changed"] == 1
+    assert [item["markdown"] for item in fakes["vectors"].stored] == ["new"]
+    assert fakes["db"].pages["https://docs.test/a"]["contentHash"] == content_hash("new")
+    # Old chunks go, the new version's chunks stay
+    assert fakes["vectors"].deleted_urls == ["https://docs.test/a"]
+    assert fakes["vectors"].keep == ("original_page_id", [page["page_id"]])
+
+
+def test_failed_embedding_keeps_old_chunks_and_hash(monkeypatch, fakes):
+    stored = [_stored("https://docs.test/a", "old"), _stored("https://docs.test/b", "b")]
+    failing = _page("https://docs.test/a", "new FAIL")
+    counts = _refresh(monkeypatch, stored, [failing, _page("https://docs.test/b", "b")])
+
+    assert counts["failed"] == 1 and counts["changed"] == 0
+    assert "https://docs.test/a" not in fakes["vectors"].deleted_urls
+    assert fakes["vectors"].deleted_page_ids == [failing["page_id"]]
+    # The stored hash is not replaced, so the next refresh tries again
+    assert "https://docs.test/a" not in fakes["db"].pages
+    assert fakes["db"].deleted == []
+
+
+def test_gone_page_is_deleted(monkeypatch, fakes):
+    stored = [_stored("https://docs.test/a", "a"), _stored("https://docs.test/old", "old")]
+    gone = {**_page("https://docs.test/old", ""), "gone": True}
+    gone["metadata"] = {"statusCode": 404}
+    counts = _refresh(monkeypatch, stored, [_page("https://docs.test/a", "a"), gone])
+
+    assert counts["removed"] == 1
+    assert fakes["vectors"].deleted_urls == ["https://docs.test/old"]
+    assert fakes["db"].deleted == ["https://docs.test/old"]
+    assert fakes["db"].page_count == 1